@@ -2,14 +2,40 @@ import os
 import logging
 
 from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.orm import DeclarativeBase
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 
+
+class Base(DeclarativeBase):
+    pass
+
+
+db = SQLAlchemy(model_class=Base)
+
 # Create the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
 
+# Render metadata database (SQLite next to the synthesis cache unless DATABASE_URL is set)
+cache_dir = os.path.join(app.root_path, 'cache')
+if not os.path.exists(cache_dir):
+    os.makedirs(cache_dir)
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "DATABASE_URL", "sqlite:///" + os.path.join(cache_dir, 'renders.db'))
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_recycle": 300,
+    "pool_pre_ping": True,
+}
+db.init_app(app)
+
+with app.app_context():
+    # Make sure the tables are created
+    import models  # noqa: F401
+    db.create_all()
+
 # Import routes after app creation to avoid circular imports
 from routes import register_routes
 
@@ -0,0 +1,1211 @@
+"""
+NumPy-backed audio buffer used by the speech processing pipeline.
+
+Audio is decoded once into a float32 array and every stage (gain, filters,
+overlays, resampling) works on that array in place or with vectorized
+operations. Conversion back to a pydub AudioSegment happens only for export.
+"""
+import math
+import zlib
+import threading
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import irfft, next_fast_len, rfft
+from scipy.signal import lfilter, oaconvolve, sosfilt, sosfilt_zi
+from pydub import AudioSegment
+
+# Length of each precomputed noise bed (longer clips tile it)
+DEFAULT_NOISE_BED_MS = 4000
+
+# WSOLA time-stretch frame length and alignment search range
+WSOLA_FRAME_MS = 40
+WSOLA_TOLERANCE_MS = 8
+
+# Rate the WSOLA alignment search runs at before refining at full rate
+WSOLA_SEARCH_RATE = 6000
+
+# Frames per chain when the WSOLA search runs chains in lockstep, and per overlap-add chunk
+WSOLA_CHAIN_FRAMES = 64
+WSOLA_OLA_CHUNK_FRAMES = 256
+
+# Tempo changes smaller than this are applied as playback rate instead of time stretching
+WSOLA_MIN_RATE_CHANGE = 0.005
+
+# Output samples resampled per chunk, to keep interpolation temporaries small
+RESAMPLE_CHUNK_FRAMES = 16384
+
+# Frames per block when stages stream over a clip instead of processing it whole
+DEFAULT_BLOCK_FRAMES = 8192
+
+# Range of the modulated delay a detuned voice sweeps when streaming
+STREAM_VOICE_WINDOW_MS = 50
+
+# NumPy sample types for the PCM sample widths we read and write
+_PCM_DTYPES = {
+    2: np.int16,
+    4: np.int32
+}
+
+
+def db_to_gain(db):
+    """Convert a dB change to a linear amplitude factor"""
+    return 10.0 ** (db / 20.0)
+
+
+def resample_array(samples, src_rate, dst_rate):
+    """
+    Linearly resample a (channels, samples) array from src_rate to dst_rate
+
+    Args:
+        samples (np.ndarray): Audio samples, shape (channels, n)
+        src_rate (float): Sample rate the samples are at
+        dst_rate (float): Sample rate to convert to
+
+    Returns:
+        np.ndarray: Resampled float32 samples, shape (channels, m)
+    """
+    n = samples.shape[-1]
+    if src_rate == dst_rate or n == 0:
+        return samples.copy()
+
+    new_n = int(n * dst_rate / src_rate)
+    ratio = src_rate / dst_rate
+    output = np.empty((samples.shape[0], new_n), dtype=np.float32)
+    for start in range(0, new_n, RESAMPLE_CHUNK_FRAMES):
+        positions = np.arange(start, min(start + RESAMPLE_CHUNK_FRAMES, new_n), dtype=np.float64) * ratio
+        index = np.minimum(positions.astype(np.int64), n - 1)
+        frac = (positions - index).astype(np.float32)
+        following = np.minimum(index + 1, n - 1)
+        chunk = output[:, start:start + len(index)]
+        np.multiply(samples[:, index], 1.0 - frac, out=chunk)
+        chunk += samples[:, following] * frac
+    return output
+
+
+def one_pole_coefficients(kind, cutoff, sample_rate):
+    """One-pole 'low' or 'high' pass coefficients as (b, a), matching pydub's filters"""
+    rc = 1.0 / (cutoff * 2 * math.pi)
+    dt = 1.0 / sample_rate
+    if kind == 'low':
+        alpha = dt / (rc + dt)
+        return np.array([alpha]), np.array([1.0, -(1.0 - alpha)])
+    alpha = rc / (rc + dt)
+    return np.array([alpha, -alpha]), np.array([1.0, -alpha])
+
+
+def render_voices(samples, sample_rate, voices):
+    """
+    Render detuned, delayed copies of a clip into one buffer
+
+    Every voice reads the same source with linear fractional-delay
+    interpolation, so no intermediate resampled copies are made. A voice with
+    ratio r plays back r times faster (like AudioBuffer.shifted) starting
+    delay ms into the clip, and the mix keeps the source's length.
+
+    Args:
+        samples (np.ndarray): Source audio, shape (channels, n)
+        sample_rate (float): Sample rate in Hz
+        voices (list): Dicts with 'ratio' (default 1.0), 'delay' in ms,
+            'gain' in dB, and optional 'fade_in' in ms and 'filters' specs
+
+    Returns:
+        np.ndarray: Sum of all voices, shape (channels, n)
+    """
+    n = samples.shape[-1]
+    output = np.zeros_like(samples, dtype=np.float32)
+    if n == 0:
+        return output
+
+    for voice in voices:
+        # Source frames advanced per output frame (same rounding as AudioBuffer.shifted)
+        step = int(sample_rate * voice.get('ratio', 1.0)) / sample_rate
+        delay = voice.get('delay', 0) * sample_rate / 1000
+        start = int(math.ceil(delay))
+        end = min(n, int(math.ceil(delay + int(n / step))))
+        if end <= start:
+            continue
+
+        if step == 1.0 and delay == start:
+            # Plain delayed copy
+            layer = samples[:, :end - start].copy()
+        else:
+            # Linear interpolation between neighbouring source frames, computed in place
+            positions = np.arange(start, end, dtype=np.float64)
+            positions -= delay
+            positions *= step
+            np.minimum(positions, n - 1, out=positions)
+            index = positions.astype(np.int64)
+            np.minimum(index, max(n - 2, 0), out=index)
+            positions -= index
+            frac = positions.astype(np.float32)
+
+            layer = samples[:, np.minimum(index + 1, n - 1)]
+            base = samples[:, index]
+            layer -= base
+            layer *= frac
+            layer += base
+
+        if voice.get('filters'):
+            layer = sosfilt(design_sos(voice['filters'], sample_rate), layer, axis=-1).astype(np.float32)
+        if voice.get('gain'):
+            layer *= np.float32(db_to_gain(voice['gain']))
+        if voice.get('fade_in'):
+            fade = min(int(voice['fade_in'] * sample_rate / 1000), layer.shape[1])
+            layer[:, :fade] *= np.linspace(0.0, 1.0, fade, dtype=np.float32)
+
+        output[:, start:end] += layer
+
+    return output
+
+
+@lru_cache(maxsize=None)
+def hann_window(length):
+    """Return a cached, read-only periodic Hann window (sums to 1 at 50% overlap)"""
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(length) / length)).astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+
+def _wsola_search(mono, coarse, nominal, hop, step, tolerance):
+    """
+    Build the WSOLA alignment search for a batch of frames
+
+    The returned function takes frame indices and the positions of the frames
+    before them, and returns where each frame best continues its predecessor:
+    a coarse FFT correlation over the decimated copy, refined at full rate
+    around the coarse match.
+    """
+    coarse_hop = hop // step
+    lags = 2 * (tolerance // step) + 1
+    span = lags + coarse_hop - 1
+    size = next_fast_len(span, real=True)
+    coarse_rows = sliding_window_view(coarse, span)
+    coarse_templates = sliding_window_view(coarse, coarse_hop)
+    fine_rows = sliding_window_view(mono, 2 * step + hop)
+    fine_templates = sliding_window_view(mono, hop)
+
+    def search(frames, previous):
+        # Natural continuation of each previous frame
+        target = previous + hop
+        low = (nominal[frames] - tolerance) // step
+        correlation = irfft(rfft(coarse_rows[low], size, axis=1) *
+                            np.conj(rfft(coarse_templates[target // step], size, axis=1)), size, axis=1)
+        best = (low + correlation[:, :lags].argmax(axis=1)) * step
+
+        # Refine around the coarse match at full rate
+        start = np.maximum(0, best - step)
+        candidates = sliding_window_view(fine_rows[start], hop, axis=1)
+        correlation = np.vecdot(candidates, fine_templates[target][:, np.newaxis])
+        return start + correlation.argmax(axis=1)
+
+    return search
+
+
+def time_stretch(samples, sample_rate, rate):
+    """
+    Change tempo without changing pitch using WSOLA
+
+    Frames of WSOLA_FRAME_MS are overlap-added at 50% overlap with a Hann
+    window. Each frame is taken from within WSOLA_TOLERANCE_MS of its nominal
+    position, at the offset that best continues the previous frame. That
+    search runs on a decimated copy and is refined at full rate.
+
+    Because each frame depends on the one before it, the frames are split
+    into chains of WSOLA_CHAIN_FRAMES that are searched in lockstep, one
+    batched correlation per step. Each chain is then re-run from the end of
+    the chain before it until its frames stop moving, which gives exactly the
+    frame-by-frame result.
+
+    Args:
+        samples (np.ndarray): Audio samples, shape (channels, n)
+        sample_rate (float): Sample rate in Hz
+        rate (float): Tempo factor (> 1 is faster and shorter)
+
+    Returns:
+        np.ndarray: Stretched float32 samples, shape (channels, n / rate)
+    """
+    channels, n = samples.shape
+    out_n = int(n / rate)
+    if rate == 1.0 or n == 0 or out_n == 0:
+        return samples.copy()
+
+    hop = max(1, int(WSOLA_FRAME_MS * sample_rate / 2000))
+    frame = 2 * hop
+    step = max(1, int(sample_rate // WSOLA_SEARCH_RATE))
+    tolerance = int(WSOLA_TOLERANCE_MS * sample_rate / 1000) // step * step
+    frame_count = -(-(out_n + hop) // hop) + 1
+
+    # Pad so every candidate frame is in range; frame k is centred on output sample k * hop
+    pad_left = hop + tolerance
+    pad_right = max(0, int(frame_count * hop * rate) + frame + tolerance + hop - n)
+    padded = np.pad(samples, ((0, 0), (pad_left, pad_right)))
+    mono = padded.mean(axis=0) if channels > 1 else padded[0]
+    coarse = mono[::step].copy()
+
+    nominal = (np.arange(frame_count) * hop * rate).astype(np.int64) + tolerance
+    search = _wsola_search(mono, coarse, nominal, hop, step, tolerance)
+    positions = nominal.copy()
+
+    # Search every chain in lockstep, each starting from its nominal position
+    starts = np.arange(0, frame_count, WSOLA_CHAIN_FRAMES)
+    for offset in range(1, WSOLA_CHAIN_FRAMES):
+        frames = starts + offset
+        frames = frames[frames < frame_count]
+        if not len(frames):
+            break
+        positions[frames] = search(frames, positions[frames - 1])
+
+    # Re-run each chain from the end of the one before it until nothing moves
+    frames = starts[1:]
+    while len(frames):
+        found = search(frames, positions[frames - 1])
+        moved = found != positions[frames]
+        positions[frames] = found
+        frames = frames[moved] + 1
+        frames = frames[frames < frame_count]
+
+    # Overlap-add the windowed frames, gathering a chunk of frames at a time
+    window = hann_window(frame)
+    output = np.zeros((channels, frame_count + 1, hop), dtype=np.float32)
+    for channel in range(channels):
+        windows = sliding_window_view(padded[channel], frame)
+        mixed = output[channel]
+        for start in range(0, frame_count, WSOLA_OLA_CHUNK_FRAMES):
+            chunk = windows[positions[start:start + WSOLA_OLA_CHUNK_FRAMES]]
+            chunk *= window
+            mixed[start:start + len(chunk)] += chunk[:, :hop]
+            mixed[start + 1:start + 1 + len(chunk)] += chunk[:, hop:]
+    return output.reshape(channels, -1)[:, hop:hop + out_n]
+
+
+def shelf_coefficients(kind, cutoff, gain_db, sample_rate):
+    """
+    RBJ cookbook shelving filter coefficients (shelf slope 1)
+
+    Args:
+        kind (str): 'low' or 'high'
+        cutoff (float): Shelf midpoint frequency in Hz
+        gain_db (float): Shelf gain in dB
+        sample_rate (float): Sample rate in Hz
+
+    Returns:
+        tuple: (b, a) normalized filter coefficients
+    """
+    a_gain = 10.0 ** (gain_db / 40.0)
+    w0 = 2 * math.pi * _safe_frequency(cutoff, sample_rate) / sample_rate
+    cos_w0 = math.cos(w0)
+    alpha = math.sin(w0) / 2 * math.sqrt(2)
+    sqrt_a = 2 * math.sqrt(a_gain) * alpha
+
+    if kind == 'low':
+        b = [a_gain * ((a_gain + 1) - (a_gain - 1) * cos_w0 + sqrt_a),
+             2 * a_gain * ((a_gain - 1) - (a_gain + 1) * cos_w0),
+             a_gain * ((a_gain + 1) - (a_gain - 1) * cos_w0 - sqrt_a)]
+        a = [(a_gain + 1) + (a_gain - 1) * cos_w0 + sqrt_a,
+             -2 * ((a_gain - 1) + (a_gain + 1) * cos_w0),
+             (a_gain + 1) + (a_gain - 1) * cos_w0 - sqrt_a]
+    else:
+        b = [a_gain * ((a_gain + 1) + (a_gain - 1) * cos_w0 + sqrt_a),
+             -2 * a_gain * ((a_gain - 1) + (a_gain + 1) * cos_w0),
+             a_gain * ((a_gain + 1) + (a_gain - 1) * cos_w0 - sqrt_a)]
+        a = [(a_gain + 1) - (a_gain - 1) * cos_w0 + sqrt_a,
+             2 * ((a_gain - 1) - (a_gain + 1) * cos_w0),
+             (a_gain + 1) - (a_gain - 1) * cos_w0 - sqrt_a]
+
+    return np.array(b) / a[0], np.array(a) / a[0]
+
+
+def peaking_coefficients(center, gain_db, q, sample_rate):
+    """RBJ cookbook peaking EQ coefficients as normalized (b, a)"""
+    a_gain = 10.0 ** (gain_db / 40.0)
+    w0 = 2 * math.pi * _safe_frequency(center, sample_rate) / sample_rate
+    alpha = math.sin(w0) / (2 * q)
+    cos_w0 = math.cos(w0)
+
+    b = [1 + alpha * a_gain, -2 * cos_w0, 1 - alpha * a_gain]
+    a = [1 + alpha / a_gain, -2 * cos_w0, 1 - alpha / a_gain]
+    return np.array(b) / a[0], np.array(a) / a[0]
+
+
+def filter_section(spec, sample_rate):
+    """
+    Design one second-order section for a filter spec
+
+    Args:
+        spec (tuple): ('low_pass'|'high_pass', cutoff), ('low_shelf'|'high_shelf', cutoff, gain_db)
+            or ('peaking', center, gain_db[, q])
+        sample_rate (float): Sample rate in Hz
+
+    Returns:
+        np.ndarray: Section [b0, b1, b2, 1, a1, a2]
+    """
+    kind = spec[0]
+    if kind in ('low_pass', 'high_pass'):
+        b, a = one_pole_coefficients(kind[:-len('_pass')], spec[1], sample_rate)
+    elif kind in ('low_shelf', 'high_shelf'):
+        b, a = shelf_coefficients(kind[:-len('_shelf')], spec[1], spec[2], sample_rate)
+    elif kind == 'peaking':
+        q = spec[3] if len(spec) > 3 else 1.0
+        b, a = peaking_coefficients(spec[1], spec[2], q, sample_rate)
+    else:
+        raise ValueError(f"Unknown filter type: {kind}")
+
+    section = np.zeros(6)
+    section[:len(b)] = b
+    section[3:3 + len(a)] = a
+    return section
+
+
+def design_sos(specs, sample_rate):
+    """Return the second-order-section cascade for a list of filter specs (None if empty)"""
+    if not specs:
+        return None
+    return np.array([filter_section(spec, sample_rate) for spec in specs])
+
+
+class FilterBank:
+    """
+    Compiled filter cascades for filter spec lists and named filter profiles.
+
+    Each profile is a list of filter specs (see filter_section). Cascades are
+    designed once per (spec list, sample rate) and reused, so consecutive
+    filter stages run as a single sosfilt pass. Call compile() at startup to
+    design every named profile for the expected sample rates.
+    """
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self._cascades = {}
+        self._lock = threading.Lock()
+
+    def compile(self, sample_rates):
+        """Design every profile's cascade for each sample rate"""
+        for sample_rate in sample_rates:
+            for name in self.profiles:
+                self.cascade([name], sample_rate)
+
+    def cascade(self, names, sample_rate):
+        """
+        Return the fused cascade for the named profiles, applied in order
+
+        Args:
+            names (list): Profile names
+            sample_rate (float): Sample rate in Hz
+
+        Returns:
+            np.ndarray: SOS array, or None if the profiles contain no filters
+        """
+        return self.sos([spec for name in names for spec in self.profiles[name]], sample_rate)
+
+    def sos(self, specs, sample_rate):
+        """Return the cascade for a list of filter specs (None if empty), designing it on first use"""
+        key = (tuple(tuple(spec) for spec in specs), sample_rate)
+        with self._lock:
+            if key in self._cascades:
+                return self._cascades[key]
+
+        sos = design_sos(list(key[0]), sample_rate)
+        with self._lock:
+            self._cascades[key] = sos
+        return sos
+
+
+class NoiseBank:
+    """
+    Cached shaped-noise beds for the noise stages.
+
+    Each profile is a list of filter specs (see filter_section) that shape
+    white noise. A bed is rendered once per (profile, sample rate) from a
+    seed derived from the profile name, normalized to a full-scale peak and
+    tiled to whatever length a stage needs. Noise is therefore deterministic
+    and costs a single overlay.
+    """
+
+    def __init__(self, profiles, bed_ms=DEFAULT_NOISE_BED_MS):
+        self.profiles = profiles
+        self.bed_ms = bed_ms
+        self._beds = {}
+        self._lock = threading.Lock()
+
+    def compile(self, sample_rates):
+        """Render every profile's bed for each sample rate"""
+        for sample_rate in sample_rates:
+            for name in self.profiles:
+                self.bed(name, sample_rate)
+
+    def bed(self, name, sample_rate):
+        """Return the (read-only) mono noise bed for a profile at a sample rate"""
+        key = (name, sample_rate)
+        with self._lock:
+            if key in self._beds:
+                return self._beds[key]
+
+        n = max(1, int(self.bed_ms * sample_rate / 1000))
+        # Render extra noise first so the filters have settled when the bed starts
+        settle = int(0.1 * sample_rate)
+        rng = np.random.default_rng(zlib.crc32(name.encode('utf-8')))
+        noise = rng.uniform(-1.0, 1.0, n + settle)
+
+        sos = design_sos(self.profiles[name], sample_rate)
+        if sos is not None:
+            noise = sosfilt(sos, noise)
+        noise = noise[settle:]
+        noise /= max(float(np.max(np.abs(noise))), 1e-12)
+
+        bed = noise.astype(np.float32)
+        bed.flags.writeable = False
+        with self._lock:
+            self._beds[key] = bed
+        return bed
+
+
+def design_impulse_response(spec, sample_rate):
+    """
+    Build a reverb impulse response (wet signal only, no direct sound)
+
+    Args:
+        spec (dict): Either {'taps': [(delay_ms, gain_db), ...]} for discrete
+            reflections, or a synthetic room {'decay': RT60 seconds,
+            'predelay': ms, 'damping': low-pass Hz, 'level': dB}
+        sample_rate (float): Sample rate in Hz
+
+    Returns:
+        np.ndarray: float32 impulse response
+    """
+    if 'taps' in spec:
+        # Same positions as overlaying delayed copies (ms_to_frames)
+        positions = [int(delay * sample_rate / 1000) for delay, _ in spec['taps']]
+        ir = np.zeros(max(positions) + 1, dtype=np.float32)
+        for position, (_, gain_db) in zip(positions, spec['taps']):
+            ir[position] += db_to_gain(gain_db)
+        return ir
+
+    # Exponentially decaying noise reaching -60 dB after the decay time
+    predelay = int(spec.get('predelay', 0) * sample_rate / 1000)
+    n = max(1, int(spec['decay'] * sample_rate))
+    t = np.arange(n) / sample_rate
+    rng = np.random.default_rng(zlib.crc32(repr(sorted(spec.items())).encode('utf-8')))
+    tail = rng.standard_normal(n) * np.exp(-math.log(1000.0) * t / spec['decay'])
+
+    if spec.get('damping'):
+        b, a = one_pole_coefficients('low', spec['damping'], sample_rate)
+        tail = lfilter(b, a, tail)
+
+    # Unit energy, then scaled to the requested level
+    tail *= db_to_gain(spec.get('level', 0)) / max(float(np.sqrt(np.sum(tail ** 2))), 1e-12)
+    return np.concatenate((np.zeros(predelay), tail)).astype(np.float32)
+
+
+class ReverbBank:
+    """
+    Precomputed impulse responses for the convolution reverb.
+
+    Profiles are impulse response specs (see design_impulse_response).
+    Responses are built once per (profile, sample rate), so a reverb costs a
+    single FFT convolution however many reflections the profile has.
+    """
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def compile(self, sample_rates):
+        """Build every profile's impulse response for each sample rate"""
+        for sample_rate in sample_rates:
+            for name in self.profiles:
+                self.impulse_response(name, sample_rate)
+
+    def impulse_response(self, name, sample_rate):
+        """Return the (read-only) impulse response for a profile at a sample rate"""
+        key = (name, sample_rate)
+        with self._lock:
+            if key in self._responses:
+                return self._responses[key]
+
+        ir = design_impulse_response(self.profiles[name], sample_rate)
+        ir.flags.writeable = False
+        with self._lock:
+            self._responses[key] = ir
+        return ir
+
+
+class Compressor:
+    """
+    Vectorized feed-forward dynamic range compressor.
+
+    Takes the same threshold/ratio/attack/release parameters as pydub's
+    compress_dynamic_range. The level detector is a moving RMS over the attack
+    window preceding each frame. The gain computer applies the ratio to
+    everything above threshold. The envelope follower lets gain reduction rise
+    by at most the full-scale reduction per attack time and fall by at most
+    that much per release time. Both slew limits are evaluated with running
+    max/min accumulations instead of a per-sample loop. State carries over
+    between process() calls, so a clip can be compressed in blocks.
+    """
+
+    def __init__(self, sample_rate, threshold=-20.0, ratio=4.0, attack=5.0, release=50.0):
+        self.threshold = threshold
+        self.ratio = ratio
+        self.window = max(1, int(attack * sample_rate / 1000))
+
+        # Gain reduction (dB) at full scale, used to turn attack/release times into slew rates
+        full_scale_reduction = (1.0 - 1.0 / ratio) * max(-threshold, 1.0)
+        self.attack_step = full_scale_reduction / max(1.0, attack * sample_rate / 1000)
+        self.release_step = full_scale_reduction / max(1.0, release * sample_rate / 1000)
+
+        # Detector history and follower state carried between blocks
+        self._power_history = np.zeros(self.window, dtype=np.float64)
+        self._release_state = 0.0
+        self._reduction = 0.0
+
+    def gain_reduction(self, samples):
+        """
+        Return the gain reduction in dB for each frame of a block, updating the state
+
+        Args:
+            samples (np.ndarray): Block of audio, shape (channels, n)
+
+        Returns:
+            np.ndarray: Gain reduction per frame in dB (>= 0), shape (n,)
+        """
+        n = samples.shape[-1]
+        if n == 0:
+            return np.zeros(0)
+
+        # Moving RMS over the frames preceding each frame (same window as pydub's look-behind)
+        power = np.mean(np.square(samples, dtype=np.float64), axis=0)
+        padded = np.concatenate((self._power_history, power))
+        cumulative = np.concatenate(([0.0], np.cumsum(padded)))
+        window_sum = cumulative[self.window:self.window + n] - cumulative[:n]
+        rms = np.sqrt(np.maximum(window_sum, 0.0) / self.window)
+        self._power_history = padded[-self.window:]
+
+        # Static gain computer
+        with np.errstate(divide='ignore'):
+            level_db = 20.0 * np.log10(rms)
+        target = (1.0 - 1.0 / self.ratio) * np.maximum(level_db - self.threshold, 0.0)
+
+        # Release: r[k] = max(target[k], r[k-1] - release_step)
+        steps = np.arange(1, n + 1, dtype=np.float64)
+        held = np.maximum.accumulate(np.concatenate(([self._release_state], target + steps * self.release_step)))
+        released = held[1:] - steps * self.release_step
+
+        # Attack: a[k] = min(released[k], a[k-1] + attack_step)
+        limited = np.minimum.accumulate(np.concatenate(([self._reduction], released - steps * self.attack_step)))
+        reduction = limited[1:] + steps * self.attack_step
+
+        self._release_state = float(released[-1])
+        self._reduction = float(reduction[-1])
+        return reduction
+
+    def process(self, samples):
+        """Compress a (channels, n) block in place and return it"""
+        reduction = self.gain_reduction(samples)
+        samples *= (10.0 ** (-reduction / 20.0)).astype(np.float32)
+        return samples
+
+
+class StreamingGain:
+    """Constant gain change for block streaming"""
+
+    def __init__(self, gain_db):
+        self.gain = np.float32(db_to_gain(gain_db))
+
+    def process(self, samples):
+        """Apply the gain to a (channels, n) block in place and return it"""
+        samples *= self.gain
+        return samples
+
+
+class StreamingFilter:
+    """
+    Second-order-section cascade whose filter state carries across blocks.
+
+    Like AudioBuffer.apply_sos, the state starts from the steady state for the
+    first sample of the stream, so blockwise output matches a whole-clip pass.
+    """
+
+    def __init__(self, sos):
+        self.sos = sos
+        self._state = None
+
+    def process(self, samples):
+        """Filter a (channels, n) block in place and return it"""
+        if samples.shape[-1] == 0:
+            return samples
+        if self._state is None:
+            self._state = sosfilt_zi(self.sos)[:, np.newaxis, :] * samples[np.newaxis, :, :1]
+        filtered, self._state = sosfilt(self.sos, samples, axis=-1, zi=self._state)
+        samples[...] = filtered
+        return samples
+
+
+class StreamingConvolver:
+    """
+    Overlap-add convolution with an impulse response, one block at a time.
+
+    The part of each block's response that extends past the block (the
+    reverb tail) is kept and added to the following blocks, so memory is
+    bounded by the block size plus the impulse response length. The impulse
+    response spectrum is computed once per FFT size.
+    """
+
+    def __init__(self, impulse_response, channels, wet=1.0, dry=1.0):
+        self.impulse_response = impulse_response
+        self.wet = np.float32(wet)
+        self.dry = np.float32(dry)
+        self._tail = np.zeros((channels, max(len(impulse_response) - 1, 0)), dtype=np.float32)
+        self._spectra = {}
+
+    def process(self, samples):
+        """Mix the reverberated block into a (channels, n) block in place and return it"""
+        n = samples.shape[-1]
+        if n == 0 or len(self.impulse_response) == 0:
+            return samples
+
+        size = next_fast_len(n + len(self.impulse_response) - 1, real=True)
+        if size not in self._spectra:
+            self._spectra[size] = rfft(self.impulse_response, size)
+        response = irfft(rfft(samples, size, axis=-1) * self._spectra[size], size, axis=-1)
+        response = response[:, :n + self._tail.shape[1]].astype(np.float32)
+        response[:, :self._tail.shape[1]] += self._tail
+        self._tail = response[:, n:]
+
+        if self.dry != 1.0:
+            samples *= self.dry
+        samples += response[:, :n] * self.wet
+        return samples
+
+
+class StreamingNoise:
+    """Noise bed mixed into consecutive blocks, continuing where the last block stopped"""
+
+    def __init__(self, bed, gain_db=0):
+        self.bed = bed
+        self.gain = np.float32(db_to_gain(gain_db))
+        self._position = 0
+
+    def process(self, samples):
+        """Mix the next stretch of the bed into a (channels, n) block in place and return it"""
+        n = samples.shape[-1]
+        if n and len(self.bed):
+            index = (self._position + np.arange(n)) % len(self.bed)
+            samples += self.bed[index] * self.gain
+            self._position = (self._position + n) % len(self.bed)
+        return samples
+
+
+class StreamingVoices:
+    """
+    Voice layers (see render_voices) rendered from a bounded delay line.
+
+    A voice at its natural pitch is a plain fractional delay and matches
+    render_voices exactly. A detuned voice can't keep reading further ahead of
+    (or behind) the clip without holding all of it, so it reads two taps
+    whose delay sweeps through a STREAM_VOICE_WINDOW_MS window at the rate
+    that gives its pitch ratio, crossfading as each tap wraps around (a
+    delay-line pitch shifter). Only the longest delay's worth of input is
+    kept between blocks.
+    """
+
+    def __init__(self, voices, sample_rate, channels):
+        self.window = STREAM_VOICE_WINDOW_MS * sample_rate / 1000
+        self.voices = []
+        for voice in voices:
+            sos = design_sos(voice['filters'], sample_rate) if voice.get('filters') else None
+            self.voices.append({
+                # Same ratio rounding as render_voices
+                'step': int(sample_rate * voice.get('ratio', 1.0)) / sample_rate,
+                'delay': voice.get('delay', 0) * sample_rate / 1000,
+                'gain': np.float32(db_to_gain(voice.get('gain', 0))),
+                'fade': int(voice.get('fade_in', 0) * sample_rate / 1000),
+                'sos': sos,
+                'state': np.zeros((sos.shape[0], channels, 2)) if sos is not None else None
+            })
+
+        # Input history covering the longest delay plus one frame for interpolation
+        longest = max([voice['delay'] + self.window for voice in self.voices] or [0.0])
+        self._history = np.zeros((channels, int(math.ceil(longest)) + 2), dtype=np.float32)
+        self._position = 0
+
+    def process(self, samples):
+        """Mix the voices into a (channels, n) block in place and return it"""
+        n = samples.shape[-1]
+        if n == 0 or not self.voices:
+            return samples
+
+        history = self._history.shape[1]
+        source = np.concatenate((self._history, samples), axis=-1)
+        frames = self._position + np.arange(n, dtype=np.float64)
+        mix = np.zeros_like(samples)
+
+        for voice in self.voices:
+            start = int(math.ceil(voice['delay']))
+            if voice['step'] == 1.0:
+                layer = self._tap(source, history, voice['delay'])
+            else:
+                # Two taps half a window apart, each faded out while its delay wraps around
+                sweep = frames * (1.0 - voice['step'])
+                layer = np.zeros_like(samples)
+                for offset in (0.0, self.window / 2):
+                    modulation = np.mod(sweep + offset, self.window)
+                    weight = np.sin(np.pi * modulation / self.window).astype(np.float32)
+                    layer += self._tap(source, history, voice['delay'] + modulation) * weight
+
+            # Silent until the voice's delay has passed, as in render_voices
+            layer[:, frames < start] = 0.0
+            if voice['sos'] is not None:
+                layer, voice['state'] = sosfilt(voice['sos'], layer, axis=-1, zi=voice['state'])
+                layer = layer.astype(np.float32)
+            layer *= voice['gain']
+            if voice['fade']:
+                ramp = np.clip((frames - start) / max(voice['fade'] - 1, 1), 0.0, 1.0)
+                layer *= ramp.astype(np.float32)
+            mix += layer
+
+        self._history = source[:, -history:]
+        self._position += n
+        samples += mix
+        return samples
+
+    @staticmethod
+    def _tap(source, history, delay):
+        # Linearly interpolated read delay frames behind each frame of the block
+        n = source.shape[1] - history
+        positions = history + np.arange(n, dtype=np.float64) - delay
+        index = np.floor(positions).astype(np.int64)
+        frac = (positions - index).astype(np.float32)
+        base = source[:, index]
+        return base + (source[:, index + 1] - base) * frac
+
+
+def _safe_frequency(frequency, sample_rate):
+    # Keep design frequencies below Nyquist for low working rates
+    return min(frequency, 0.45 * sample_rate)
+
+
+class AudioBuffer:
+    """
+    Mutable float32 audio with a sample rate.
+
+    Samples are stored as a (channels, samples) array scaled to [-1, 1].
+    Positions and durations are in milliseconds, like pydub. Unlike
+    AudioSegment, most operations modify the buffer in place and return it,
+    so a chain of stages does not copy the whole clip at every step.
+    """
+
+    def __init__(self, samples, sample_rate, sample_width=2):
+        samples = np.asarray(samples, dtype=np.float32)
+        if samples.ndim == 1:
+            samples = samples[np.newaxis, :]
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+
+    @classmethod
+    def from_segment(cls, segment):
+        """Decode an AudioSegment's PCM data into a new buffer"""
+        if segment.sample_width not in _PCM_DTYPES:
+            segment = segment.set_sample_width(2)
+        return cls.from_pcm(segment.raw_data, segment.frame_rate, segment.sample_width, segment.channels)
+
+    @classmethod
+    def from_pcm(cls, data, sample_rate, sample_width, channels):
+        """Decode interleaved little-endian PCM bytes (16 or 32 bit) into a new buffer"""
+        pcm = np.frombuffer(data, dtype=_PCM_DTYPES[sample_width])
+        samples = pcm.reshape(-1, channels).T.astype(np.float32)
+        samples /= float(2 ** (8 * sample_width - 1))
+        return cls(samples, sample_rate, sample_width)
+
+    @classmethod
+    def silent(cls, duration_ms, sample_rate, channels=1):
+        """Return a buffer of silence"""
+        n = int(duration_ms * sample_rate / 1000)
+        return cls(np.zeros((channels, n), dtype=np.float32), sample_rate)
+
+    @classmethod
+    def concatenate(cls, buffers, crossfade_ms=0):
+        """
+        Join buffers end to end in a single pass
+
+        Buffers are converted to the first buffer's sample rate and channel
+        count if they differ. With crossfade_ms, each join overlaps by that
+        many milliseconds using a linear crossfade.
+        """
+        first = buffers[0]
+        parts = [first.samples]
+        for buffer in buffers[1:]:
+            parts.append(buffer._conformed_to(first))
+
+        if not crossfade_ms or len(parts) == 1:
+            return cls(np.concatenate(parts, axis=1), first.sample_rate, first.sample_width)
+
+        fade_n = int(crossfade_ms * first.sample_rate / 1000)
+        total = sum(part.shape[1] for part in parts)
+        output = np.zeros((first.channels, total), dtype=np.float32)
+        position = 0
+        for index, part in enumerate(parts):
+            overlap = 0
+            if index > 0:
+                overlap = min(fade_n, position, part.shape[1])
+            if overlap:
+                # Fade the previous tail out while this head fades in
+                ramp = np.linspace(0.0, 1.0, overlap, dtype=np.float32)
+                output[:, position - overlap:position] *= 1.0 - ramp
+                output[:, position - overlap:position] += part[:, :overlap] * ramp
+            start = position - overlap
+            output[:, start + overlap:start + part.shape[1]] = part[:, overlap:]
+            position = start + part.shape[1]
+
+        return cls(output[:, :position], first.sample_rate, first.sample_width)
+
+    @property
+    def channels(self):
+        return self.samples.shape[0]
+
+    @property
+    def frame_count(self):
+        return self.samples.shape[1]
+
+    @property
+    def duration_ms(self):
+        """Length in milliseconds (rounded like len(AudioSegment))"""
+        return round(1000 * self.frame_count / self.sample_rate)
+
+    def __len__(self):
+        return self.duration_ms
+
+    def ms_to_frames(self, ms):
+        """Convert a position in milliseconds to a frame index"""
+        return int(ms * self.sample_rate / 1000)
+
+    def copy(self):
+        return AudioBuffer(self.samples.copy(), self.sample_rate, self.sample_width)
+
+    def slice(self, start_ms, end_ms=None):
+        """Return a copy of the audio between two positions"""
+        start = self.ms_to_frames(start_ms)
+        end = self.frame_count if end_ms is None else self.ms_to_frames(end_ms)
+        return AudioBuffer(self.samples[:, start:end].copy(), self.sample_rate, self.sample_width)
+
+    def region(self, start_ms, end_ms=None):
+        """
+        Return a buffer sharing this buffer's samples between two positions
+
+        In-place gain and compression on the region write through to this
+        buffer, which lets a stage process part of a clip without copying it.
+        """
+        start = self.ms_to_frames(start_ms)
+        end = self.frame_count if end_ms is None else self.ms_to_frames(end_ms)
+        return AudioBuffer(self.samples[:, start:end], self.sample_rate, self.sample_width)
+
+    def to_pcm(self):
+        """Return the samples as interleaved integer PCM at the buffer's sample width (clipping to full scale)"""
+        scale = float(2 ** (8 * self.sample_width - 1) - 1)
+        pcm = np.clip(self.samples, -1.0, 1.0) * scale
+        return pcm.T.reshape(-1).astype(_PCM_DTYPES[self.sample_width])
+
+    def to_segment(self):
+        """Convert to an AudioSegment for export"""
+        return AudioSegment(
+            data=self.to_pcm().tobytes(),
+            sample_width=self.sample_width,
+            frame_rate=int(self.sample_rate),
+            channels=self.channels
+        )
+
+    def apply_gain(self, db):
+        """Change the volume by db in place"""
+        if db:
+            self.samples *= db_to_gain(db)
+        return self
+
+    def normalize(self, headroom=0.1):
+        """Scale so the peak sits headroom dB below full scale"""
+        peak = float(np.max(np.abs(self.samples))) if self.frame_count else 0.0
+        if peak > 0:
+            self.samples *= db_to_gain(-headroom) / peak
+        return self
+
+    def fade_in(self, duration_ms):
+        """Linear fade in over the first duration_ms"""
+        n = min(self.ms_to_frames(duration_ms), self.frame_count)
+        if n > 0:
+            self.samples[:, :n] *= np.linspace(0.0, 1.0, n, dtype=np.float32)
+        return self
+
+    def overlay(self, other, position_ms=0, gain_db=0):
+        """
+        Mix other into this buffer starting at position_ms, in place
+
+        Like AudioSegment.overlay, the result keeps this buffer's length and
+        anything of other past the end is dropped.
+        """
+        start = self.ms_to_frames(position_ms)
+        if start >= self.frame_count:
+            return self
+
+        source = other._conformed_to(self)
+        n = min(source.shape[1], self.frame_count - start)
+        if gain_db:
+            self.samples[:, start:start + n] += source[:, :n] * db_to_gain(gain_db)
+        else:
+            self.samples[:, start:start + n] += source[:, :n]
+        return self
+
+    def add_noise(self, bed, gain_db=0):
+        """Mix a mono noise bed into every channel in place, tiling it to the buffer's length"""
+        if self.frame_count and len(bed):
+            repeats = -(-self.frame_count // len(bed))
+            noise = np.tile(bed, repeats)[:self.frame_count] if repeats > 1 else bed[:self.frame_count]
+            self.samples += noise * np.float32(db_to_gain(gain_db))
+        return self
+
+    def convolve(self, impulse_response, wet=1.0, dry=1.0):
+        """
+        Convolution reverb in place using FFT overlap-add
+
+        The result is dry * original + wet * (original convolved with the
+        impulse response), truncated to the buffer's length like overlay.
+        """
+        if self.frame_count and len(impulse_response):
+            reverberated = oaconvolve(self.samples, impulse_response[np.newaxis, :], axes=-1)
+            reverberated = reverberated[:, :self.frame_count]
+            if wet != 1.0:
+                reverberated *= np.float32(wet)
+            if dry != 1.0:
+                self.samples *= np.float32(dry)
+            self.samples += reverberated
+        return self
+
+    def add_voices(self, voices):
+        """Mix detuned, delayed copies of this buffer into it in place (see render_voices)"""
+        if voices and self.frame_count:
+            self.samples += render_voices(self.samples, self.sample_rate, voices)
+        return self
+
+    def set_sample_rate_label(self, sample_rate):
+        """Reinterpret the samples at a new rate without resampling (changes speed and pitch)"""
+        self.sample_rate = sample_rate
+        return self
+
+    def resample(self, sample_rate, playback=1.0):
+        """
+        Resample to a new sample rate in one step
+
+        With the default playback of 1.0 duration and pitch are kept. Other
+        values play the audio back that many times faster (shorter and higher
+        for playback > 1), like relabelling the rate before resampling.
+        """
+        if sample_rate != self.sample_rate or playback != 1.0:
+            self.samples = resample_array(self.samples, self.sample_rate * playback, sample_rate)
+            self.sample_rate = sample_rate
+        return self
+
+    def stretch(self, sample_rate, tempo=1.0, pitch=1.0):
+        """
+        Change tempo and pitch independently and convert to sample_rate
+
+        The clip is time-stretched with WSOLA so that a single resample to
+        sample_rate, played back pitch times faster, gives the requested pitch
+        at the requested tempo. When tempo and pitch change together (within
+        WSOLA_MIN_RATE_CHANGE) the stretch is skipped and the resample alone
+        plays the clip back at the requested tempo.
+        """
+        stretch_rate = tempo / pitch
+        if abs(stretch_rate - 1.0) < WSOLA_MIN_RATE_CHANGE:
+            return self.resample(sample_rate, playback=tempo)
+
+        samples = time_stretch(self.samples, self.sample_rate, stretch_rate)
+        if sample_rate != self.sample_rate or pitch != 1.0:
+            samples = resample_array(samples, self.sample_rate * pitch, sample_rate)
+        self.samples = samples
+        self.sample_rate = sample_rate
+        return self
+
+    def shifted(self, ratio):
+        """
+        Return a copy played back ratio times faster (pitch up and shorter for ratio > 1)
+
+        Equivalent to spawning the samples at frame_rate * ratio and converting
+        back to this buffer's frame rate.
+        """
+        samples = resample_array(self.samples, int(self.sample_rate * ratio), self.sample_rate)
+        return AudioBuffer(samples, self.sample_rate, self.sample_width)
+
+    def low_pass_filter(self, cutoff):
+        """One-pole low-pass filter (same response as pydub's low_pass_filter)"""
+        return self._apply_one_pole('low', cutoff)
+
+    def high_pass_filter(self, cutoff):
+        """One-pole high-pass filter (same response as pydub's high_pass_filter)"""
+        return self._apply_one_pole('high', cutoff)
+
+    def low_shelf_filter(self, cutoff, gain_db):
+        """Boost or cut frequencies below cutoff by gain_db"""
+        return self._apply_biquad(*shelf_coefficients('low', cutoff, gain_db, self.sample_rate))
+
+    def high_shelf_filter(self, cutoff, gain_db):
+        """Boost or cut frequencies above cutoff by gain_db"""
+        return self._apply_biquad(*shelf_coefficients('high', cutoff, gain_db, self.sample_rate))
+
+    def peaking_filter(self, center, gain_db, q=1.0):
+        """Boost or cut a band around center by gain_db"""
+        return self._apply_biquad(*peaking_coefficients(center, gain_db, q, self.sample_rate))
+
+    def apply_sos(self, sos):
+        """Run a second-order-section cascade over the buffer in one pass"""
+        if sos is not None and self.frame_count:
+            # Start from the steady state for the first sample to avoid a click
+            initial = sosfilt_zi(sos)[:, np.newaxis, :] * self.samples[np.newaxis, :, :1]
+            self.samples, _ = sosfilt(sos, self.samples, axis=-1, zi=initial)
+            self.samples = self.samples.astype(np.float32, copy=False)
+        return self
+
+    def compress_dynamic_range(self, threshold=-20.0, ratio=4.0, attack=5.0, release=50.0):
+        """Vectorized dynamic range compression in place (see Compressor)"""
+        Compressor(self.sample_rate, threshold, ratio, attack, release).process(self.samples)
+        return self
+
+    def process_blocks(self, processors, block_frames=DEFAULT_BLOCK_FRAMES):
+        """
+        Stream the buffer through stateful processors block by block, in place
+
+        Each block passes through every processor before the next block
+        starts, so the chain needs working memory for one block (plus each
+        processor's own state) instead of a full-length copy per stage.
+
+        Args:
+            processors (list): Objects with a process(samples) method that
+                transforms a (channels, n) block in place, carrying state to
+                the next call (e.g. Compressor, StreamingFilter)
+            block_frames (int): Frames per block
+        """
+        for start in range(0, self.frame_count, block_frames):
+            block = self.samples[:, start:start + block_frames]
+            for processor in processors:
+                processor.process(block)
+        return self
+
+    def _apply_one_pole(self, kind, cutoff):
+        b, a = one_pole_coefficients(kind, cutoff, self.sample_rate)
+        if self.frame_count:
+            # pydub starts the recursion with y[0] = x[0]
+            initial = (1.0 - b[0]) * self.samples[:, :1]
+            self.samples, _ = lfilter(b, a, self.samples, axis=-1, zi=initial)
+            self.samples = self.samples.astype(np.float32, copy=False)
+        return self
+
+    def _apply_biquad(self, b, a):
+        if self.frame_count:
+            self.samples = lfilter(b, a, self.samples, axis=-1).astype(np.float32, copy=False)
+        return self
+
+    def _conformed_to(self, other):
+        # Samples of this buffer at other's sample rate and channel count
+        samples = self.samples
+        if self.sample_rate != other.sample_rate:
+            samples = resample_array(samples, self.sample_rate, other.sample_rate)
+        if self.channels != other.channels:
+            mono = samples.mean(axis=0, keepdims=True)
+            samples = np.repeat(mono, other.channels, axis=0)
+        return samples
+
+
+class AudioAssembler:
+    """
+    Builds a new buffer from ranges of a source buffer, silences and processed pieces.
+
+    Ranges are recorded as views into the source and silences as frame
+    counts. render() writes every piece into one preallocated output, so
+    assembling a clip from many pieces is a single linear pass.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.frame_count = 0
+        self._pieces = []
+
+    def add_range(self, start_ms, end_ms=None):
+        """Append the source audio between two positions (same bounds as source.slice)"""
+        return self._add(self.source.region(start_ms, end_ms).samples)
+
+    def add_silence(self, duration_ms):
+        """Append silence"""
+        return self._add(None, self.source.ms_to_frames(duration_ms))
+
+    def add_buffer(self, buffer):
+        """Append a processed buffer (converted to the source's rate and channels if needed)"""
+        return self._add(buffer._conformed_to(self.source))
+
+    def render(self):
+        """Return the assembled audio as a new buffer"""
+        output = np.zeros((self.source.channels, self.frame_count), dtype=np.float32)
+        position = 0
+        for samples, n in self._pieces:
+            if samples is not None:
+                output[:, position:position + n] = samples
+            position += n
+        return AudioBuffer(output, self.source.sample_rate, self.source.sample_width)
+
+    def _add(self, samples, n=None):
+        if samples is not None:
+            n = samples.shape[1]
+        n = max(n, 0)
+        self._pieces.append((samples, n))
+        self.frame_count += n
+        return self
+
+
+class TailMixer:
+    """
+    Joins consecutive segments whose effects ring on past their end.
+
+    Each segment can come with a tail: the ring-out of its echo, reverb or
+    voice layers past its last frame. mix() adds the tails still pending into
+    the start of the next segment, as if the segments had been processed as
+    one clip, and carries whatever is longer than that segment on to the
+    ones after it. What is still pending after the last segment is dropped,
+    just as whole-clip renders cut their tails at the end of the clip.
+    """
+
+    def __init__(self):
+        # Ring-out still to be mixed into the next segments, shape (channels, n)
+        self._pending = None
+
+    def mix(self, segment, tail=None):
+        """
+        Return segment with the pending tails mixed into its start
+
+        The segment is copied only if something is mixed into it, so cached
+        segments can be passed in. Its own tail is queued for what follows.
+
+        Args:
+            segment (AudioBuffer): The next segment
+            tail (AudioBuffer): Its ring-out past the end, or None
+
+        Returns:
+            AudioBuffer: The segment to output
+        """
+        pending = self._pending
+        if pending is not None and segment.frame_count:
+            n = min(pending.shape[1], segment.frame_count)
+            samples = segment.samples.copy()
+            samples[:, :n] += pending[:, :n]
+            segment = AudioBuffer(samples, segment.sample_rate, segment.sample_width)
+            pending = pending[:, n:] if n < pending.shape[1] else None
+
+        if tail is not None and tail.frame_count:
+            queued = tail._conformed_to(segment)
+            if pending is not None:
+                # Both still ringing: sum them over the longer of the two
+                total = np.zeros((segment.channels, max(pending.shape[1], queued.shape[1])), dtype=np.float32)
+                total[:, :pending.shape[1]] += pending
+                total[:, :queued.shape[1]] += queued
+                queued = total
+            pending = queued
+        self._pending = pending
+        return segment
@@ -0,0 +1,296 @@
+import os
+import stat
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# Default disk quota for generated audio files (1 GB)
+DEFAULT_AUDIO_STORE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Default time a file is kept after it was last written or fetched (24 hours)
+DEFAULT_AUDIO_TTL_SECONDS = 24 * 60 * 60
+
+# Default seconds between background sweeps
+DEFAULT_SWEEP_INTERVAL_SECONDS = 60
+
+
+class AudioStore:
+    """
+    Quota-managed store for the generated audio files served from static/audio.
+
+    Files are spread over shard directories named after the first two hex
+    digits of a hash of the filename. Each file's last access (write or
+    fetch) is kept in its atime, so recency survives restarts and is shared
+    by every worker writing to the same folder, while the mtime keeps
+    identifying the file's content. A sweep deletes files not accessed
+    within the TTL, then least-recently-used files until the store is back
+    under its quota. Files named by a reference source (e.g. the
+    render cache) are exempt from the TTL and are only evicted for the quota
+    once no unreferenced file is left; files still being written are never
+    evicted.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_AUDIO_STORE_MAX_BYTES, ttl_seconds=DEFAULT_AUDIO_TTL_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # relative name -> (size in bytes, last access time), ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._pending = set()
+        self._reference_sources = []
+        self._removal_listeners = []
+        self._lock = threading.Lock()
+
+        self._stop = threading.Event()
+        self._sweeper = None
+
+        self.ttl_evictions = 0
+        self.quota_evictions = 0
+        self.referenced_evictions = 0
+        self.bytes_freed = 0
+        self.sweeps = 0
+        self.last_sweep_ms = 0.0
+
+        # Create the store directory if it doesn't exist
+        if not os.path.exists(self.root):
+            os.makedirs(self.root)
+
+        self._load_index()
+
+    def allocate(self, filename):
+        """Reserve a sharded name for a new file and return it (relative to the store root)"""
+        shard = hashlib.md5(filename.encode('utf-8')).hexdigest()[:2]
+        name = f"{shard}/{filename}"
+        os.makedirs(os.path.join(self.root, shard), exist_ok=True)
+        with self._lock:
+            self._pending.add(name)
+        return name
+
+    def path_for(self, name):
+        """Return the full path of a stored file"""
+        return os.path.join(self.root, *name.split('/'))
+
+    def add(self, name):
+        """Register a file once it has been written and evict old files if over the quota"""
+        try:
+            size = os.path.getsize(self.path_for(name))
+        except OSError as e:
+            logging.warning(f"Failed to register audio file {name}: {str(e)}")
+            self.discard(name)
+            return
+
+        referenced = self._referenced()
+        with self._lock:
+            self._pending.discard(name)
+            if name in self._entries:
+                self._total_bytes -= self._entries.pop(name)[0]
+            self._entries[name] = (size, time.time())
+            self._total_bytes += size
+            self._evict_over_quota(referenced)
+
+    def discard(self, name):
+        """Delete a file that was allocated but not completed (or is no longer wanted)"""
+        with self._lock:
+            self._pending.discard(name)
+            registered = name in self._entries
+            if registered:
+                self._total_bytes -= self._entries.pop(name)[0]
+        try:
+            os.unlink(self.path_for(name))
+        except OSError:
+            pass
+        if registered:
+            self._notify_removed(name)
+
+    def contains(self, name):
+        """Return whether the store holds a completed file by this name"""
+        with self._lock:
+            if name in self._entries:
+                return True
+            if name in self._pending:
+                return False
+        # Written by another worker since the last sweep
+        return os.path.isfile(self.path_for(name))
+
+    def touch(self, name):
+        """Mark a stored file as just accessed; returns False if the store doesn't hold it"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return False
+            now = time.time()
+            self._entries[name] = (entry[0], now)
+            self._entries.move_to_end(name)
+        try:
+            # Keep recency in the atime so it survives restarts and is seen by other workers
+            path = self.path_for(name)
+            os.utime(path, (now, os.stat(path).st_mtime))
+        except OSError:
+            pass
+        return True
+
+    def add_reference_source(self, source):
+        """Register a callable returning names of files that should be kept while possible"""
+        self._reference_sources.append(source)
+
+    def add_removal_listener(self, listener):
+        """Register a callable invoked with the name of every stored file that is deleted"""
+        self._removal_listeners.append(listener)
+
+    def sweep(self):
+        """Delete expired files, then least-recently-used files until under the quota"""
+        start = time.perf_counter()
+        referenced = self._referenced()
+
+        # Pick up files written or deleted by other workers since the last sweep
+        self._load_index()
+
+        with self._lock:
+            if self.ttl_seconds and self.ttl_seconds > 0:
+                cutoff = time.time() - self.ttl_seconds
+                for name, (size, accessed) in list(self._entries.items()):
+                    if accessed >= cutoff:
+                        # Entries are in access order, so the rest are newer
+                        break
+                    if name not in referenced:
+                        self._remove(name)
+                        self.ttl_evictions += 1
+
+            self._evict_over_quota(referenced)
+
+            self.sweeps += 1
+            self.last_sweep_ms = (time.perf_counter() - start) * 1000
+
+    def start_sweeper(self, interval=DEFAULT_SWEEP_INTERVAL_SECONDS):
+        """Sweep on a background daemon thread every interval seconds"""
+        if self._sweeper is not None or not interval or interval <= 0:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logging.warning(f"Error sweeping audio store: {str(e)}")
+
+        self._sweeper = threading.Thread(target=run, name='audio-store-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Stop the background sweeper thread"""
+        if self._sweeper is None:
+            return
+        self._stop.set()
+        self._sweeper.join()
+        self._sweeper = None
+        self._stop.clear()
+
+    def get_stats(self):
+        """Return eviction and sweep counters and current disk usage"""
+        with self._lock:
+            oldest = next(iter(self._entries.values()), None)
+            return {
+                'files': len(self._entries),
+                'pending': len(self._pending),
+                'size_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'oldest_access_age_s': time.time() - oldest[1] if oldest else 0.0,
+                'ttl_evictions': self.ttl_evictions,
+                'quota_evictions': self.quota_evictions,
+                'referenced_evictions': self.referenced_evictions,
+                'bytes_freed': self.bytes_freed,
+                'sweeps': self.sweeps,
+                'last_sweep_ms': self.last_sweep_ms,
+                'sweeper_running': self._sweeper is not None
+            }
+
+    def _referenced(self):
+        # Collected without holding self._lock, since sources take their own locks
+        referenced = set()
+        for source in self._reference_sources:
+            try:
+                referenced.update(source())
+            except Exception as e:
+                logging.warning(f"Error reading audio store references: {str(e)}")
+        return referenced
+
+    def _evict_over_quota(self, referenced):
+        # Caller must hold self._lock
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        # Least recently used unreferenced files first
+        for name in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                return
+            if name not in referenced:
+                self._remove(name)
+                self.quota_evictions += 1
+
+        # Still over: referenced files too (caches drop entries whose file is gone)
+        for name in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                return
+            self._remove(name)
+            self.referenced_evictions += 1
+
+    def _remove(self, name):
+        # Caller must hold self._lock
+        size, _ = self._entries.pop(name)
+        self._total_bytes -= size
+        self.bytes_freed += size
+        try:
+            os.unlink(self.path_for(name))
+        except OSError:
+            pass
+        self._notify_removed(name)
+
+    def _notify_removed(self, name):
+        for listener in self._removal_listeners:
+            try:
+                listener(name)
+            except Exception as e:
+                logging.warning(f"Error notifying audio store listener: {str(e)}")
+
+    def _load_index(self):
+        # Rebuild the LRU order from the files on disk, including unsharded files
+        # written to the root of the folder before the store existed
+        found = []
+        try:
+            top_level = os.listdir(self.root)
+        except OSError as e:
+            logging.warning(f"Failed to scan audio store {self.root}: {str(e)}")
+            return
+
+        for entry in top_level:
+            path = os.path.join(self.root, entry)
+            if os.path.isdir(path):
+                try:
+                    names = [(f"{entry}/{name}", os.path.join(path, name)) for name in os.listdir(path)]
+                except OSError:
+                    continue
+            else:
+                names = [(entry, path)]
+            for name, file_path in names:
+                try:
+                    info = os.stat(file_path)
+                except OSError:
+                    continue
+                if stat.S_ISREG(info.st_mode):
+                    found.append((max(info.st_atime, info.st_mtime), name, info.st_size))
+
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            for accessed, name, size in sorted(found):
+                if name in self._pending:
+                    continue
+                self._entries[name] = (size, accessed)
+                self._total_bytes += size
+
+        logging.debug(f"Loaded audio store index: {len(self._entries)} files, {self._total_bytes} bytes")
@@ -0,0 +1,128 @@
+"""
+Benchmark the speech processing pipeline without network access.
+
+Renders a fixed text through TextToSpeechService with the offline synthesis
+backend for a set of emotion/voice/effect combinations and reports the
+wall-clock time of each render. With --profiles it instead encodes one
+render with every output profile and reports file sizes and encode times.
+
+Usage:
+    python benchmark.py --words 200 --repeat 3 --format wav
+    python benchmark.py --words 200 --profiles
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import statistics
+
+from tts_service import TextToSpeechService, EMOTION_PARAMETERS, AUDIO_EFFECTS
+from codec import OUTPUT_PROFILES
+
+SAMPLE_SENTENCES = [
+    "Please listen carefully, as our menu options have recently changed.",
+    "This is a very important notice about your account.",
+    "Would you like to hear these options again?",
+    "Our team is always happy to help you with anything you need.",
+    "Press one for billing, two for support, or stay on the line.",
+]
+
+
+def build_text(words):
+    """Return a deterministic text of roughly the given word count"""
+    text_words = []
+    index = 0
+    while len(text_words) < words:
+        text_words.extend(SAMPLE_SENTENCES[index % len(SAMPLE_SENTENCES)].split())
+        index += 1
+    return ' '.join(text_words[:words])
+
+
+def build_cases():
+    """Return (label, generate_speech kwargs) pairs covering the pipeline stages"""
+    cases = [('neutral', {})]
+    for emotion in EMOTION_PARAMETERS:
+        if emotion != 'neutral':
+            cases.append((f"emotion={emotion}", {'emotion': emotion}))
+    for effect in AUDIO_EFFECTS:
+        if effect != 'none':
+            cases.append((f"effect={effect}", {'audio_effect': effect}))
+    cases.append(('prosody=expressive', {'prosody_level': 'expressive'}))
+    cases.append(('all_enhancements', {
+        'emotion': 'happy',
+        'voice_type': 'female',
+        'prosody_level': 'natural',
+        'sentence_analysis': True,
+        'voice_layering': True,
+        'spectral_enhancement': True
+    }))
+    return cases
+
+
+def benchmark_profiles(service, text, repeat):
+    """Print the encoded size, bitrate and encode time of the same render for every output profile"""
+    print(f"{'profile':<16}{'format':>8}{'bitrate':>9}{'size KB':>10}{'kbps':>8}{'encode ms':>11}")
+    for profile in OUTPUT_PROFILES:
+        timings = []
+        result = None
+        for _ in range(repeat):
+            result = service.generate_speech(text, profile=profile)
+            if not result['success']:
+                print(f"{profile:<16}failed: {result['error']}", file=sys.stderr)
+                break
+            timings.append(result['encode_ms'])
+        else:
+            kbps = result['size_bytes'] * 8 / result['duration'] / 1000
+            print(f"{profile:<16}{result['format']:>8}{result['bitrate'] or '-':>9}"
+                  f"{result['size_bytes'] / 1024:>10.1f}{kbps:>8.1f}{statistics.median(timings):>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the TTS processing pipeline offline')
+    parser.add_argument('--words', type=int, default=100, help='Words of input text')
+    parser.add_argument('--repeat', type=int, default=3, help='Renders per case')
+    parser.add_argument('--format', default='wav', help="Output format ('wav' or 'mp3')")
+    parser.add_argument('--case', action='append', help='Only run cases whose label contains this')
+    parser.add_argument('--profiles', action='store_true',
+                        help='Report size and encode time per output profile instead of render times')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    work_dir = tempfile.mkdtemp(prefix='tts_benchmark_')
+    try:
+        static_folder = os.path.join(work_dir, 'static')
+        # Disable output caches so repeats measure the full pipeline
+        service = TextToSpeechService(static_folder, backend='offline', render_cache_entries=0)
+        text = build_text(args.words)
+
+        if args.profiles:
+            benchmark_profiles(service, text, args.repeat)
+            return
+
+        print(f"{'case':<28}{'median ms':>12}{'min ms':>10}{'duration s':>12}")
+        for label, kwargs in build_cases():
+            if args.case and not any(pattern in label for pattern in args.case):
+                continue
+
+            timings = []
+            result = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = service.generate_speech(text, format=args.format, **kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+                if not result['success']:
+                    print(f"{label:<28}failed: {result['error']}", file=sys.stderr)
+                    break
+            else:
+                print(f"{label:<28}{statistics.median(timings):>12.1f}{min(timings):>10.1f}"
+                      f"{result['duration']:>12.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,468 @@
+import io
+import time
+import wave
+import struct
+import logging
+import threading
+
+import numpy as np
+from pydub import AudioSegment
+
+from audio_engine import AudioBuffer
+
+try:
+    import av
+except ImportError:
+    # Declared as a dependency; without it, compressed formats go through pydub (one ffmpeg process per call)
+    av = None
+
+# Encodes/decodes allowed to run at once per codec
+DEFAULT_CODEC_CONCURRENCY = 4
+
+# PyAV container and encoder for each compressed export format
+AV_FORMATS = {
+    'mp3': ('mp3', 'libmp3lame'),
+    'ogg': ('ogg', 'libopus')
+}
+
+# Encoder options per format: constrained VBR keeps Opus files close to the nominal bitrate
+AV_CODEC_OPTIONS = {
+    'ogg': {'vbr': 'constrained'}
+}
+
+# Extra encoder options for fast encodes (previews): lowest encoder complexity for the same bitrate
+AV_FAST_CODEC_OPTIONS = {
+    'mp3': {'compression_level': '9'},
+    'ogg': {'compression_level': '0'}
+}
+
+# Encoder for compressed formats when falling back to pydub/ffmpeg
+PYDUB_CODECS = {
+    'ogg': 'libopus'
+}
+
+# Content type of each export format
+FORMAT_MIMETYPES = {
+    'mp3': 'audio/mpeg',
+    'ogg': 'audio/ogg',
+    'wav': 'audio/wav'
+}
+
+# Sample rates Opus can encode at (others are resampled to 48 kHz)
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# Accepted range for per-request bitrate overrides (bits per second)
+MIN_BITRATE = 8000
+MAX_BITRATE = 320000
+
+# Output profiles: export format, bitrate and channel count (None keeps the source's channels).
+# Mono speech needs far less than music: 32-64k MP3 or 16-32k Opus.
+OUTPUT_PROFILES = {
+    # Default: mono MP3 at a speech bitrate, playable everywhere
+    'speech': {'format': 'mp3', 'bitrate': '48k', 'channels': 1},
+    # Smallest: mono Opus in Ogg
+    'speech_opus': {'format': 'ogg', 'bitrate': '24k', 'channels': 1},
+    'mp3_32': {'format': 'mp3', 'bitrate': '32k', 'channels': 1},
+    'mp3_48': {'format': 'mp3', 'bitrate': '48k', 'channels': 1},
+    'mp3_64': {'format': 'mp3', 'bitrate': '64k', 'channels': 1},
+    # The previous fixed export setting
+    'mp3_192': {'format': 'mp3', 'bitrate': '192k', 'channels': None},
+    'opus_16': {'format': 'ogg', 'bitrate': '16k', 'channels': 1},
+    'opus_24': {'format': 'ogg', 'bitrate': '24k', 'channels': 1},
+    'opus_32': {'format': 'ogg', 'bitrate': '32k', 'channels': 1},
+    # Uncompressed
+    'wav': {'format': 'wav', 'bitrate': None, 'channels': None}
+}
+
+DEFAULT_OUTPUT_PROFILE = 'speech'
+
+
+def parse_bitrate(bitrate):
+    """Convert a bitrate like '192k' (or a number of bits per second) to bits per second"""
+    if isinstance(bitrate, str) and bitrate.lower().endswith('k'):
+        return int(float(bitrate[:-1]) * 1000)
+    return int(bitrate)
+
+
+def resolve_output_profile(profile=None, format=None, bitrate=None):
+    """
+    Return the export settings for a request
+
+    Args:
+        profile (str): An OUTPUT_PROFILES name (None picks one from format)
+        format (str): Legacy format option: 'wav' selects the wav profile,
+            'ogg'/'opus' speech_opus and anything else the speech profile
+        bitrate (str): Optional override of the profile's bitrate (e.g., '64k')
+
+    Returns:
+        dict: 'profile', 'format', 'bitrate' and 'channels'
+    """
+    if profile is None:
+        format = (format or '').lower()
+        if format == 'wav':
+            profile = 'wav'
+        elif format in ('ogg', 'opus'):
+            profile = 'speech_opus'
+        else:
+            profile = DEFAULT_OUTPUT_PROFILE
+    elif profile not in OUTPUT_PROFILES:
+        logging.warning(f"Unsupported output profile: {profile}. Falling back to {DEFAULT_OUTPUT_PROFILE}.")
+        profile = DEFAULT_OUTPUT_PROFILE
+
+    settings = dict(OUTPUT_PROFILES[profile], profile=profile)
+    if bitrate is not None and settings['format'] != 'wav':
+        try:
+            bits = max(MIN_BITRATE, min(MAX_BITRATE, parse_bitrate(bitrate)))
+            settings['bitrate'] = f"{bits // 1000}k"
+        except (ValueError, TypeError):
+            logging.warning(f"Invalid bitrate: {bitrate}. Using the profile's {settings['bitrate']}.")
+    return settings
+
+
+def prepare_for_export(audio, format, channels=None):
+    """Return the audio downmixed to the channel count and at a sample rate the format can encode"""
+    if channels == 1 and audio.channels > 1:
+        audio = AudioBuffer(audio.samples.mean(axis=0, keepdims=True), audio.sample_rate, audio.sample_width)
+    if format == 'ogg' and int(audio.sample_rate) not in OPUS_SAMPLE_RATES:
+        # Resample a view, leaving the caller's buffer untouched
+        audio = audio.region(0).resample(48000)
+    return audio
+
+
+def _pcm_frame(audio):
+    # Packed 16-bit PCM as one frame; encoders split it into codec frames
+    layout = 'mono' if audio.channels == 1 else 'stereo'
+    pcm = np.clip(audio.samples, -1.0, 1.0) * 32767.0
+    frame = av.AudioFrame.from_ndarray(pcm.T.reshape(1, -1).astype(np.int16), format='s16', layout=layout)
+    frame.sample_rate = int(audio.sample_rate)
+    return frame
+
+
+class AudioCodec:
+    """
+    Encoder/decoder for rendered and synthesized audio.
+
+    WAV is read and written in process with the wave module. Compressed
+    formats use PyAV's in-process FFmpeg libraries instead of pydub's
+    fork+exec of an ffmpeg binary per call, and fall back to pydub (with a
+    warning) if PyAV is missing or fails. A semaphore bounds how many
+    encodes/decodes run at once. Every call reports its duration, and the
+    codec keeps per-operation counters for get_stats().
+    """
+
+    def __init__(self, max_concurrent=DEFAULT_CODEC_CONCURRENCY, use_av=True):
+        self.use_av = use_av and av is not None
+        if use_av and av is None:
+            logging.warning("PyAV is not installed; encoding and decoding compressed audio through pydub "
+                            "(one ffmpeg process per call). Install the 'av' package.")
+        self.max_concurrent = max(1, max_concurrent)
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+
+        # (operation, implementation) -> [calls, total ms, max ms]
+        self._timings = {}
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def encode(self, audio, format='mp3', bitrate='192k', channels=None, fast=False):
+        """
+        Encode a buffer
+
+        Args:
+            audio (AudioBuffer): The audio to encode
+            format (str): 'mp3', 'ogg' (Opus) or 'wav'
+            bitrate (str): Bitrate for compressed formats (e.g., '48k')
+            channels (int): Channel count to downmix to (None keeps the buffer's)
+            fast (bool): Whether to trade encoding quality for speed (used for previews)
+
+        Returns:
+            tuple: (encoded bytes, elapsed milliseconds)
+        """
+        format = format.lower()
+        with self._slots:
+            start = time.perf_counter()
+            audio = prepare_for_export(audio, format, channels)
+            if format == 'wav':
+                implementation = 'wave'
+                data = self._encode_wav(audio)
+            else:
+                implementation, data = self._encode_compressed(audio, format, bitrate, fast)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record('encode', implementation, elapsed_ms)
+        logging.debug(f"Encoded {format} ({len(data)} bytes) with {implementation} in {elapsed_ms:.1f} ms")
+        return data, elapsed_ms
+
+    def export(self, audio, path, format='mp3', bitrate='192k', channels=None):
+        """Encode a buffer to a file and return the elapsed milliseconds"""
+        data, elapsed_ms = self.encode(audio, format=format, bitrate=bitrate, channels=channels)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return elapsed_ms
+
+    def stream_encoder(self, format='mp3', bitrate='192k', channels=None, path=None):
+        """Return a StreamEncoder that encodes consecutive buffers as one continuous stream"""
+        return StreamEncoder(self, format.lower(), bitrate, channels=channels, path=path)
+
+    def decode(self, source, format=None):
+        """
+        Decode encoded audio into a buffer
+
+        Args:
+            source (str or bytes): A file path or the encoded bytes
+            format (str): Container format (None guesses from the path's extension or the data)
+
+        Returns:
+            tuple: (AudioBuffer, elapsed milliseconds)
+        """
+        if format is None and isinstance(source, str):
+            format = source.rsplit('.', 1)[-1].lower() if '.' in source else None
+        with self._slots:
+            start = time.perf_counter()
+            if format == 'wav':
+                implementation = 'wave'
+                audio = self._decode_wav(source)
+            else:
+                implementation, audio = self._decode_compressed(source, format)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        self._record('decode', implementation, elapsed_ms)
+        logging.debug(f"Decoded {format or 'audio'} with {implementation} in {elapsed_ms:.1f} ms")
+        return audio, elapsed_ms
+
+    def get_stats(self):
+        """Return call counts and timings per operation and implementation"""
+        with self._lock:
+            stats = {
+                'implementation': 'av' if self.use_av else 'pydub',
+                'max_concurrent': self.max_concurrent,
+                'fallbacks': self.fallbacks
+            }
+            for (operation, implementation), (calls, total_ms, max_ms) in sorted(self._timings.items()):
+                stats[f"{operation}_{implementation}"] = {
+                    'calls': calls,
+                    'avg_ms': total_ms / calls,
+                    'max_ms': max_ms
+                }
+            return stats
+
+    def _record(self, operation, implementation, elapsed_ms):
+        with self._lock:
+            timing = self._timings.setdefault((operation, implementation), [0, 0.0, 0.0])
+            timing[0] += 1
+            timing[1] += elapsed_ms
+            timing[2] = max(timing[2], elapsed_ms)
+
+    def _encode_compressed(self, audio, format, bitrate, fast=False):
+        # PyAV in process when available, pydub otherwise or if PyAV fails
+        if self.use_av and format in AV_FORMATS:
+            try:
+                return 'av', self._encode_av(audio, format, bitrate, fast)
+            except Exception as e:
+                logging.warning(f"Error encoding {format} with PyAV, falling back to pydub: {str(e)}")
+                with self._lock:
+                    self.fallbacks += 1
+        output = io.BytesIO()
+        audio.to_segment().export(output, format=format, bitrate=bitrate, codec=PYDUB_CODECS.get(format))
+        return 'pydub', output.getvalue()
+
+    def _decode_compressed(self, source, format):
+        if self.use_av:
+            try:
+                return 'av', self._decode_av(source, format)
+            except Exception as e:
+                logging.warning(f"Error decoding {format or 'audio'} with PyAV, falling back to pydub: {str(e)}")
+                with self._lock:
+                    self.fallbacks += 1
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        return 'pydub', AudioBuffer.from_segment(AudioSegment.from_file(source, format=format))
+
+    @staticmethod
+    def _encode_wav(audio):
+        output = io.BytesIO()
+        with wave.open(output, 'wb') as wav_file:
+            wav_file.setnchannels(audio.channels)
+            wav_file.setsampwidth(audio.sample_width)
+            wav_file.setframerate(int(audio.sample_rate))
+            wav_file.writeframes(audio.to_pcm().tobytes())
+        return output.getvalue()
+
+    @staticmethod
+    def _decode_wav(source):
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        with wave.open(source, 'rb') as wav_file:
+            channels = wav_file.getnchannels()
+            sample_width = wav_file.getsampwidth()
+            sample_rate = wav_file.getframerate()
+            data = wav_file.readframes(wav_file.getnframes())
+        return AudioBuffer.from_pcm(data, sample_rate, sample_width, channels)
+
+    @staticmethod
+    def _encode_av(audio, format, bitrate, fast=False):
+        container_format, codec_name = AV_FORMATS[format]
+        layout = 'mono' if audio.channels == 1 else 'stereo'
+        options = dict(AV_CODEC_OPTIONS.get(format, {}))
+        if fast:
+            options.update(AV_FAST_CODEC_OPTIONS.get(format, {}))
+        output = io.BytesIO()
+        with av.open(output, 'w', format=container_format) as container:
+            stream = container.add_stream(codec_name, rate=int(audio.sample_rate), layout=layout,
+                                          options=options)
+            stream.bit_rate = parse_bitrate(bitrate)
+            for packet in stream.encode(_pcm_frame(audio)):
+                container.mux(packet)
+            for packet in stream.encode(None):
+                container.mux(packet)
+        return output.getvalue()
+
+    @staticmethod
+    def _decode_av(source, format):
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        with av.open(source, 'r', format=format) as container:
+            stream = container.streams.audio[0]
+            # Planar float frames are already in AudioBuffer's (channels, n) layout
+            resampler = av.AudioResampler(format='fltp', layout=stream.layout.name, rate=stream.rate)
+            chunks = []
+            for frame in container.decode(stream):
+                chunks.extend(resampled.to_ndarray() for resampled in resampler.resample(frame))
+            chunks.extend(resampled.to_ndarray() for resampled in resampler.resample(None))
+            channels = stream.channels
+            sample_rate = stream.rate
+
+        if not chunks:
+            return AudioBuffer(np.zeros((channels, 0), dtype=np.float32), sample_rate)
+        return AudioBuffer(np.concatenate(chunks, axis=-1), sample_rate)
+
+
+class _ChunkSink:
+    # Write-only (hence non-seekable) file object collecting a muxer's output between drains
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+class StreamEncoder:
+    """
+    Incremental encoder for audio produced piece by piece.
+
+    Each call to encode() returns the bytes that are ready so far, so a
+    response can start before the whole clip has been rendered. MP3 and
+    Opus go through one continuous PyAV encoder (no per-piece headers or
+    gaps). WAV gets a header with placeholder sizes followed by raw PCM.
+    Without PyAV, pieces are encoded separately with pydub and concatenated
+    (chained MP3 files or Ogg streams), which players accept as one stream.
+    Pieces are downmixed and resampled for the format like encode()'s input.
+    If a path is given, the full stream is
+    also written there, with the WAV sizes fixed up on finish().
+    """
+
+    def __init__(self, codec, format, bitrate, channels=None, path=None):
+        self.codec = codec
+        self.format = format
+        self.bitrate = bitrate
+        self.channels = channels
+        self.bytes_written = 0
+        self._file = open(path, 'wb') if path else None
+        self._container = None
+        self._stream = None
+        self._sink = None
+        self._audio_format = None
+
+    def encode(self, audio):
+        """Encode the next piece of audio and return the encoded bytes available so far"""
+        audio = prepare_for_export(audio, self.format, self.channels)
+        if self._audio_format is None:
+            self._audio_format = (int(audio.sample_rate), audio.channels, audio.sample_width)
+            data = self._start(audio)
+        else:
+            data = b''
+
+        start = time.perf_counter()
+        with self.codec._slots:
+            if self.format == 'wav':
+                implementation = 'wave'
+                data += audio.to_pcm().tobytes()
+            elif self._container is not None:
+                implementation = 'av'
+                data += self._encode_frame(audio)
+            else:
+                implementation, encoded = self.codec._encode_compressed(audio, self.format, self.bitrate)
+                data += encoded
+        self.codec._record('stream_encode', implementation, (time.perf_counter() - start) * 1000)
+        return self._emit(data)
+
+    def finish(self):
+        """Flush the encoder and return the remaining bytes"""
+        data = b''
+        if self._container is not None:
+            for packet in self._stream.encode(None):
+                self._container.mux(packet)
+            self._container.close()
+            data = self._sink.drain()
+            self._container = None
+        data = self._emit(data)
+
+        if self._file is not None:
+            if self.format == 'wav' and self._audio_format is not None:
+                # Now that the length is known, fill in the RIFF and data chunk sizes
+                self._file.seek(4)
+                self._file.write(struct.pack('<I', self.bytes_written - 8))
+                self._file.seek(40)
+                self._file.write(struct.pack('<I', self.bytes_written - 44))
+            self._file.close()
+            self._file = None
+        return data
+
+    def close(self):
+        """Release the encoder and output file without flushing (e.g. after an error)"""
+        if self._container is not None:
+            try:
+                self._container.close()
+            except Exception as e:
+                logging.warning(f"Error closing stream encoder: {str(e)}")
+            self._container = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _start(self, audio):
+        # Write the WAV header or open the continuous MP3 encoder
+        sample_rate, channels, sample_width = self._audio_format
+        if self.format == 'wav':
+            # Placeholder sizes for a stream of unknown length
+            return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 0xFFFFFFFF, b'WAVE', b'fmt ', 16, 1,
+                               channels, sample_rate, sample_rate * channels * sample_width,
+                               channels * sample_width, 8 * sample_width, b'data', 0xFFFFFFFF)
+
+        if self.codec.use_av and self.format in AV_FORMATS:
+            try:
+                container_format, codec_name = AV_FORMATS[self.format]
+                layout = 'mono' if channels == 1 else 'stereo'
+                self._sink = _ChunkSink()
+                self._container = av.open(self._sink, 'w', format=container_format)
+                self._stream = self._container.add_stream(codec_name, rate=sample_rate, layout=layout,
+                                                          options=AV_CODEC_OPTIONS.get(self.format, {}))
+                self._stream.bit_rate = parse_bitrate(self.bitrate)
+            except Exception as e:
+                logging.warning(f"Error opening PyAV stream encoder, falling back to pydub: {str(e)}")
+                self._container = None
+        return b''
+
+    def _encode_frame(self, audio):
+        for packet in self._stream.encode(_pcm_frame(audio)):
+            self._container.mux(packet)
+        return self._sink.drain()
+
+    def _emit(self, data):
+        if data and self._file is not None:
+            self._file.write(data)
+        self.bytes_written += len(data)
+        return data
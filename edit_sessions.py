@@ -0,0 +1,103 @@
+import uuid
+import logging
+from datetime import timedelta
+
+from sqlalchemy import update
+
+from app import db
+from models import EditSession, utc_now
+from audio_store import DEFAULT_AUDIO_TTL_SECONDS
+
+
+class StaleEditError(Exception):
+    """Raised when a session changed between reading it and writing an update based on it"""
+
+
+class EditSessionStore:
+    """
+    Database-backed playground edit sessions.
+
+    A session keeps the original audio file and the ordered list of edit
+    operations applied to it. Intermediate versions exist only as prefixes
+    of that list, so any version can be rendered again straight from the
+    original, and only the current render is kept on disk. A session stays
+    live while it has been edited within ttl_seconds, and the audio store
+    keeps its files for that long (see filenames).
+    """
+
+    def __init__(self, app, ttl_seconds=DEFAULT_AUDIO_TTL_SECONDS):
+        self.app = app
+        self.ttl_seconds = ttl_seconds
+
+    def create(self, source_filename):
+        """Start a session on a source file and return it"""
+        with self.app.app_context():
+            edit_session = EditSession(id=str(uuid.uuid4()), source_filename=source_filename, edits=[])
+            db.session.add(edit_session)
+            db.session.commit()
+            return edit_session.to_dict()
+
+    def filenames(self):
+        """Return the source and rendered files of live sessions (an audio store reference source)"""
+        with self.app.app_context():
+            query = db.session.query(EditSession.source_filename, EditSession.rendered_filename)
+            if self.ttl_seconds and self.ttl_seconds > 0:
+                query = query.filter(EditSession.updated_at >= utc_now() - timedelta(seconds=self.ttl_seconds))
+            names = set()
+            for source_filename, rendered_filename in query:
+                names.add(source_filename)
+                if rendered_filename:
+                    names.add(rendered_filename)
+            return names
+
+    def get(self, session_id):
+        """Return a session, or None if it doesn't exist"""
+        with self.app.app_context():
+            edit_session = db.session.get(EditSession, session_id)
+            return edit_session.to_dict() if edit_session is not None else None
+
+    def update(self, session_id, edits, rendered_filename, expected_edits):
+        """
+        Replace a session's edit list and current render
+
+        The write only goes through if the session still has the edit list the
+        update was based on, so concurrent edits can't silently overwrite each
+        other (comparing the whole list also catches a revert followed by a new
+        edit, which leaves the version number unchanged).
+
+        Args:
+            session_id (str): Session to update
+            edits (list): The new edit list
+            rendered_filename (str): Render of the new edit list, or None for the original
+            expected_edits (list): The session's edit list when it was read
+
+        Returns:
+            tuple: (the updated session, the previously rendered filename or None),
+                or (None, None) if the session doesn't exist
+
+        Raises:
+            StaleEditError: If the session was changed since it was read
+        """
+        with self.app.app_context():
+            edit_session = db.session.get(EditSession, session_id)
+            if edit_session is None:
+                return None, None
+            if list(edit_session.edits or []) != list(expected_edits):
+                raise StaleEditError(f"Edit session {session_id} was changed by another request")
+
+            previous = edit_session.rendered_filename
+            # Conditional on the row being unchanged since it was read, so two
+            # requests that both passed the check above can't both write
+            written = db.session.execute(
+                update(EditSession)
+                .where(EditSession.id == session_id, EditSession.updated_at == edit_session.updated_at)
+                .values(edits=list(edits), rendered_filename=rendered_filename, updated_at=utc_now())
+            ).rowcount
+            if written != 1:
+                db.session.rollback()
+                raise StaleEditError(f"Edit session {session_id} was changed by another request")
+            db.session.commit()
+
+            edit_session = db.session.get(EditSession, session_id)
+            logging.debug(f"Edit session {session_id} now at version {len(edits)}")
+            return edit_session.to_dict(), previous
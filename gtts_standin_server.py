@@ -0,0 +1,114 @@
+"""
+Local stand-in for the Google Translate TTS endpoint.
+
+Answers gTTS batchexecute requests with a fixed audio clip so that synthesis
+(including parallel chunked synthesis) can be exercised without network
+access. Point the service at it with TTS_GTTS_ENDPOINT=http://127.0.0.1:<port>.
+
+Usage:
+    python gtts_standin_server.py --audio sample.mp3 --port 8765 --delay 0.2
+"""
+import json
+import time
+import base64
+import argparse
+import logging
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from synthesis_backends import GTTS_ENDPOINT_PATH
+
+
+class StandInTTSServer(ThreadingHTTPServer):
+    """Threaded HTTP server that mimics the translate TTS endpoint"""
+
+    daemon_threads = True
+
+    def __init__(self, audio_bytes, host='127.0.0.1', port=0, delay=0.0):
+        super().__init__((host, port), _StandInHandler)
+        self.audio_bytes = audio_bytes
+        self.delay = delay
+
+        # Texts received, in arrival order, plus the peak number of in-flight requests
+        self.received_texts = []
+        self.active_requests = 0
+        self.max_active_requests = 0
+        self._lock = threading.Lock()
+
+    @property
+    def endpoint(self):
+        """Base URL to pass as TTS_GTTS_ENDPOINT / tts_endpoint"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve requests on a daemon thread and return the thread"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if urllib.parse.urlparse(self.path).path != GTTS_ENDPOINT_PATH:
+            self.send_error(404)
+            return
+
+        server = self.server
+        with server._lock:
+            server.active_requests += 1
+            server.max_active_requests = max(server.max_active_requests, server.active_requests)
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length).decode('utf-8')
+            with server._lock:
+                server.received_texts.append(_extract_text(body))
+
+            if server.delay:
+                time.sleep(server.delay)
+
+            # Same framing gTTS searches for: jQ1olc","[\"<base64 audio>\"]
+            encoded = base64.b64encode(server.audio_bytes).decode('ascii')
+            payload = (
+                ")]}'\n\n"
+                f'[["wrb.fr","jQ1olc","[\\"{encoded}\\"]",null,null,null,"generic"]]\n'
+            ).encode('utf-8')
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with server._lock:
+                server.active_requests -= 1
+
+    def log_message(self, format, *args):
+        logging.debug("stand-in TTS: " + format % args)
+
+
+def _extract_text(body):
+    # Body is f.req=<quoted [[[rpc, "[text, lang, speed, null]", null, "generic"]]]>&
+    try:
+        form = urllib.parse.parse_qs(body)
+        rpc = json.loads(form['f.req'][0])
+        return json.loads(rpc[0][0][1])[0]
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local stand-in for the translate TTS endpoint')
+    parser.add_argument('--audio', required=True, help='Audio file returned for every request')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='Simulated latency per request (seconds)')
+    args = parser.parse_args()
+
+    with open(args.audio, 'rb') as f:
+        server = StandInTTSServer(f.read(), host=args.host, port=args.port, delay=args.delay)
+
+    print(f"Stand-in TTS endpoint listening on {server.endpoint}")
+    server.serve_forever()
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+
+from app import db
+
+
+def utc_now():
+    """Return the current time as a timezone-aware UTC datetime"""
+    return datetime.now(timezone.utc)
+
+
+class RenderRecord(db.Model):
+    """Metadata for one generated audio file in static/audio"""
+    __tablename__ = 'render_records'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Path relative to static/audio
+    filename = db.Column(db.String(255), unique=True, nullable=False)
+    # Render key (hash of every parameter that affects the output); None for derived renders
+    param_hash = db.Column(db.String(64), index=True)
+    # Hash of the normalized input text, to find every render of a text
+    text_hash = db.Column(db.String(64), index=True)
+    kind = db.Column(db.String(16), nullable=False, default='tts')
+    format = db.Column(db.String(8), nullable=False)
+    profile = db.Column(db.String(32))
+    bitrate = db.Column(db.String(16))
+    duration = db.Column(db.Float)
+    size_bytes = db.Column(db.Integer)
+    # File a derived render (e.g. a manipulate-audio result) was made from
+    source_filename = db.Column(db.String(255), index=True)
+    # The result returned for the render, so a lookup can answer like the render cache
+    details = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+    last_access_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+    # Set once the audio store has deleted the file
+    evicted_at = db.Column(db.DateTime, index=True)
+
+    def to_dict(self):
+        """Return the record's metadata as a JSON-serializable dict"""
+        return {
+            'filename': self.filename,
+            'param_hash': self.param_hash,
+            'text_hash': self.text_hash,
+            'kind': self.kind,
+            'format': self.format,
+            'profile': self.profile,
+            'bitrate': self.bitrate,
+            'duration': self.duration,
+            'size_bytes': self.size_bytes,
+            'source_filename': self.source_filename,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_access_at': self.last_access_at.isoformat() if self.last_access_at else None,
+            'evicted_at': self.evicted_at.isoformat() if self.evicted_at else None
+        }
+
+
+class EditSession(db.Model):
+    """A playground session: an original audio file and the ordered edit operations applied to it"""
+    __tablename__ = 'edit_sessions'
+
+    id = db.Column(db.String(36), primary_key=True)
+    # Original file the edits are rendered from (path relative to static/audio)
+    source_filename = db.Column(db.String(255), nullable=False)
+    # Edit operations (see tts_service.parse_edit) in the order they were applied
+    edits = db.Column(db.JSON, nullable=False, default=list)
+    # The current render of all the edits, if any
+    rendered_filename = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+
+    def to_dict(self):
+        """Return the session as a JSON-serializable dict"""
+        return {
+            'session_id': self.id,
+            'source_filename': self.source_filename,
+            'source_path': f'/static/audio/{self.source_filename}',
+            'edits': list(self.edits or []),
+            'version': len(self.edits or []),
+            'rendered_filename': self.rendered_filename,
+            'path': f'/static/audio/{self.rendered_filename or self.source_filename}',
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,244 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Default number of finished renders remembered per worker
+DEFAULT_RENDER_CACHE_ENTRIES = 1024
+
+# Default memory budget for per-sentence processed audio (128 MB)
+DEFAULT_SENTENCE_CACHE_BYTES = 128 * 1024 * 1024
+
+# Default memory budget for decoded source files (64 MB)
+DEFAULT_DECODED_CACHE_BYTES = 64 * 1024 * 1024
+
+
+def make_render_key(params):
+    """Return a stable hash of a render's full parameter set"""
+    canonical = json.dumps(params, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def derive_seed(params):
+    """Derive a 32-bit RNG seed from a render's parameters (excluding any seed)"""
+    unseeded = {k: v for k, v in params.items() if k != 'seed'}
+    return int(make_render_key(unseeded)[:8], 16)
+
+
+def derive_sentence_seed(seed, sentence):
+    """Derive the RNG seed for one sentence of an incremental render"""
+    return int(make_render_key({'seed': seed, 'sentence': sentence})[:8], 16)
+
+
+class RenderCache:
+    """
+    In-memory LRU cache of finished renders.
+
+    Maps a render key (hash of every parameter that affects the output,
+    including the RNG seed) to the result of the render that produced it, so
+    an identical request can return the existing file instead of re-running
+    the pipeline. Entries whose file has disappeared are dropped on lookup.
+    """
+
+    def __init__(self, audio_folder, max_entries=DEFAULT_RENDER_CACHE_ENTRIES):
+        self.audio_folder = audio_folder
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return a copy of the cached result for key, or None on a miss"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+
+            if not os.path.exists(os.path.join(self.audio_folder, result['filename'])):
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, key, result):
+        """Remember the result of a successful render"""
+        if self.max_entries <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def filenames(self):
+        """Return the filenames of the cached renders"""
+        with self._lock:
+            return {result['filename'] for result in self._entries.values()}
+
+    def get_stats(self):
+        """Return hit/miss/eviction counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries
+            }
+
+
+class SentenceCache:
+    """
+    In-memory LRU cache of processed per-sentence audio for incremental re-renders.
+
+    Keys cover the sentence text, every processing parameter and the seed,
+    so a cached segment can be spliced into any render that would have
+    produced it. Each entry holds the sentence and the ring-out of its
+    effects past its end (or None). The cache is bounded by the sample
+    memory of its buffers. Cached buffers are shared, so callers must not
+    modify them in place.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_SENTENCE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached (AudioBuffer, tail AudioBuffer or None) for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, segment, tail=None):
+        """Store a processed buffer and its tail and evict old entries if over the memory budget"""
+        size = self._entry_bytes((segment, tail))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entry_bytes(self._entries.pop(key))
+            self._entries[key] = (segment, tail)
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= self._entry_bytes(evicted)
+                self.evictions += 1
+
+    @staticmethod
+    def _entry_bytes(entry):
+        segment, tail = entry
+        return segment.samples.nbytes + (tail.samples.nbytes if tail is not None else 0)
+
+    def get_stats(self):
+        """Return hit/miss/eviction counters and current memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'size_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+
+class DecodedAudioCache:
+    """
+    In-memory LRU cache of decoded audio files.
+
+    Keys are a file's path together with its mtime and size, so a file that
+    is rewritten in place is decoded again. Lookups return a copy, since
+    the manipulation stages modify their input in place. The cache is
+    bounded by the sample memory of its buffers.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_DECODED_CACHE_BYTES):
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(path):
+        """Return the cache key for a file's current version (raises OSError if it is missing)"""
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def get(self, key, window=None):
+        """Return a copy of the cached AudioBuffer for key (or of a (start_ms, end_ms) window of it), or None on a miss"""
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return audio.slice(*window) if window else audio.copy()
+
+    def put(self, key, audio):
+        """Store a copy of a decoded buffer and evict old entries if over the memory budget"""
+        size = audio.samples.nbytes
+        if size > self.max_bytes:
+            return
+
+        audio = audio.copy()
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key).samples.nbytes
+            self._entries[key] = audio
+            self._total_bytes += size
+
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.samples.nbytes
+                self.evictions += 1
+
+    def get_stats(self):
+        """Return hit/miss/eviction counters and current memory usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'size_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,247 @@
+import time
+import queue
+import atexit
+import hashlib
+import logging
+import threading
+import unicodedata
+
+from sqlalchemy import update
+
+from app import db
+from models import RenderRecord, utc_now
+
+# Default maximum number of queued writes committed in one transaction
+DEFAULT_INDEX_BATCH_SIZE = 256
+
+# Default seconds the writer waits to fill a batch after the first queued write
+DEFAULT_INDEX_FLUSH_SECONDS = 1.0
+
+
+def make_text_hash(text):
+    """Return the hash of a text, normalized the same way as synthesis cache keys"""
+    normalized = ' '.join(unicodedata.normalize('NFC', text).split())
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class RenderIndex:
+    """
+    Database index of the generated audio files and the renders that produced them.
+
+    Every finished render is recorded with its render key, text hash,
+    duration, size, output settings and (for derived renders) the file it
+    was made from, so a repeat request can be answered from the index even
+    after a restart or by another worker. Writes are queued and committed in
+    batches by a background thread, keeping the database off the request
+    path; lookups by render key use the indexed param_hash column.
+    """
+
+    def __init__(self, app, batch_size=DEFAULT_INDEX_BATCH_SIZE, flush_interval=DEFAULT_INDEX_FLUSH_SECONDS):
+        self.app = app
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+
+        # derived filename -> source filename, for derived renders whose file still exists
+        self._derived = {}
+
+        self.lookups = 0
+        self.hits = 0
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_batch_ms = 0.0
+
+        self._load_derived()
+
+        self._writer = threading.Thread(target=self._run, name='render-index-writer', daemon=True)
+        self._writer.start()
+
+        # Commit what is still queued when the process exits
+        atexit.register(self.flush)
+
+    def record(self, result, param_hash=None, text=None, kind='tts', source_filename=None):
+        """Queue a finished render's metadata for writing"""
+        now = utc_now()
+        details = {k: v for k, v in result.items() if k not in ('cached', 'render_plan', 'audio_stream')}
+        self._queue.put(('record', {
+            'filename': result['filename'],
+            'param_hash': param_hash,
+            'text_hash': make_text_hash(text) if text else None,
+            'kind': kind,
+            'format': result['format'],
+            'profile': result.get('profile'),
+            'bitrate': result.get('bitrate'),
+            'duration': result.get('duration'),
+            'size_bytes': result.get('size_bytes'),
+            'source_filename': source_filename,
+            'details': details,
+            'created_at': now,
+            'last_access_at': now
+        }))
+        if source_filename:
+            with self._lock:
+                self._derived[result['filename']] = source_filename
+
+    def touch(self, filename):
+        """Queue an update of a file's last access time"""
+        self._queue.put(('touch', filename))
+
+    def mark_evicted(self, filename):
+        """Queue marking a file as deleted, so lookups stop returning it"""
+        with self._lock:
+            self._derived.pop(filename, None)
+        self._queue.put(('evict', filename))
+
+    def lookup(self, param_hash):
+        """Return the result of the newest live render with this render key, or None"""
+        with self._lock:
+            self.lookups += 1
+        try:
+            with self.app.app_context():
+                record = db.session.execute(
+                    db.select(RenderRecord)
+                    .filter_by(param_hash=param_hash, evicted_at=None)
+                    .order_by(RenderRecord.created_at.desc())
+                    .limit(1)
+                ).scalar()
+                details = dict(record.details) if record is not None and record.details else None
+        except Exception as e:
+            logging.warning(f"Error looking up render index: {str(e)}")
+            return None
+
+        if details is not None:
+            with self._lock:
+                self.hits += 1
+        return details
+
+    def find(self, filename):
+        """Return the metadata recorded for a file, or None"""
+        try:
+            with self.app.app_context():
+                record = db.session.execute(
+                    db.select(RenderRecord).filter_by(filename=filename)
+                ).scalar()
+                return record.to_dict() if record is not None else None
+        except Exception as e:
+            logging.warning(f"Error reading render index: {str(e)}")
+            return None
+
+    def derived_sources(self):
+        """Return the source files of derived renders that still exist"""
+        with self._lock:
+            return set(self._derived.values())
+
+    def flush(self):
+        """Block until every queued write has been committed"""
+        self._queue.join()
+
+    def get_stats(self):
+        """Return lookup and write counters"""
+        with self._lock:
+            return {
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+                'queued': self._queue.qsize(),
+                'written': self.written,
+                'batches': self.batches,
+                'errors': self.errors,
+                'last_batch_ms': self.last_batch_ms,
+                'derived_files': len(self._derived)
+            }
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Collect whatever else arrives within the flush interval, up to a full batch
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        now = utc_now()
+        records = [payload for op, payload in batch if op == 'record']
+        touched = {payload for op, payload in batch if op == 'touch'}
+        evicted = {payload for op, payload in batch if op == 'evict'}
+
+        # New records and access/eviction updates commit separately, so a bad
+        # record can't take the updates down with it. Each group is written as
+        # a few combined statements, falling back to one entry per transaction
+        # if that fails so only the bad entries are lost.
+        groups = []
+        if records:
+            groups.append(([(db.insert(RenderRecord), records)],
+                           [[(db.insert(RenderRecord), [record])] for record in records]))
+        if touched or evicted:
+            combined = []
+            single = []
+            for filenames, values in ((touched, {'last_access_at': now}), (evicted, {'evicted_at': now})):
+                if filenames:
+                    combined.append((update(RenderRecord).where(RenderRecord.filename.in_(filenames))
+                                     .values(**values), None))
+                    single += [[(update(RenderRecord).where(RenderRecord.filename == filename)
+                                 .values(**values), None)] for filename in filenames]
+            groups.append((combined, single))
+
+        written = 0
+        failed = 0
+        for combined, single in groups:
+            if self._commit(combined):
+                written += len(single)
+                continue
+            for statements in single:
+                if self._commit(statements):
+                    written += 1
+                else:
+                    failed += 1
+
+        with self._lock:
+            self.written += written
+            self.errors += failed
+            self.batches += 1
+            self.last_batch_ms = (time.perf_counter() - start) * 1000
+
+    def _commit(self, statements):
+        # Execute (statement, parameters) pairs in one transaction; False if it failed
+        try:
+            with self.app.app_context():
+                for statement, params in statements:
+                    db.session.execute(statement, params)
+                db.session.commit()
+            return True
+        except Exception as e:
+            logging.warning(f"Error writing render index: {str(e)}")
+            return False
+
+    def _load_derived(self):
+        # Rebuild the derived-render sources from the records of files that still exist
+        try:
+            with self.app.app_context():
+                rows = db.session.execute(
+                    db.select(RenderRecord.filename, RenderRecord.source_filename)
+                    .where(RenderRecord.source_filename.is_not(None), RenderRecord.evicted_at.is_(None))
+                ).all()
+        except Exception as e:
+            logging.warning(f"Error loading render index: {str(e)}")
+            return
+
+        with self._lock:
+            self._derived = {filename: source for filename, source in rows}
+
+        logging.debug(f"Loaded render index: {len(self._derived)} derived renders")
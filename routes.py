@@ -1,13 +1,57 @@
-from flask import render_template, request, jsonify, send_from_directory
+from flask import render_template, request, jsonify, send_from_directory, Response, stream_with_context
 import os
+import json
 import logging
-from tts_service import TextToSpeechService
+from tts_service import TextToSpeechService, parse_edit, edits_tempo, MAX_EDIT_OPERATIONS
+from render_index import RenderIndex
+from edit_sessions import EditSessionStore, StaleEditError
+from codec import FORMAT_MIMETYPES, resolve_output_profile
 
 def register_routes(app):
     """Register all routes with the Flask app"""
     
+    # Metadata index of generated files, written in batches off the request path
+    render_index = RenderIndex(
+        app,
+        batch_size=int(os.environ.get('TTS_INDEX_BATCH_SIZE', '256')),
+        flush_interval=float(os.environ.get('TTS_INDEX_FLUSH_SECONDS', '1'))
+    )
+    
+    # Playground edit lists, rendered from each session's original file
+    audio_ttl_seconds = float(os.environ.get('TTS_AUDIO_TTL_HOURS', '24')) * 3600
+    edit_sessions = EditSessionStore(app, ttl_seconds=audio_ttl_seconds)
+    
     # Initialize TTS service
-    tts_service = TextToSpeechService(os.path.join(app.root_path, 'static'))
+    tts_service = TextToSpeechService(
+        os.path.join(app.root_path, 'static'),
+        cache_dir=os.environ.get('TTS_CACHE_DIR'),
+        cache_max_bytes=int(os.environ.get('TTS_CACHE_MAX_MB', '256')) * 1024 * 1024,
+        synthesis_workers=int(os.environ.get('TTS_SYNTHESIS_WORKERS', '4')),
+        tts_endpoint=os.environ.get('TTS_GTTS_ENDPOINT'),
+        backend=os.environ.get('TTS_BACKEND', 'gtts'),
+        render_cache_entries=int(os.environ.get('TTS_RENDER_CACHE_ENTRIES', '1024')),
+        sentence_cache_bytes=int(os.environ.get('TTS_SENTENCE_CACHE_MB', '128')) * 1024 * 1024,
+        working_rate=int(os.environ.get('TTS_WORKING_RATE', '0')),
+        output_rate=int(os.environ.get('TTS_OUTPUT_RATE', '0')),
+        block_frames=int(os.environ.get('TTS_BLOCK_FRAMES', '0')),
+        codec_workers=int(os.environ.get('TTS_CODEC_WORKERS', '4')),
+        audio_store_bytes=int(os.environ.get('TTS_AUDIO_STORE_MB', '1024')) * 1024 * 1024,
+        audio_ttl_seconds=audio_ttl_seconds,
+        audio_sweep_interval=float(os.environ.get('TTS_AUDIO_SWEEP_SECONDS', '60')),
+        render_index=render_index,
+        decoded_cache_bytes=int(os.environ.get('TTS_DECODED_CACHE_MB', '64')) * 1024 * 1024
+    )
+    
+    # Keep the original and current render of live edit sessions, so a sweep can't pull them from under an edit
+    tts_service.audio_store.add_reference_source(edit_sessions.filenames)
+    
+    @app.before_request
+    def track_audio_access():
+        """Refresh the last access of generated files as they are fetched, for the store's TTL and LRU"""
+        if request.path.startswith('/static/audio/'):
+            name = request.path[len('/static/audio/'):]
+            if tts_service.audio_store.touch(name):
+                render_index.touch(name)
     
     @app.route('/')
     def index():
@@ -71,6 +115,14 @@ def register_routes(app):
             sentence_analysis = data.get('sentence_analysis', False)
             voice_layering = data.get('voice_layering', False)
             spectral_enhancement = data.get('spectral_enhancement', False)
+            parallel_synthesis = data.get('parallel_synthesis', True)
+            backend = data.get('backend')
+            seed = data.get('seed')
+            incremental = data.get('incremental', False)
+            debug = data.get('debug', False)
+            stream = data.get('stream', False)
+            profile = data.get('profile')
+            bitrate = data.get('bitrate')
             
             # Convert numeric parameters if provided as strings
             if custom_speed is not None:
@@ -90,6 +142,12 @@ def register_routes(app):
                     custom_volume = int(custom_volume)
                 except (ValueError, TypeError):
                     custom_volume = None
+                    
+            if seed is not None:
+                try:
+                    seed = int(seed)
+                except (ValueError, TypeError):
+                    seed = None
             
             # Validate input
             if not text or len(text.strip()) == 0:
@@ -132,7 +190,15 @@ def register_routes(app):
                 sentence_analysis=sentence_analysis,
                 voice_layering=voice_layering,
                 spectral_enhancement=spectral_enhancement,
-                format=format
+                format=format,
+                profile=profile,
+                bitrate=bitrate,
+                parallel_synthesis=parallel_synthesis,
+                backend=backend,
+                seed=seed,
+                incremental=incremental,
+                debug=debug,
+                stream=stream
             )
             
             if result['success']:
@@ -145,6 +211,14 @@ def register_routes(app):
                     result['emotion_color'] = EMOTION_PARAMETERS[emotion]['color']
                     result['emotion_animation'] = EMOTION_PARAMETERS[emotion]['animation']
                 
+                if stream:
+                    # Send the audio itself as it renders, with the metadata in a header
+                    audio_stream = result.pop('audio_stream')
+                    return Response(stream_with_context(audio_stream), mimetype=FORMAT_MIMETYPES[result['format']], headers={
+                        'X-TTS-Metadata': json.dumps(result, separators=(',', ':')),
+                        'Cache-Control': 'no-store'
+                    })
+                
                 return jsonify(result)
             else:
                 return jsonify(result), 500
@@ -204,14 +278,73 @@ def register_routes(app):
             'audio_effects': tts_service.get_audio_effects()
         })
         
+    @app.route('/api/output-profiles', methods=['GET'])
+    def get_output_profiles():
+        """API endpoint to get the output format/bitrate profiles"""
+        return jsonify({
+            'output_profiles': tts_service.get_output_profiles()
+        })
+        
     @app.route('/api/advanced-features', methods=['GET'])
     def get_advanced_features():
         """API endpoint to get supported advanced speech features"""
         return jsonify({
             'advanced_features': tts_service.get_advanced_features(),
-            'prosody_settings': tts_service.get_prosody_settings()
+            'prosody_settings': tts_service.get_prosody_settings(),
+            'synthesis_backends': tts_service.get_synthesis_backends()
+        })
+        
+    @app.route('/api/cache-stats', methods=['GET'])
+    def get_cache_stats():
+        """API endpoint to get hit/miss/eviction counters for the TTS caches and codec timings"""
+        return jsonify({
+            'caches': tts_service.get_cache_stats(),
+            'codec': tts_service.codec.get_stats()
         })
         
+    @app.route('/api/renders/<path:filename>', methods=['GET'])
+    def get_render_metadata(filename):
+        """API endpoint to get the recorded metadata of a generated file (path relative to /static/audio/)"""
+        record = render_index.find(filename)
+        if record is None:
+            return jsonify({
+                'success': False,
+                'error': 'No metadata recorded for this file'
+            }), 404
+        return jsonify(dict(record, success=True))
+        
+    def find_audio(audio_path):
+        """Return (full path, audio store name) for a stored file's path under /static/audio/, or (None, None)"""
+        # Remove /static/ prefix if it exists
+        if audio_path.startswith('/static/'):
+            audio_path = audio_path[8:]  # Remove "/static/" prefix
+            
+        # Resolve '..' and absolute paths first, so only files inside the audio store are accepted
+        audio_root = os.path.normpath(os.path.abspath(tts_service.audio_store.root))
+        full_path = os.path.normpath(os.path.join(app.root_path, 'static', audio_path))
+        if os.path.commonpath([audio_root, full_path]) != audio_root or full_path == audio_root:
+            logging.warning(f"Rejected audio path outside the audio store: {audio_path}")
+            return None, None
+            
+        source_name = os.path.relpath(full_path, audio_root).replace(os.sep, '/')
+        if not tts_service.audio_store.contains(source_name):
+            return None, None
+            
+        # Using a file as a source counts as an access
+        if tts_service.audio_store.touch(source_name):
+            render_index.touch(source_name)
+        return full_path, source_name
+        
+    def preview_response(source_path, edits, data):
+        """Return a low-quality preview of edits, starting at the request's 'start' (seconds), as the response body"""
+        try:
+            start_ms = float(data.get('start') or 0) * 1000
+        except (ValueError, TypeError):
+            start_ms = 0
+        audio_bytes, metadata = tts_service.preview_edits(source_path, edits, start_ms=start_ms)
+        return Response(audio_bytes, mimetype=FORMAT_MIMETYPES[metadata['format']],
+                        headers={'X-Preview-Metadata': json.dumps(metadata), 'Cache-Control': 'no-store'})
+        
     @app.route('/api/manipulate-audio', methods=['POST'])
     def manipulate_audio():
         """API endpoint to manipulate an existing audio file with new parameters"""
@@ -221,34 +354,9 @@ def register_routes(app):
             audio_path = data.get('audio_path', '')
             
             # Get manipulation parameters
-            speed = data.get('speed')
-            pitch = data.get('pitch')
-            volume = data.get('volume')
-            eq_bass = data.get('eq_bass')
-            eq_mid = data.get('eq_mid')
-            eq_treble = data.get('eq_treble')
-            effect_type = data.get('effect_type', 'none')
-            effect_intensity = data.get('effect_intensity', 0.5)
+            edit = parse_edit(data)
+            output = resolve_output_profile(data.get('profile'), data.get('format'), data.get('bitrate'))
             
-            # Convert numeric parameters if provided as strings
-            if speed is not None:
-                try:
-                    speed = float(speed)
-                except (ValueError, TypeError):
-                    speed = 1.0
-                    
-            if pitch is not None:
-                try:
-                    pitch = int(pitch)
-                except (ValueError, TypeError):
-                    pitch = 0
-                    
-            if volume is not None:
-                try:
-                    volume = int(volume)
-                except (ValueError, TypeError):
-                    volume = 0
-                    
             # Validate input
             if not audio_path or len(audio_path.strip()) == 0:
                 return jsonify({
@@ -256,134 +364,209 @@ def register_routes(app):
                     'error': 'Audio path cannot be empty'
                 }), 400
                 
-            # Remove /static/ prefix if it exists
-            if audio_path.startswith('/static/'):
-                audio_path = audio_path[8:]  # Remove "/static/" prefix
-                
-            # Check if the audio file exists
-            full_path = os.path.join(app.root_path, 'static', audio_path)
-            if not os.path.exists(full_path):
+            full_path, source_name = find_audio(audio_path)
+            if full_path is None:
                 return jsonify({
                     'success': False,
                     'error': 'Audio file not found'
                 }), 404
                 
-            logging.info(f"Manipulating audio: {audio_path}, Speed: {speed}, Pitch: {pitch}, Volume: {volume}, Effect: {effect_type}")
+            logging.info(f"Manipulating audio: {audio_path}, Speed: {edit['speed']}, Pitch: {edit['pitch']}, Volume: {edit['volume']}, Effect: {edit['effect_type']}")
                 
-            # Process the audio with pydub
-            from pydub import AudioSegment
-            import uuid
-            
             try:
-                # Load the audio file
-                audio = AudioSegment.from_file(full_path)
-                
-                # Apply speed modification
-                if speed and speed != 1.0:
-                    speed = max(0.5, min(2.0, speed))  # Clamp between 0.5 and 2.0
-                    audio = audio._spawn(audio.raw_data, overrides={
-                        "frame_rate": int(audio.frame_rate * speed)
-                    })
-                    audio = audio.set_frame_rate(44100)  # Reset to standard frame rate
-                
-                # Apply pitch modification
-                if pitch and pitch != 0:
-                    pitch = max(-10, min(10, pitch))  # Clamp between -10 and 10
-                    new_sample_rate = int(audio.frame_rate * (2 ** (pitch / 12.0)))
-                    audio = audio._spawn(audio.raw_data, overrides={
-                        "frame_rate": new_sample_rate
-                    })
-                    audio = audio.set_frame_rate(44100)  # Reset to standard frame rate
-                
-                # Apply volume adjustment
-                if volume and volume != 0:
-                    volume = max(-10, min(10, volume))  # Clamp between -10 and 10
-                    audio = audio + volume
+                if data.get('preview'):
+                    # Quick feedback while adjusting settings: a short low-rate window, not saved
+                    return preview_response(full_path, [edit], data)
+                    
+                # Process the audio with the NumPy audio engine and return the path to the modified audio
+                result = tts_service.render_edits(full_path, [edit], output, source_name=source_name)
+                return jsonify(result)
                 
-                # Apply EQ adjustments
-                if eq_bass is not None:
-                    eq_bass = float(eq_bass)
-                    audio = audio.low_shelf_filter(200, eq_bass)
+            except Exception as e:
+                logging.error(f"Error processing audio: {str(e)}")
+                return jsonify({
+                    'success': False,
+                    'error': f"Error processing audio: {str(e)}"
+                }), 500
                 
-                if eq_mid is not None:
-                    eq_mid = float(eq_mid)
-                    if eq_mid > 0:
-                        audio = audio.band_pass_filter(1000, q=1.0)
-                        audio = audio + eq_mid
-                    else:
-                        audio = audio.band_pass_filter(1000, q=1.0)
-                        audio = audio - abs(eq_mid)
+        except Exception as e:
+            logging.error(f"Error in manipulate audio API: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+            
+    def session_response(edit_session):
+        """Return a session as a response body, with the tempo that maps its render's time back to the original"""
+        return dict(edit_session, tempo=edits_tempo(edit_session['edits']), success=True)
+        
+    def render_session(edit_session, edits, data):
+        """Render a session's edit list from its original, replacing the session's previous render"""
+        full_path = tts_service.audio_store.path_for(edit_session['source_filename'])
+        if not os.path.exists(full_path):
+            return jsonify({
+                'success': False,
+                'error': 'Original audio file not found'
+            }), 404
+        if tts_service.audio_store.touch(edit_session['source_filename']):
+            render_index.touch(edit_session['source_filename'])
+            
+        # The original itself is version 0; anything later is rendered once from the original
+        result = None
+        if edits:
+            output = resolve_output_profile(data.get('profile'), data.get('format'), data.get('bitrate'))
+            result = tts_service.render_edits(full_path, edits, output,
+                                              source_name=edit_session['source_filename'])
+            
+        try:
+            updated, previous = edit_sessions.update(edit_session['session_id'], edits,
+                                                     result['filename'] if result else None,
+                                                     expected_edits=edit_session['edits'])
+        except StaleEditError as e:
+            if result is not None:
+                tts_service.audio_store.discard(result['filename'])
+            return jsonify({
+                'success': False,
+                'error': f"{str(e)}; reload the session and try again"
+            }), 409
+        if updated is None:
+            # Deleted while rendering
+            if result is not None:
+                tts_service.audio_store.discard(result['filename'])
+            return jsonify({
+                'success': False,
+                'error': 'Edit session not found'
+            }), 404
+            
+        # Earlier versions only live on as prefixes of the edit list
+        if previous and (result is None or previous != result['filename']):
+            tts_service.audio_store.discard(previous)
+            
+        response = session_response(updated)
+        if result is not None:
+            for key in ('duration', 'format', 'profile', 'bitrate', 'size_bytes', 'decode_ms', 'decode_cached', 'encode_ms'):
+                response[key] = result[key]
+        return jsonify(response)
+        
+    @app.route('/api/edit-sessions', methods=['POST'])
+    def create_edit_session():
+        """API endpoint to start a non-destructive edit session on a generated audio file"""
+        try:
+            data = request.json
+            audio_path = data.get('audio_path', '')
+            
+            full_path, source_name = find_audio(audio_path) if audio_path else (None, None)
+            if full_path is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Audio file not found'
+                }), 404
                 
-                if eq_treble is not None:
-                    eq_treble = float(eq_treble)
-                    audio = audio.high_shelf_filter(4000, eq_treble)
+            return jsonify(session_response(edit_sessions.create(source_name)))
+            
+        except Exception as e:
+            logging.error(f"Error creating edit session: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+            
+    @app.route('/api/edit-sessions/<session_id>', methods=['GET'])
+    def get_edit_session(session_id):
+        """API endpoint to get an edit session's source, edit list and current render"""
+        edit_session = edit_sessions.get(session_id)
+        if edit_session is None:
+            return jsonify({
+                'success': False,
+                'error': 'Edit session not found'
+            }), 404
+        return jsonify(session_response(edit_session))
+        
+    @app.route('/api/edit-sessions/<session_id>/edits', methods=['POST'])
+    def add_session_edit(session_id):
+        """API endpoint to append an edit operation to a session and render the result from the original"""
+        try:
+            data = request.json
+            edit_session = edit_sessions.get(session_id)
+            if edit_session is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Edit session not found'
+                }), 404
                 
-                # Apply audio effect
-                if effect_type and effect_type != 'none':
-                    effect_intensity = max(0.1, min(1.0, effect_intensity))
-                    
-                    if effect_type == 'echo':
-                        # Create echo effect with dynamic delay
-                        delay_ms = int(300 * effect_intensity)
-                        echo_sound = audio - (6 * effect_intensity)
-                        audio = audio.overlay(echo_sound, position=delay_ms)
-                    
-                    elif effect_type == 'reverb':
-                        # Apply reverb with dynamic intensity
-                        reverb_count = int(5 * effect_intensity) + 1
-                        reverb_sound = audio - (10 * effect_intensity)
-                        delays = [50, 100, 150, 200, 250, 300, 350]
-                        for i in range(reverb_count):
-                            if i < len(delays):
-                                delay = delays[i]
-                                echo = reverb_sound - (delay // 20)
-                                audio = audio.overlay(echo, position=delay)
-                    
-                    elif effect_type == 'chorus':
-                        # Apply chorus with dynamic intensity
-                        chorus1 = audio._spawn(audio.raw_data, overrides={
-                            "frame_rate": int(audio.frame_rate * (1 + 0.007 * effect_intensity))
-                        }).set_frame_rate(audio.frame_rate) - (6 * effect_intensity)
-                        
-                        chorus2 = audio._spawn(audio.raw_data, overrides={
-                            "frame_rate": int(audio.frame_rate * (1 - 0.007 * effect_intensity))
-                        }).set_frame_rate(audio.frame_rate) - (6 * effect_intensity)
-                        
-                        audio = audio.overlay(chorus1, position=15)
-                        audio = audio.overlay(chorus2, position=30)
-                    
-                    elif effect_type == 'distortion':
-                        # Apply distortion with dynamic intensity
-                        audio = audio.compress_dynamic_range(threshold=-20.0, ratio=10.0 * effect_intensity)
-                        audio = audio.low_shelf_filter(100, 5.0 * effect_intensity)
-                        audio = audio + (3 * effect_intensity)
+            edits = edit_session['edits'] + [parse_edit(data)]
+            if len(edits) > MAX_EDIT_OPERATIONS:
+                return jsonify({
+                    'success': False,
+                    'error': f"Edit sessions are limited to {MAX_EDIT_OPERATIONS} edits"
+                }), 400
                 
-                # Generate a unique filename for the modified audio
-                filename = f"modified_{uuid.uuid4()}.mp3"
-                filepath = os.path.join(app.root_path, 'static', 'audio', filename)
+            return render_session(edit_session, edits, data)
+            
+        except Exception as e:
+            logging.error(f"Error applying session edit: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': f"Error processing audio: {str(e)}"
+            }), 500
+            
+    @app.route('/api/edit-sessions/<session_id>/preview', methods=['POST'])
+    def preview_session_edit(session_id):
+        """API endpoint to preview a session with a pending edit, without adding it to the edit list"""
+        try:
+            data = request.json
+            edit_session = edit_sessions.get(session_id)
+            if edit_session is None:
+                return jsonify({
+                    'success': False,
+                    'error': 'Edit session not found'
+                }), 404
                 
-                # Export the audio
-                audio.export(filepath, format="mp3", bitrate="192k")
+            full_path = tts_service.audio_store.path_for(edit_session['source_filename'])
+            if not os.path.exists(full_path):
+                return jsonify({
+                    'success': False,
+                    'error': 'Original audio file not found'
+                }), 404
                 
-                # Return the path to the modified audio
+            return preview_response(full_path, edit_session['edits'] + [parse_edit(data)], data)
+            
+        except Exception as e:
+            logging.error(f"Error previewing session edit: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': f"Error processing audio: {str(e)}"
+            }), 500
+            
+    @app.route('/api/edit-sessions/<session_id>/revert', methods=['POST'])
+    def revert_edit_session(session_id):
+        """API endpoint to go back to an earlier version (number of edits kept) of a session"""
+        try:
+            data = request.json
+            edit_session = edit_sessions.get(session_id)
+            if edit_session is None:
                 return jsonify({
-                    'success': True,
-                    'path': f'/static/audio/{filename}',
-                    'duration': len(audio) / 1000  # Duration in seconds
-                })
+                    'success': False,
+                    'error': 'Edit session not found'
+                }), 404
                 
-            except Exception as e:
-                logging.error(f"Error processing audio: {str(e)}")
+            try:
+                version = int(data.get('version', 0))
+            except (ValueError, TypeError):
+                version = -1
+            if version < 0 or version > edit_session['version']:
                 return jsonify({
                     'success': False,
-                    'error': f"Error processing audio: {str(e)}"
-                }), 500
+                    'error': f"Version must be between 0 and {edit_session['version']}"
+                }), 400
                 
+            return render_session(edit_session, edit_session['edits'][:version], data)
+            
         except Exception as e:
-            logging.error(f"Error in manipulate audio API: {str(e)}")
+            logging.error(f"Error reverting edit session: {str(e)}")
             return jsonify({
                 'success': False,
-                'error': str(e)
+                'error': f"Error processing audio: {str(e)}"
             }), 500
         
     @app.errorhandler(404)
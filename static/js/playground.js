@@ -44,6 +44,14 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Current audio state
     let currentAudioPath = null;
+    let editSessionId = null;
+    let editSessionPromise = null;
+    let sessionTempo = 1;
+    let previewUrl = null;
+    let previewStart = 0;
+    let previewTempo = 1;
+    let previewTimer = null;
+    let previewRequestId = 0;
     let currentEffect = 'none';
     let audioHistoryItems = [];
     let isPlaying = false;
@@ -55,6 +63,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const DEFAULT_SAMPLE_COUNT = 40;
     const DEFAULT_WAVE_COLOR = '#0d6efd';
     const VISUALIZER_BAR_COUNT = 32;
+    const PREVIEW_DEBOUNCE_MS = 250;
     
     // Initialize the audio visualizer
     function initializeVisualizer() {
@@ -277,16 +286,9 @@ document.addEventListener('DOMContentLoaded', function() {
         stopVisualization();
     }
     
-    // Apply the current settings to the audio
-    function applyChanges() {
-        if (!currentAudioPath) {
-            showAlert("No audio file selected. Please generate speech first.", "warning");
-            return;
-        }
-        
-        // Get the current settings
-        const settings = {
-            audio_path: currentAudioPath,
+    // Read the current slider and effect settings
+    function currentSettings() {
+        return {
             speed: parseFloat(speedSlider.value),
             pitch: parseInt(pitchSlider.value),
             volume: parseInt(volumeSlider.value),
@@ -296,35 +298,113 @@ document.addEventListener('DOMContentLoaded', function() {
             effect_type: currentEffect,
             effect_intensity: parseFloat(effectIntensitySlider.value)
         };
+    }
+    
+    // Preview the current settings shortly after the last change
+    function schedulePreview() {
+        if (!currentAudioPath) return;
+        
+        clearTimeout(previewTimer);
+        previewTimer = setTimeout(requestPreview, PREVIEW_DEBOUNCE_MS);
+    }
+    
+    // Position of the playhead in the original audio, in seconds
+    function sourcePosition() {
+        // Renders and previews are time-stretched by their speed edits (tempo = original seconds per second played)
+        const time = audioPlayer.currentTime || 0;
+        if (previewUrl && audioPlayer.src === previewUrl) {
+            return previewStart + time * previewTempo;
+        }
+        return time * sessionTempo;
+    }
+    
+    // Play a quick low-quality render of a few seconds around the playhead (nothing is saved until applied)
+    function requestPreview() {
+        const requestId = ++previewRequestId;
+        const settings = currentSettings();
+        settings.start = sourcePosition();
+        
+        ensureEditSession()
+        .then(sessionId => fetch(`/api/edit-sessions/${sessionId}/preview`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify(settings)
+        }))
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`Preview failed with status ${response.status}`);
+            }
+            const metadata = JSON.parse(response.headers.get('X-Preview-Metadata') || '{}');
+            return response.blob().then(blob => ({ blob, metadata }));
+        })
+        .then(({ blob, metadata }) => {
+            // Ignore previews overtaken by a newer change or an apply
+            if (requestId !== previewRequestId) return;
+            
+            if (previewUrl) {
+                URL.revokeObjectURL(previewUrl);
+            }
+            previewUrl = URL.createObjectURL(blob);
+            previewStart = metadata.start || 0;
+            previewTempo = metadata.tempo || 1;
+            audioPlayer.src = previewUrl;
+            audioPlayer.play();
+        })
+        .catch(error => {
+            console.error('Preview error:', error);
+        });
+    }
+    
+    // Apply the current settings to the audio
+    function applyChanges() {
+        if (!currentAudioPath) {
+            showAlert("No audio file selected. Please generate speech first.", "warning");
+            return;
+        }
+        
+        // Get the current settings
+        const settings = currentSettings();
+        
+        // The full render replaces any pending preview
+        clearTimeout(previewTimer);
+        previewRequestId++;
         
         // Show loading indicator
         showAlert("Processing audio...", "info");
         
-        // Make API request
-        fetch('/api/manipulate-audio', {
+        // Add the settings to the session's edit list; the server renders the list from the original
+        ensureEditSession()
+        .then(sessionId => fetch(`/api/edit-sessions/${sessionId}/edits`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify(settings)
-        })
+        }))
         .then(response => response.json())
         .then(data => {
             if (data.success) {
                 // Update audio player
-                const previousTime = audioPlayer.currentTime;
+                const previousPosition = sourcePosition();
                 const wasPlaying = !audioPlayer.paused;
                 
                 // Store in history
-                addToHistory(data.path, settings);
+                addToHistory(data.path, settings, data.version);
                 
                 // Update audio player
                 audioPlayer.src = data.path;
                 currentAudioPath = data.path;
+                sessionTempo = data.tempo || 1;
+                if (previewUrl) {
+                    URL.revokeObjectURL(previewUrl);
+                    previewUrl = null;
+                }
                 
-                // If it was playing, continue playback
+                // If it was playing, continue playback from the same point of the original
                 if (wasPlaying) {
-                    audioPlayer.currentTime = previousTime;
+                    audioPlayer.currentTime = previousPosition / sessionTempo;
                     audioPlayer.play();
                 }
                 
@@ -339,6 +419,60 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Start an edit session on the current audio unless one is already open (or being opened)
+    function ensureEditSession() {
+        // Share the pending request, so a preview and an apply fired together don't open two sessions
+        if (editSessionPromise) {
+            return editSessionPromise;
+        }
+        
+        editSessionPromise = fetch('/api/edit-sessions', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ audio_path: currentAudioPath })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            editSessionId = data.session_id;
+            return editSessionId;
+        })
+        .catch(error => {
+            // Let the next request try again
+            editSessionPromise = null;
+            throw error;
+        });
+        return editSessionPromise;
+    }
+    
+    // Go back to an earlier version of the session (the number of edits to keep)
+    function revertToVersion(version) {
+        return fetch(`/api/edit-sessions/${editSessionId}/revert`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ version: version })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                throw new Error(data.error);
+            }
+            
+            sessionTempo = data.tempo || 1;
+            
+            // Later versions are dropped from the edit list, so drop them from the history too
+            audioHistoryItems = audioHistoryItems.filter(item => item.version <= version);
+            updateHistoryUI();
+            return data;
+        });
+    }
+    
     // Reset all settings to default
     function resetSettings() {
         speedSlider.value = 1.0;
@@ -372,7 +506,7 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Add an item to the audio history
-    function addToHistory(audioPath, settings) {
+    function addToHistory(audioPath, settings, version) {
         // Create a timestamp
         const now = new Date();
         const timestamp = now.toLocaleTimeString();
@@ -381,7 +515,8 @@ document.addEventListener('DOMContentLoaded', function() {
         const historyItem = {
             path: audioPath,
             timestamp: timestamp,
-            settings: settings
+            settings: settings,
+            version: version
         };
         
         // Add to the history array
@@ -414,7 +549,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     </button>
                 </div>
                 <div>
-                    <div>Version ${audioHistoryItems.length - index}</div>
+                    <div>Version ${item.version}</div>
                     <small class="text-muted">Speed: ${item.settings.speed}x, Pitch: ${item.settings.pitch}</small>
                 </div>
                 <div class="history-timestamp">${item.timestamp}</div>
@@ -429,14 +564,22 @@ document.addEventListener('DOMContentLoaded', function() {
                 const index = parseInt(button.getAttribute('data-index'));
                 const item = audioHistoryItems[index];
                 
-                // Load and play the audio
-                audioPlayer.src = item.path;
-                currentAudioPath = item.path;
-                audioPlayer.play();
-                playButton.innerHTML = '<i class="bi bi-pause-fill"></i> Pause';
-                
-                // Update settings
-                updateSettingsFromHistory(item.settings);
+                // Re-render that version from the original (only the latest render is kept on disk)
+                revertToVersion(item.version)
+                .then(data => {
+                    // Load and play the audio
+                    audioPlayer.src = data.path;
+                    currentAudioPath = data.path;
+                    audioPlayer.play();
+                    playButton.innerHTML = '<i class="bi bi-pause-fill"></i> Pause';
+                    
+                    // Update settings
+                    updateSettingsFromHistory(item.settings);
+                })
+                .catch(error => {
+                    console.error('Error:', error);
+                    showAlert("Failed to load this version. Please try again.", "danger");
+                });
             });
         });
     }
@@ -820,6 +963,8 @@ document.addEventListener('DOMContentLoaded', function() {
     sliders.forEach(slider => {
         if (slider) {
             slider.addEventListener('input', updateValueDisplays);
+            // Preview once the slider is released
+            slider.addEventListener('change', schedulePreview);
         }
     });
     
@@ -836,6 +981,7 @@ document.addEventListener('DOMContentLoaded', function() {
             this.classList.add('active');
             
             showAlert(`Selected "${effectType}" effect`, "info");
+            schedulePreview();
         });
     });
     
@@ -844,6 +990,7 @@ document.addEventListener('DOMContentLoaded', function() {
         button.addEventListener('click', function() {
             const presetName = this.getAttribute('data-preset');
             applyPreset(presetName);
+            schedulePreview();
         });
     });
     
@@ -863,6 +1010,7 @@ document.addEventListener('DOMContentLoaded', function() {
             };
             
             applyEmotionPreset(emotion, parameters);
+            schedulePreview();
         });
     });
     
@@ -163,7 +163,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const language = languageSelect.value;
         const emotion = emotionSelect.value;
         const voice_type = voiceSelect.value;
-        const format = formatSelect.value;
+        const profile = formatSelect.value;
         const audio_effect = effectSelect.value;
         
         // Get custom parameters if enabled
@@ -197,7 +197,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     custom_pitch: custom_pitch, 
                     custom_volume: custom_volume,
                     audio_effect: audio_effect,
-                    format: format
+                    profile: profile
                 })
             });
 
@@ -207,7 +207,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 // Update audio player and download link
                 audioPlayer.src = data.path;
                 downloadLink.href = data.path;
-                downloadLink.download = `neural_speech_${language}_${voice_type}_${emotion}.${format}`;
+                downloadLink.download = `neural_speech_${language}_${voice_type}_${emotion}.${data.format}`;
                 
                 // Show audio section
                 audioSection.classList.remove('d-none');
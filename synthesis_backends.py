@@ -0,0 +1,173 @@
+import io
+import wave
+import hashlib
+
+import numpy as np
+from gtts import gTTS
+
+# Path of the translate TTS endpoint relative to its host
+GTTS_ENDPOINT_PATH = '/_/TranslateWebserverUi/data/batchexecute'
+
+# gTTS returns 24 kHz mono MP3
+GTTS_SAMPLE_RATE = 24000
+
+
+class SynthesisBackend:
+    """
+    Base class for speech synthesis engines.
+
+    A backend turns text into encoded base audio. Everything after that
+    (emotion, voice, effects, prosody) is handled by the service's processing
+    pipeline, so backends can be swapped without affecting it.
+    """
+
+    # Registry name, audio container of the returned bytes and native sample rate
+    name = None
+    audio_format = 'mp3'
+    sample_rate = GTTS_SAMPLE_RATE
+
+    def synthesize(self, text, language, slow=False):
+        """
+        Synthesize text to encoded audio
+
+        Args:
+            text (str): The text to synthesize
+            language (str): The language code (e.g., 'en', 'hi')
+            slow (bool): Whether to produce slower speech
+
+        Returns:
+            bytes: Audio encoded in self.audio_format
+        """
+        raise NotImplementedError
+
+
+class _EndpointGTTS(gTTS):
+    """gTTS client that can be pointed at a different translate TTS host (e.g. a local stand-in server)"""
+
+    def __init__(self, *args, endpoint=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.endpoint = endpoint
+
+    def _prepare_requests(self):
+        prepared_requests = super()._prepare_requests()
+        if self.endpoint:
+            for prepared in prepared_requests:
+                prepared.prepare_url(self.endpoint.rstrip('/') + GTTS_ENDPOINT_PATH, None)
+        return prepared_requests
+
+
+class GTTSBackend(SynthesisBackend):
+    """Google Translate TTS via gTTS (network)"""
+
+    name = 'gtts'
+    audio_format = 'mp3'
+    sample_rate = GTTS_SAMPLE_RATE
+
+    def __init__(self, endpoint=None):
+        # Optional override of the translate TTS host (None uses Google)
+        self.endpoint = endpoint
+
+    def synthesize(self, text, language, slow=False):
+        tts = _EndpointGTTS(text=text, lang=language, slow=slow, endpoint=self.endpoint)
+        buffer = io.BytesIO()
+        tts.write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class OfflineBackend(SynthesisBackend):
+    """
+    Deterministic, network-free backend for CI, benchmarks and load tests.
+
+    Each word becomes a voiced burst (harmonics of a per-word fundamental
+    shaped by two formant resonances) with a short noise onset per syllable,
+    sized by the word's length. Output depends only on the text and language,
+    so repeated runs produce identical audio and DSP timings are not masked
+    by network variance.
+    """
+
+    name = 'offline'
+    audio_format = 'wav'
+    sample_rate = GTTS_SAMPLE_RATE
+
+    # Timing of the generated speech (in ms)
+    SYLLABLE_MS = 90
+    WORD_GAP_MS = 70
+    CLAUSE_PAUSE_MS = 150
+    SENTENCE_PAUSE_MS = 300
+
+    def synthesize(self, text, language, slow=False):
+        tempo = 1.5 if slow else 1.0
+        pieces = []
+
+        for word in text.split():
+            digest = hashlib.sha256(f"{language}\0{word}".encode('utf-8')).digest()
+            pieces.append(self._render_word(word, digest, tempo))
+
+            # Pause after the word depending on trailing punctuation
+            if word[-1] in '.!?\u0964\u0965':
+                gap_ms = self.SENTENCE_PAUSE_MS
+            elif word[-1] in ',;:':
+                gap_ms = self.CLAUSE_PAUSE_MS
+            else:
+                gap_ms = self.WORD_GAP_MS
+            pieces.append(np.zeros(int(self.sample_rate * gap_ms * tempo / 1000), dtype=np.float32))
+
+        samples = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+        return self._encode_wav(samples)
+
+    def _render_word(self, word, digest, tempo):
+        rate = self.sample_rate
+        syllables = max(1, round(len(word) / 3))
+        duration_ms = (self.SYLLABLE_MS * syllables + 60) * tempo
+        n = int(rate * duration_ms / 1000)
+        t = np.arange(n, dtype=np.float64) / rate
+
+        # Per-word fundamental (110-200 Hz) with a gentle rise and fall
+        f0 = 110.0 + digest[0] % 90
+        f0_curve = f0 * (1.0 + 0.08 * np.sin(np.pi * t / max(t[-1], 1e-6)))
+        phase = 2 * np.pi * np.cumsum(f0_curve) / rate
+
+        # Two formants chosen per word give each "vowel" a different colour
+        f1 = 300.0 + digest[1] * 3.0
+        f2 = 900.0 + digest[2] * 7.0
+        voiced = np.zeros(n)
+        for k in range(1, int((rate / 2) / (f0 * 1.1))):
+            harmonic = k * f0
+            gain = 1.0 / (1.0 + ((harmonic - f1) / 120.0) ** 2) + 0.5 / (1.0 + ((harmonic - f2) / 180.0) ** 2)
+            if gain > 0.01:
+                voiced += gain * np.sin(k * phase)
+
+        # Syllable envelope, plus a short noise burst at each syllable onset
+        envelope = np.abs(np.sin(np.pi * syllables * t / max(t[-1], 1e-6))) ** 0.7
+        rng = np.random.default_rng(int.from_bytes(digest[3:11], 'little'))
+        noise = np.diff(rng.standard_normal(n + 1))
+        onsets = np.zeros(n)
+        burst = int(rate * 0.02)
+        for s in range(syllables):
+            start = int(s * n / syllables)
+            length = min(burst, n - start)
+            onsets[start:start + length] = np.exp(-np.arange(length) / (burst / 4))
+
+        signal = voiced * envelope + 0.3 * noise * onsets
+        peak = np.max(np.abs(signal))
+        if peak > 0:
+            signal *= 0.5 / peak
+        return signal.astype(np.float32)
+
+    def _encode_wav(self, samples):
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(pcm.tobytes())
+        return buffer.getvalue()
+
+
+# Available synthesis backends by name
+SYNTHESIS_BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    OfflineBackend.name: OfflineBackend
+}
+
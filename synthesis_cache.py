@@ -0,0 +1,156 @@
+import os
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# Default disk budget for cached synthesis output (256 MB)
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+
+class SynthesisCache:
+    """
+    Persistent, content-addressed cache for raw synthesized speech.
+
+    Entries hold the base audio exactly as returned by the synthesis engine,
+    before any emotion, voice or effect processing, so every rendering of the
+    same prompt can share one network round trip. Entries are stored as one
+    file per key and evicted least-recently-used first once the disk budget
+    is exceeded. Recency survives restarts through the files' mtimes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        # key -> size in bytes, ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Create cache directory if it doesn't exist
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        self._load_index()
+
+    @staticmethod
+    def make_key(text, language, slow=False, backend='gtts'):
+        """Return the cache key for a (normalized text, language, slow flag, backend) tuple"""
+        normalized = ' '.join(unicodedata.normalize('NFC', text).split())
+        payload = f"{backend}\0{language}\0{int(bool(slow))}\0{normalized}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached bytes for key, or None on a miss"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            path = self._path_for(key)
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                # Touch the file so recency survives a restart
+                os.utime(path, None)
+            except OSError as e:
+                logging.warning(f"Dropping unreadable synthesis cache entry {key}: {str(e)}")
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        """Store data under key and evict old entries if over the disk budget"""
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path_for(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except OSError as e:
+                logging.warning(f"Failed to write synthesis cache entry {key}: {str(e)}")
+                return
+
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+
+            self._evict()
+
+    def get_stats(self):
+        """Return hit/miss/eviction counters and current disk usage"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'size_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def _path_for(self, key):
+        # Shard by the first two hex digits to keep directories small
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    def _evict(self):
+        # Caller must hold self._lock
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self._path_for(key))
+            except OSError:
+                pass
+
+    def _load_index(self):
+        # Rebuild the LRU order from the files already on disk
+        found = []
+        for shard in os.listdir(self.cache_dir):
+            shard_dir = os.path.join(self.cache_dir, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                path = os.path.join(shard_dir, name)
+                if name.endswith('.tmp'):
+                    # Leftover from an interrupted write
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                    continue
+                if not name.endswith('.bin'):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found.append((stat.st_mtime, name[:-len('.bin')], stat.st_size))
+
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+        with self._lock:
+            self._evict()
+
+        logging.debug(f"Loaded synthesis cache index: {len(self._entries)} entries, {self._total_bytes} bytes")
@@ -0,0 +1,29 @@
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from synthesis_backends import OfflineBackend
+
+SPEECH_TEXT = ("Please listen carefully, as our menu options have recently changed. "
+               "Would you like to hear these options again? "
+               "This is a very important notice about your account.")
+
+
+@pytest.fixture(scope='session')
+def speech():
+    """Return a function giving (channels, n) float32 offline-backend speech of a given length"""
+    with wave.open(io.BytesIO(OfflineBackend().synthesize(SPEECH_TEXT, 'en'))) as reader:
+        sample_rate = reader.getframerate()
+        source = np.frombuffer(reader.readframes(reader.getnframes()), dtype=np.int16).astype(np.float32) / 32768
+
+    def make(seconds, channels=1):
+        n = int(seconds * sample_rate)
+        samples = np.tile(source, -(-n // len(source)))[:n]
+        if channels > 1:
+            # Give each extra channel a different offset so channels are not identical
+            samples = np.stack([np.roll(samples, channel * 997) for channel in range(channels)])
+        return np.ascontiguousarray(np.atleast_2d(samples)), sample_rate
+
+    return make
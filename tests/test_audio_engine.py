@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from pydub import AudioSegment
+
+from audio_engine import AudioBuffer, ReverbBank
+from tts_service import REVERB_PROFILES, VOICE_LAYERS
+
+
+def error_db(actual, expected):
+    """Level of the difference between two renders relative to the expected one, in dB"""
+    if isinstance(expected, AudioSegment):
+        expected = AudioBuffer.from_segment(expected)
+    assert actual.samples.shape == expected.samples.shape
+    difference = np.sqrt(np.mean(np.square(actual.samples - expected.samples, dtype=np.float64)))
+    return 20 * np.log10(max(difference, 1e-12) / np.sqrt(np.mean(np.square(expected.samples, dtype=np.float64))))
+
+
+def pcm(audio):
+    """Samples of a buffer or segment as 16-bit integers"""
+    if isinstance(audio, AudioBuffer):
+        audio = audio.to_segment()
+    return np.frombuffer(audio.raw_data, dtype=np.int16).astype(np.int64)
+
+
+@pytest.fixture
+def clip(speech):
+    """Two seconds of speech as a (buffer, segment) pair holding the same 16-bit samples"""
+    samples, sample_rate = speech(2)
+    segment = AudioBuffer(samples, sample_rate).to_segment()
+    return AudioBuffer.from_segment(segment), segment
+
+
+def test_gain_and_overlay_match_pydub(clip):
+    audio, segment = clip
+    assert error_db(audio.copy().apply_gain(-6), segment - 6) < -60
+    assert error_db(audio.copy().overlay(audio.copy().apply_gain(-6), 300), segment.overlay(segment - 6, position=300)) < -60
+
+
+def test_one_pole_filters_match_pydub(clip):
+    audio, segment = clip
+    assert error_db(audio.copy().low_pass_filter(3000), segment.low_pass_filter(3000)) < -60
+    assert error_db(audio.copy().high_pass_filter(300), segment.high_pass_filter(300)) < -60
+
+
+@pytest.mark.parametrize('ratio', [0.84, 1.12])
+def test_resampling_matches_pydub(clip, ratio):
+    audio, segment = clip
+    sample_rate = segment.frame_rate
+    respawned = segment._spawn(segment.raw_data, overrides={'frame_rate': int(sample_rate * ratio)})
+    assert error_db(audio.shifted(ratio), respawned.set_frame_rate(sample_rate)) < -60
+
+    relabelled = audio.copy().set_sample_rate_label(int(sample_rate * ratio)).resample(44100)
+    expected = AudioBuffer.from_segment(respawned.set_frame_rate(44100))
+    # audioop ends its output a couple of frames differently
+    n = min(relabelled.frame_count, expected.frame_count)
+    assert abs(relabelled.frame_count - expected.frame_count) <= 2
+    assert error_db(AudioBuffer(relabelled.samples[:, :n], 44100), AudioBuffer(expected.samples[:, :n], 44100)) < -60
+
+
+@pytest.mark.parametrize('threshold, ratio, attack, release', [
+    (-20.0, 2.0, 5.0, 50.0),
+    (-20.0, 4.0, 5.0, 50.0),
+    (-22.0, 3.0, 5.0, 50.0),
+    (-25.0, 1.5, 5.0, 100.0),
+    (-15.0, 4.0, 5.0, 50.0)
+])
+def test_compressor_loudness_matches_pydub(clip, threshold, ratio, attack, release):
+    audio, segment = clip
+    compressed = audio.copy().compress_dynamic_range(threshold, ratio, attack, release)
+    expected = segment.compress_dynamic_range(threshold=threshold, ratio=ratio, attack=attack, release=release)
+    loudness = 20 * np.log10(np.sqrt(np.mean(np.square(compressed.samples, dtype=np.float64))))
+    assert loudness < segment.dBFS
+    assert abs(loudness - expected.dBFS) <= 1.0
+
+
+@pytest.mark.parametrize('profile', ['echo', 'reverb', 'ethereal'])
+def test_convolution_matches_the_multi_tap_overlays(clip, profile):
+    audio, segment = clip
+    if profile == 'echo':
+        # The second repeat echoes the first too
+        expected = segment.overlay(segment - 6, position=300)
+        expected = expected.overlay(expected - 12, position=600)
+    elif profile == 'reverb':
+        expected = segment
+        for delay in [50, 100, 150, 200, 250, 300, 350]:
+            expected = expected.overlay(segment - 10 - (delay // 20), position=delay)
+    else:
+        expected = segment
+        for i, delay in enumerate([100, 200, 300, 400, 500, 600, 700, 800]):
+            expected = expected.overlay(segment - 12 - (2 * i), position=delay)
+
+    reverberated = audio.copy().convolve(ReverbBank(REVERB_PROFILES).impulse_response(profile, audio.sample_rate))
+    # pydub rounds every tap's gain and every overlay to 16 bits, about a step each
+    assert error_db(reverberated, expected) < -55
+    taps = len(REVERB_PROFILES[profile]['taps'])
+    assert np.max(np.abs(pcm(reverberated) - pcm(expected))) <= 2 * taps
+
+
+def test_voices_match_shifted_overlays(clip):
+    audio, segment = clip
+    expected = audio.copy()
+    for voice in VOICE_LAYERS['chorus']:
+        expected.overlay(audio.shifted(voice['ratio']), voice['delay'], voice['gain'])
+    assert error_db(audio.copy().add_voices(VOICE_LAYERS['chorus']), expected) < -100
+
+    # The original pydub chorus: each voice respawned at a shifted rate and converted back
+    chorus = segment
+    for voice in VOICE_LAYERS['chorus']:
+        respawned = segment._spawn(segment.raw_data, overrides={'frame_rate': int(segment.frame_rate * voice['ratio'])})
+        chorus = chorus.overlay(respawned.set_frame_rate(segment.frame_rate) + voice['gain'], position=voice['delay'])
+    assert error_db(audio.copy().add_voices(VOICE_LAYERS['chorus']), chorus) < -60
@@ -0,0 +1,140 @@
+import random
+
+import numpy as np
+import pytest
+
+from audio_engine import AudioBuffer, FilterBank, NoiseBank, ReverbBank, TailMixer
+from render_plan import (CompressStage, ConvolveStage, FilterStage, GainStage, NoiseStage, NormalizeStage,
+                         RenderContext, RenderPlan, SentenceAnalysisStage, Stage, VoicesStage)
+from tts_service import FILTER_PROFILES, NOISE_PROFILES, REVERB_PROFILES, VOICE_LAYERS
+
+
+def make_context(text='text', **kwargs):
+    """A render context with the service's filter, noise and reverb banks"""
+    return RenderContext(text, random.Random(0), filter_bank=FilterBank(FILTER_PROFILES),
+                         noise_bank=NoiseBank(NOISE_PROFILES), reverb_bank=ReverbBank(REVERB_PROFILES), **kwargs)
+
+
+class FailingStage(Stage):
+    """A stage that always raises"""
+
+    name = 'failing'
+
+    def apply(self, audio, context):
+        raise RuntimeError('broken effect')
+
+
+def test_failing_stage_is_skipped_without_losing_earlier_stages(speech):
+    samples, sample_rate = speech(2)
+    plan = RenderPlan([GainStage(-6), FailingStage(), GainStage(3)])
+    audio = plan.run(AudioBuffer(samples.copy(), sample_rate), RenderContext('text', random.Random(0)))
+    np.testing.assert_allclose(audio.samples, samples * np.float32(10 ** (-3 / 20)), rtol=1e-5, atol=1e-7)
+
+
+class FailingStreamStage(Stage):
+    """A streaming stage whose block processor always raises"""
+
+    name = 'failing_stream'
+    streams = True
+
+    def processor(self, audio, context):
+        return self
+
+    def process(self, samples):
+        raise RuntimeError('broken block processor')
+
+
+def test_failing_streaming_stage_is_skipped_and_the_group_still_streams(speech):
+    samples, sample_rate = speech(2)
+    plan = RenderPlan([GainStage(-6), FailingStreamStage()])
+    context = RenderContext('text', random.Random(0), block_frames=1024)
+    audio = plan.run(AudioBuffer(samples.copy(), sample_rate), context)
+    np.testing.assert_allclose(audio.samples, samples * np.float32(10 ** (-6 / 20)), rtol=1e-5, atol=1e-7)
+
+
+def test_incremental_sentences_joined_with_their_tails_match_the_whole_clip(speech):
+    samples, sample_rate = speech(3)
+    # Sentences shorter than the hall's ring-out, so tails carry over more than one join
+    bounds = [0, sample_rate // 2, sample_rate, 2 * sample_rate, samples.shape[1]]
+    plan = RenderPlan([ConvolveStage('hall'), GainStage(-3)])
+
+    whole = plan.run(AudioBuffer(samples.copy(), sample_rate), make_context())
+
+    tails = TailMixer()
+    joined = []
+    for start, end in zip(bounds, bounds[1:]):
+        context = make_context(incremental=True)
+        segment = plan.run(AudioBuffer(samples[:, start:end].copy(), sample_rate), context)
+        assert segment.frame_count == end - start
+        joined.append(tails.mix(segment, context.tail).samples)
+
+    np.testing.assert_allclose(np.concatenate(joined, axis=1), whole.samples, atol=1e-5)
+
+
+def test_sentence_analysis_applies_to_each_incremental_sentence(speech):
+    samples, sample_rate = speech(2)
+    stage = SentenceAnalysisStage(['important'])
+    text = 'This is important.'
+
+    whole = stage.apply(AudioBuffer(samples.copy(), sample_rate), RenderContext(text, random.Random(0)))
+    np.testing.assert_array_equal(whole.samples, samples)
+
+    sentence = stage.apply(AudioBuffer(samples.copy(), sample_rate),
+                           RenderContext(text, random.Random(0), incremental=True))
+    assert not np.array_equal(sentence.samples, samples)
+
+
+def test_streaming_matches_whole_clip_rendering(speech):
+    samples, sample_rate = speech(3, channels=2)
+    plan = RenderPlan([
+        FilterStage(FILTER_PROFILES['bright'], 'bright'),
+        GainStage(-3),
+        CompressStage(threshold=-20.0, ratio=4.0),
+        ConvolveStage('hall'),
+        # Voices at their natural pitch are plain delays, which stream exactly
+        VoicesStage(VOICE_LAYERS['duet'][:1], 'duet'),
+        NoiseStage('breath', -30)
+    ])
+    assert all(stage.streams for stage in plan.stages)
+
+    whole = plan.run(AudioBuffer(samples.copy(), sample_rate), make_context())
+    # A block size that doesn't divide the clip, so the last block is short
+    streamed = plan.run(AudioBuffer(samples.copy(), sample_rate), make_context(block_frames=1000))
+    np.testing.assert_allclose(streamed.samples, whole.samples, atol=1e-5)
+
+
+@pytest.mark.parametrize('layers', ['chorus', 'duet', 'ethereal', 'voice_layering'])
+def test_streamed_detuned_voices_keep_their_level(speech, layers):
+    samples, sample_rate = speech(3, channels=2)
+    plan = RenderPlan([VoicesStage(VOICE_LAYERS[layers], layers)])
+
+    # Streaming swaps the drifting read for a delay-line pitch shifter, so only the level is kept
+    whole = plan.run(AudioBuffer(samples.copy(), sample_rate), make_context()).samples - samples
+    streamed = plan.run(AudioBuffer(samples.copy(), sample_rate), make_context(block_frames=1000)).samples - samples
+    level = lambda voices: 20 * np.log10(np.sqrt(np.mean(np.square(voices, dtype=np.float64))))
+    assert abs(level(streamed) - level(whole)) < 0.5
+
+
+def test_optimized_plan_matches_running_every_stage(speech):
+    samples, sample_rate = speech(2)
+    stages = [
+        GainStage(-3),
+        FilterStage(FILTER_PROFILES['bright'], 'bright'),
+        GainStage(2),
+        FilterStage(FILTER_PROFILES['warm'], 'warm'),
+        ConvolveStage('reverb'),
+        GainStage(-1),
+        CompressStage(threshold=-20.0, ratio=4.0),
+        FilterStage([], 'flat'),
+        GainStage(6),
+        NormalizeStage(0.1)
+    ]
+    plan = RenderPlan(stages)
+    # Gains folded into one before the compressor, filters merged, the no-op and the last gain dropped
+    assert [stage.name for stage in plan.stages] == ['filter', 'convolve', 'gain', 'compress', 'normalize']
+
+    expected = AudioBuffer(samples.copy(), sample_rate)
+    for stage in stages:
+        expected = stage.apply(expected, make_context())
+    audio = plan.run(AudioBuffer(samples.copy(), sample_rate), make_context())
+    np.testing.assert_allclose(audio.samples, expected.samples, atol=1e-5)
@@ -0,0 +1,110 @@
+import time
+
+import numpy as np
+import pytest
+from pydub import AudioSegment
+
+import audio_engine
+from audio_engine import AudioBuffer, hann_window, time_stretch
+
+# Longest clip the stretch timing check runs at (the longest renders we serve)
+MAX_CLIP_SECONDS = 150
+
+
+def frame_by_frame_time_stretch(samples, sample_rate, rate):
+    """The WSOLA search run one frame at a time, as time_stretch originally did"""
+    channels, n = samples.shape
+    out_n = int(n / rate)
+    hop = max(1, int(audio_engine.WSOLA_FRAME_MS * sample_rate / 2000))
+    frame = 2 * hop
+    step = max(1, int(sample_rate // audio_engine.WSOLA_SEARCH_RATE))
+    tolerance = int(audio_engine.WSOLA_TOLERANCE_MS * sample_rate / 1000) // step * step
+    frame_count = -(-(out_n + hop) // hop) + 1
+
+    pad_left = hop + tolerance
+    pad_right = max(0, int(frame_count * hop * rate) + frame + tolerance + hop - n)
+    padded = np.pad(samples, ((0, 0), (pad_left, pad_right)))
+    mono = padded.mean(axis=0) if channels > 1 else padded[0]
+    coarse = mono[::step].copy()
+
+    nominal = (np.arange(frame_count) * hop * rate).astype(np.int64) + tolerance
+    positions = np.empty(frame_count, dtype=np.int64)
+    positions[0] = nominal[0]
+    coarse_hop = hop // step
+    coarse_span = 2 * (tolerance // step) + coarse_hop
+    for k in range(1, frame_count):
+        target = positions[k - 1] + hop
+        template = coarse[target // step:target // step + coarse_hop]
+        low = (nominal[k] - tolerance) // step
+        correlation = np.correlate(coarse[low:low + coarse_span], template, 'valid')
+        best = (low + int(correlation.argmax())) * step
+        start = max(0, best - step)
+        correlation = np.correlate(mono[start:start + 2 * step + hop], mono[target:target + hop], 'valid')
+        positions[k] = start + int(correlation.argmax())
+
+    frames = padded[:, positions[:, np.newaxis] + np.arange(frame)] * hann_window(frame)
+    output = np.zeros((channels, frame_count + 1, hop), dtype=np.float32)
+    output[:, :frame_count] += frames[:, :, :hop]
+    output[:, 1:] += frames[:, :, hop:]
+    return output.reshape(channels, -1)[:, hop:hop + out_n]
+
+
+def best_time(function, repeat=3):
+    """Return the fastest of repeat calls in seconds"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+@pytest.mark.parametrize('rate', [0.5, 0.8, 1.25, 2.0])
+def test_time_stretch_matches_frame_by_frame_search(speech, rate):
+    samples, sample_rate = speech(12)
+    expected = frame_by_frame_time_stretch(samples, sample_rate, rate)
+    np.testing.assert_array_equal(time_stretch(samples, sample_rate, rate), expected)
+
+
+def test_time_stretch_stereo_matches_frame_by_frame_search(speech):
+    samples, sample_rate = speech(5, channels=2)
+    expected = frame_by_frame_time_stretch(samples, sample_rate, 0.8)
+    np.testing.assert_array_equal(time_stretch(samples, sample_rate, 0.8), expected)
+
+
+def test_time_stretch_keeps_duration(speech):
+    samples, sample_rate = speech(3)
+    for rate in (0.5, 1.5):
+        assert time_stretch(samples, sample_rate, rate).shape == (1, int(samples.shape[1] / rate))
+
+
+def test_stretch_skips_wsola_for_a_playback_rate_change(speech, monkeypatch):
+    samples, sample_rate = speech(2)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('time_stretch should not run when tempo and pitch change together')
+
+    monkeypatch.setattr(audio_engine, 'time_stretch', fail)
+    audio = AudioBuffer(samples.copy(), sample_rate).stretch(sample_rate, tempo=1.2, pitch=1.2 * 1.001)
+    assert audio.frame_count == int(samples.shape[1] / 1.2)
+
+
+@pytest.mark.parametrize('speed,semitones', [(0.8, 4), (1.25, -4), (2.0, 4)])
+def test_stretch_costs_no_more_than_chained_resamples(speech, speed, semitones):
+    """At the longest clip, one stretch must not cost more than the pydub speed + pitch resample chain"""
+    samples, sample_rate = speech(MAX_CLIP_SECONDS)
+    pitch = 2 ** (semitones / 12.0)
+    segment = AudioSegment(data=(samples[0] * 32767).astype(np.int16).tobytes(),
+                           sample_width=2, frame_rate=sample_rate, channels=1)
+
+    def chained():
+        audio = segment._spawn(segment.raw_data, overrides={'frame_rate': int(segment.frame_rate * speed)})
+        audio = audio.set_frame_rate(44100)
+        audio = audio._spawn(audio.raw_data, overrides={'frame_rate': int(audio.frame_rate * pitch)})
+        audio.set_frame_rate(44100)
+
+    def stretched():
+        AudioBuffer(samples.copy(), sample_rate).stretch(sample_rate, tempo=speed, pitch=pitch)
+
+    stretched()
+    assert best_time(stretched) <= best_time(chained)
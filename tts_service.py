@@ -1,11 +1,21 @@
 import os
+import re
+import time
 import uuid
 import logging
 import random
-from gtts import gTTS
-from io import BytesIO
-import tempfile
-from pydub import AudioSegment
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from audio_engine import AudioBuffer, FilterBank, NoiseBank, ReverbBank, TailMixer, design_sos
+from render_plan import (RenderPlan, RenderContext, StretchStage, GainStage, CompressStage, NormalizeStage,
+                         FilterStage, VariabilityStage, ConvolveStage, VoicesStage, NoiseStage, PauseStage,
+                         WordEmphasisStage, SentenceAnalysisStage)
+from codec import AudioCodec, DEFAULT_CODEC_CONCURRENCY, OUTPUT_PROFILES, DEFAULT_OUTPUT_PROFILE, resolve_output_profile
+from synthesis_cache import SynthesisCache, DEFAULT_CACHE_MAX_BYTES
+from audio_store import AudioStore, DEFAULT_AUDIO_STORE_MAX_BYTES, DEFAULT_AUDIO_TTL_SECONDS
+from synthesis_backends import SYNTHESIS_BACKENDS, GTTSBackend, OfflineBackend
+from render_cache import (RenderCache, SentenceCache, DecodedAudioCache, DEFAULT_RENDER_CACHE_ENTRIES,
+                          DEFAULT_SENTENCE_CACHE_BYTES, DEFAULT_DECODED_CACHE_BYTES, make_render_key, derive_seed, derive_sentence_seed)
 
 # Supported languages with their codes and display names
 SUPPORTED_LANGUAGES = {
@@ -196,6 +206,14 @@ AUDIO_EFFECTS = {
         'description': 'Ethereal, otherworldly voice effect',
         'enabled': True
     },
+    'room': {
+        'description': 'Small room ambience',
+        'enabled': True
+    },
+    'hall': {
+        'description': 'Large hall reverb with a long tail',
+        'enabled': True
+    },
     'duet': {
         'description': 'Layered voice duet effect',
         'enabled': True
@@ -242,6 +260,91 @@ PROSODY_SETTINGS = {
     }
 }
 
+# Filter profiles as (type, frequency[, gain dB]) specs, compiled into SOS cascades at startup
+FILTER_PROFILES = {
+    # Emotion EQ profiles (EMOTION_PARAMETERS[...]['eq_profile'])
+    'flat': [],
+    'bright': [('high_pass', 180), ('high_shelf', 4000, 3)],  # Cut very low frequencies, boost highs
+    'muffled': [('low_shelf', 200, 2), ('high_shelf', 3000, -2)],  # Boost lows, cut highs
+    'sharp': [('high_pass', 150), ('low_shelf', 400, -1), ('high_shelf', 3000, 4)],  # Cut lows, boost highs
+    'warm': [('low_shelf', 250, 2), ('high_shelf', 8000, -1)],  # Boost lows, slightly cut highs
+    'tinny': [('high_pass', 300), ('high_shelf', 4000, 3)],  # Cut more lows, boost highs
+    'airy': [('high_pass', 500), ('high_shelf', 6000, 4)],  # Cut lows, boost very high frequencies
+    'harsh': [('high_pass', 200), ('low_shelf', 300, 2), ('high_shelf', 2000, 3)],  # Boost low-mids and highs
+    # Voice timbre (VOICE_TYPES[...]['timbre'] above / below zero)
+    'timbre_clear': [('high_pass', 800)],
+    'timbre_deep': [('low_pass', 3000)],
+    # Spectral enhancement: remove rumble, boost presence (3-4kHz) and articulation (5-8kHz)
+    'spectral_enhancement': [('high_pass', 100), ('high_shelf', 3000, 2), ('high_shelf', 5000, 1)]
+}
+
+# Noise beds as filter specs applied to white noise
+NOISE_PROFILES = {
+    'telephone': [('high_pass', 300), ('low_pass', 3400)],  # Line noise in the telephone band
+    'whisper': [('high_shelf', 2000, 6)],  # Breathy hiss for the whisper effect
+    'breath': [('high_shelf', 3000, 10)]  # Breath noise for prosody breathiness
+}
+
+# Reverb impulse responses (see audio_engine.design_impulse_response)
+REVERB_PROFILES = {
+    # Discrete reflections of the original echo, multi-echo reverb and ethereal tail
+    # (the echo's second repeat also echoes the first, hence the third tap)
+    'echo': {'taps': [(300, -6), (600, -12), (900, -18)]},
+    'reverb': {'taps': [(delay, -10 - (delay // 20)) for delay in [50, 100, 150, 200, 250, 300, 350]]},
+    'ethereal': {'taps': [(delay, -12 - (2 * i)) for i, delay in enumerate([100, 200, 300, 400, 500, 600, 700, 800])]},
+    # Synthetic rooms
+    'room': {'decay': 0.4, 'predelay': 8, 'damping': 6000, 'level': -8},
+    'hall': {'decay': 1.8, 'predelay': 25, 'damping': 4000, 'level': -10}
+}
+
+# Layered voices as {ratio, delay ms, gain dB[, fade_in ms, filters]} (see audio_engine.render_voices)
+VOICE_LAYERS = {
+    # +7, -7 and +12 cents
+    'chorus': [
+        {'ratio': 1.007, 'delay': 15, 'gain': -6},
+        {'ratio': 0.993, 'delay': 30, 'gain': -6},
+        {'ratio': 1.012, 'delay': 45, 'gain': -9}
+    ],
+    # Original, up a minor third and down a fifth, faded in
+    'duet': [
+        {'ratio': 1.0, 'delay': 20, 'gain': -6, 'fade_in': 20},
+        {'ratio': 1.03, 'delay': 15, 'gain': -6, 'fade_in': 30},
+        {'ratio': 0.84, 'delay': 10, 'gain': -9, 'fade_in': 40}
+    ],
+    # Dreamy chorus for the ethereal effect
+    'ethereal': [
+        {'ratio': 1.005, 'delay': 25, 'gain': -6}
+    ],
+    # +/-2 cents, much quieter, with slight EQ differences
+    'voice_layering': [
+        {'ratio': 1.002, 'delay': 5, 'gain': -12, 'filters': [('high_shelf', 5000, 2)]},
+        {'ratio': 0.998, 'delay': 10, 'gain': -12, 'filters': [('low_shelf', 300, 2)]}
+    ]
+}
+
+# Number of compiled render plans (one per distinct combination of processing options) kept in memory
+RENDER_PLAN_CACHE_SIZE = 1024
+
+# Render parameters that only affect encoding, not the rendered audio
+OUTPUT_PARAMS = ('format', 'profile', 'bitrate')
+
+# Read size when streaming an already rendered file
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Most edit operations a playground edit list may hold
+MAX_EDIT_OPERATIONS = 50
+
+# Playground previews: length of the rendered window, the rate it is processed at and its output profile
+PREVIEW_WINDOW_MS = 8000
+PREVIEW_SAMPLE_RATE = 16000
+PREVIEW_PROFILE = 'mp3_32'
+
+# gTTS sends at most this many characters per request to the translate endpoint
+SYNTHESIS_CHUNK_CHARS = 100
+
+# Crossfade used when stitching chunked synthesis back together (in ms)
+SYNTHESIS_CROSSFADE_MS = 10
+
 # Important words that often receive emphasis in natural speech
 EMPHASIS_WORDS = [
     'very', 'extremely', 'absolutely', 'definitely', 'certainly',
@@ -251,19 +354,784 @@ EMPHASIS_WORDS = [
     'best', 'worst', 'greatest', 'highest', 'lowest', 'amazing'
 ]
 
+def split_sentences(text):
+    """Split text into sentences at sentence-final punctuation (including the Devanagari danda)"""
+    return [sentence for sentence in re.split(r'(?<=[.!?\u0964\u0965])\s+', text.strip()) if sentence]
+
+
+def split_text_chunks(text, max_chars=SYNTHESIS_CHUNK_CHARS):
+    """
+    Split text into synthesis chunks at sentence, then clause, then word boundaries
+    
+    Short neighbouring sentences are packed into one chunk so that each chunk uses
+    as much of the per-request character budget as possible.
+    
+    Args:
+        text (str): The text to split
+        max_chars (int): Maximum characters per chunk (single words longer than this are kept whole)
+        
+    Returns:
+        list: Chunks of text in their original order
+    """
+    pieces = []
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_chars:
+            pieces.append(sentence)
+            continue
+        for clause in re.split(r'(?<=[,;:])\s+', sentence):
+            if len(clause) <= max_chars:
+                pieces.append(clause)
+            else:
+                pieces.extend(clause.split())
+    
+    # Greedily pack pieces into chunks of at most max_chars
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if not piece:
+            continue
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def resolve_levels(emotion, voice_type, custom_speed=None, custom_pitch=None, custom_volume=None):
+    """Return the clamped (speed, pitch, volume) combining emotion, voice type and custom values"""
+    # Speed modification (use custom value if provided)
+    speed = custom_speed if custom_speed is not None else EMOTION_PARAMETERS[emotion]['speed']
+    speed = max(0.5, min(2.0, speed))  # Clamp between 0.5 and 2.0
+    
+    # Calculate final pitch by combining emotion and voice type parameters
+    base_pitch = VOICE_TYPES[voice_type]['base_pitch']
+    emotion_pitch = EMOTION_PARAMETERS[emotion]['pitch']
+    final_pitch = custom_pitch if custom_pitch is not None else (base_pitch + emotion_pitch)
+    final_pitch = max(-10, min(10, final_pitch))  # Clamp between -10 and 10
+    
+    # Calculate final volume
+    volume_db = custom_volume if custom_volume is not None else EMOTION_PARAMETERS[emotion]['volume']
+    volume_db = max(-10, min(10, volume_db))  # Clamp between -10 and 10
+    
+    return speed, final_pitch, volume_db
+
+
+def parse_edit(data):
+    """Return the manipulation parameters of a request as an edit operation, with numbers converted"""
+    speed = data.get('speed')
+    pitch = data.get('pitch')
+    volume = data.get('volume')
+    
+    # Convert numeric parameters if provided as strings
+    if speed is not None:
+        try:
+            speed = float(speed)
+        except (ValueError, TypeError):
+            speed = 1.0
+            
+    if pitch is not None:
+        try:
+            pitch = int(pitch)
+        except (ValueError, TypeError):
+            pitch = 0
+            
+    if volume is not None:
+        try:
+            volume = int(volume)
+        except (ValueError, TypeError):
+            volume = 0
+            
+    edit = {
+        'speed': speed,
+        'pitch': pitch,
+        'volume': volume,
+        'eq_bass': data.get('eq_bass'),
+        'eq_mid': data.get('eq_mid'),
+        'eq_treble': data.get('eq_treble'),
+        'effect_type': data.get('effect_type', 'none'),
+        'effect_intensity': data.get('effect_intensity', 0.5)
+    }
+    for key in ('eq_bass', 'eq_mid', 'eq_treble', 'effect_intensity'):
+        if edit[key] is not None:
+            edit[key] = float(edit[key])
+    return edit
+
+
+def edit_tempo(edit):
+    """Return the tempo change an edit operation applies (its output lasts 1 / tempo times its input)"""
+    speed = edit.get('speed')
+    if speed and speed != 1.0:
+        return max(0.5, min(2.0, speed))  # Clamp between 0.5 and 2.0
+    return 1.0
+
+
+def edits_tempo(edits):
+    """Return the combined tempo change of an edit list, i.e. seconds of the original per second of output"""
+    tempo = 1.0
+    for edit in edits:
+        tempo *= edit_tempo(edit)
+    return tempo
+
+
+@lru_cache(maxsize=RENDER_PLAN_CACHE_SIZE)
+def compile_render_plan(emotion, voice_type, custom_speed=None, custom_pitch=None, custom_volume=None,
+                        audio_effect='none', prosody_level='default', enable_emphasis=True,
+                        sentence_analysis=False, voice_layering=False, spectral_enhancement=False):
+    """
+    Compile validated processing options into an optimized RenderPlan
+    
+    Stages are listed in the order the pipeline has always applied them;
+    RenderPlan drops no-ops, folds gains and merges adjacent filters. Plans
+    are memoized per option combination.
+    
+    Returns:
+        RenderPlan: The plan for these options
+    """
+    emotion_params = EMOTION_PARAMETERS[emotion]
+    speed, final_pitch, volume_db = resolve_levels(emotion, voice_type, custom_speed, custom_pitch, custom_volume)
+    stages = []
+    
+    # Speed and pitch (with the conversion to the working rate), then volume
+    stages.append(StretchStage(tempo=speed, pitch_semitones=final_pitch))
+    stages.append(GainStage(volume_db))
+    
+    # Emphasis: compression for positive emphasis, subtle normalization for negative
+    emphasis = emotion_params['emphasis']
+    if emphasis > 0:
+        stages.append(CompressStage(threshold=-20.0 - (emphasis * 2), ratio=min(8.0, 2.0 + emphasis),
+                                    attack=5.0, release=50.0 + (emphasis * 10)))
+    elif emphasis < 0:
+        stages.append(NormalizeStage(headroom=abs(emphasis)))
+    
+    # Voice timbre (clearer above zero, deeper below), emotion EQ and the spectral enhancement EQ
+    timbre = VOICE_TYPES[voice_type]['timbre']
+    if timbre != 0:
+        profile = 'timbre_clear' if timbre > 0 else 'timbre_deep'
+        stages.append(FilterStage(FILTER_PROFILES[profile], profile))
+    eq_profile = emotion_params['eq_profile']
+    if eq_profile in FILTER_PROFILES:
+        stages.append(FilterStage(FILTER_PROFILES[eq_profile], f"eq:{eq_profile}"))
+    if spectral_enhancement:
+        # Its compression and normalization run at the end
+        stages.append(FilterStage(FILTER_PROFILES['spectral_enhancement'], 'spectral_enhancement'))
+    
+    # Pitch variability for more expressive emotions (happy, excited, angry)
+    if emotion_params['variability'] > 0:
+        stages.append(VariabilityStage(emotion_params['variability']))
+    
+    # Audio effect
+    if audio_effect != 'none' and AUDIO_EFFECTS[audio_effect]['enabled']:
+        stages.extend(_effect_stages(audio_effect))
+    
+    # Advanced prosody enhancements
+    if prosody_level != 'default':
+        # Fallback to natural if level not found
+        settings = PROSODY_SETTINGS.get(prosody_level, PROSODY_SETTINGS['natural'])
+        if settings['sentence_pause'] > 0 or settings['punctuation_pause'] > 0 or settings['micro_pauses']:
+            stages.append(PauseStage(settings['word_gap_variation'], settings['sentence_pause'],
+                                     settings['punctuation_pause'], settings['micro_pauses']))
+        if settings['emphasis_words'] and enable_emphasis:
+            stages.append(WordEmphasisStage(settings['intonation_strength']))
+        if settings['breathiness'] > 0:
+            # Breath noise, with volume based on intensity
+            stages.append(NoiseStage('breath', -int(30 - (settings['breathiness'] * 10))))
+    
+    if sentence_analysis:
+        stages.append(SentenceAnalysisStage(EMPHASIS_WORDS))
+    
+    if voice_layering:
+        # Slightly detuned, quieter duplicates for richness
+        stages.append(VoicesStage(VOICE_LAYERS['voice_layering'], 'voice_layering'))
+    
+    if spectral_enhancement:
+        # Subtle compression for balanced sound, then normalize for a consistent level
+        stages.append(CompressStage(threshold=-25, ratio=1.5, attack=5.0, release=100.0))
+        stages.append(NormalizeStage(headroom=0.5))
+    
+    return RenderPlan(stages)
+
+
+def _effect_stages(audio_effect):
+    # Stages for one AUDIO_EFFECTS entry
+    if audio_effect in ('echo', 'reverb', 'room', 'hall'):
+        # Echo and reverbs are one convolution each, whatever their number of reflections
+        return [ConvolveStage(audio_effect)]
+    
+    if audio_effect in ('chorus', 'duet'):
+        return [VoicesStage(VOICE_LAYERS[audio_effect], audio_effect)]
+    
+    if audio_effect == 'distortion':
+        return [
+            CompressStage(threshold=-20.0, ratio=10.0, attack=0.1, release=10.0),
+            # Bass boost for intensity and a high-frequency lift for "edge"
+            FilterStage([('low_shelf', 100, 5.0), ('high_shelf', 4000, 3.0)], 'distortion'),
+            GainStage(3)  # Compensate for the compression
+        ]
+    
+    if audio_effect == 'telephone':
+        return [
+            # Telephone frequency response (300Hz-3.4kHz), mild distortion and line noise
+            FilterStage([('high_pass', 300), ('low_pass', 3400)], 'telephone'),
+            CompressStage(threshold=-15, ratio=4.0),
+            NoiseStage('telephone', -26)
+        ]
+    
+    if audio_effect == 'megaphone':
+        return [
+            # Band-pass with resonant mids and heavy compression for a "shouting" effect
+            FilterStage([('high_pass', 600), ('low_pass', 4000)], 'megaphone'),
+            CompressStage(threshold=-18, ratio=8.0, attack=0.01),
+            GainStage(4)
+        ]
+    
+    if audio_effect == 'whisper_effect':
+        return [
+            # Quieter, without low frequencies, plus breathiness
+            GainStage(-6),
+            FilterStage([('high_pass', 800)], 'whisper_effect'),
+            NoiseStage('whisper', -20)
+        ]
+    
+    if audio_effect == 'ethereal':
+        return [
+            # Long reverb tail, dreamy chorus and high shimmer
+            ConvolveStage('ethereal'),
+            VoicesStage(VOICE_LAYERS['ethereal'], 'ethereal'),
+            FilterStage([('high_shelf', 6000, 3)], 'ethereal')
+        ]
+    
+    return []
+
+
 class TextToSpeechService:
-    def __init__(self, static_folder):
+    def __init__(self, static_folder, cache_dir=None, cache_max_bytes=DEFAULT_CACHE_MAX_BYTES,
+                 synthesis_workers=4, tts_endpoint=None, backend='gtts',
+                 render_cache_entries=DEFAULT_RENDER_CACHE_ENTRIES,
+                 sentence_cache_bytes=DEFAULT_SENTENCE_CACHE_BYTES, working_rate=None, output_rate=None,
+                 block_frames=None, codec_workers=DEFAULT_CODEC_CONCURRENCY,
+                 audio_store_bytes=DEFAULT_AUDIO_STORE_MAX_BYTES, audio_ttl_seconds=DEFAULT_AUDIO_TTL_SECONDS,
+                 audio_sweep_interval=None, render_index=None,
+                 decoded_cache_bytes=DEFAULT_DECODED_CACHE_BYTES):
         self.static_folder = static_folder
         self.audio_folder = os.path.join(static_folder, 'audio')
         
-        # Create audio directory if it doesn't exist
-        if not os.path.exists(self.audio_folder):
-            os.makedirs(self.audio_folder)
+        # Generated files, swept by age and disk quota (creates the audio directory if needed)
+        self.audio_store = AudioStore(self.audio_folder, max_bytes=audio_store_bytes,
+                                      ttl_seconds=audio_ttl_seconds)
+            
+        # Cache raw synthesis output outside the publicly served static folder
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.dirname(static_folder), 'cache', 'synthesis')
+        self.synthesis_cache = SynthesisCache(cache_dir, max_bytes=cache_max_bytes)
+        
+        # Bounded pool shared by all requests for concurrent chunk synthesis
+        self.synthesis_workers = max(1, synthesis_workers)
+        self.synthesis_pool = ThreadPoolExecutor(max_workers=self.synthesis_workers,
+                                                 thread_name_prefix='tts-synthesis')
+        
+        # Synthesis backends available to this instance and the default one for requests
+        self.backends = {
+            GTTSBackend.name: GTTSBackend(endpoint=tts_endpoint),
+            OfflineBackend.name: OfflineBackend()
+        }
+        if backend not in self.backends:
+            logging.warning(f"Unsupported synthesis backend: {backend}. Falling back to gtts.")
+            backend = GTTSBackend.name
+        self.default_backend = backend
+        
+        # Finished renders keyed by their full parameter set (including the seed)
+        self.render_cache = RenderCache(self.audio_folder, max_entries=render_cache_entries)
+        
+        # Keep files the render cache can still hand out for as long as the quota allows
+        self.audio_store.add_reference_source(self.render_cache.filenames)
+        
+        # Optional persistent metadata index (render_index.RenderIndex) shared across restarts and workers.
+        # It backs the render cache and keeps the sources of derived renders while the quota allows.
+        self.render_index = render_index
+        if self.render_index is not None:
+            self.audio_store.add_reference_source(self.render_index.derived_sources)
+            self.audio_store.add_removal_listener(self.render_index.mark_evicted)
+        if audio_sweep_interval:
+            self.audio_store.start_sweeper(audio_sweep_interval)
+        
+        # Processed audio per sentence for incremental re-renders
+        self.sentence_cache = SentenceCache(max_bytes=sentence_cache_bytes)
+        
+        # Decoded source files for repeated manipulations of the same clip
+        self.decoded_cache = DecodedAudioCache(max_bytes=decoded_cache_bytes)
+        
+        # Sample rate the processing stages run at (None keeps the backend's native rate)
+        # and the rate files are exported at (None exports at the working rate)
+        self.working_rate = working_rate or None
+        self.output_rate = output_rate or None
+        
+        # Frames per block for the streaming stages (None processes whole clips)
+        self.block_frames = block_frames or None
+        
+        # Encoder/decoder for synthesized and exported audio, with a bound on concurrent calls
+        self.codec = AudioCodec(max_concurrent=codec_workers)
+        
+        # Filter cascades for the timbre, EQ and spectral enhancement stages
+        # plus the noise beds and reverb impulse responses used by the effects
+        if self.working_rate:
+            sample_rates = [self.working_rate]
+        else:
+            sample_rates = sorted({b.sample_rate for b in self.backends.values()})
+        self.filter_bank = FilterBank(FILTER_PROFILES)
+        self.filter_bank.compile(sample_rates)
+        self.noise_bank = NoiseBank(NOISE_PROFILES)
+        self.noise_bank.compile(sample_rates)
+        self.reverb_bank = ReverbBank(REVERB_PROFILES)
+        self.reverb_bank.compile(sample_rates)
+            
+    def _synthesize(self, text, language, slow=False, backend=None):
+        """Return the backend's encoded base audio for the text, served from the synthesis cache when possible"""
+        backend = backend or self.backends[self.default_backend]
+        cache_key = SynthesisCache.make_key(text, language, slow, backend=backend.name)
+        data = self.synthesis_cache.get(cache_key)
+        if data is not None:
+            logging.debug(f"Synthesis cache hit for key: {cache_key}")
+            return data
+            
+        logging.debug(f"Synthesis cache miss for key: {cache_key}")
+        data = backend.synthesize(text, language, slow=slow)
+        
+        self.synthesis_cache.put(cache_key, data)
+        return data
+        
+    def _decode(self, data, backend):
+        """Decode a backend's encoded audio from memory (no temporary file) into a buffer"""
+        audio, _ = self.codec.decode(data, format=backend.audio_format)
+        return audio
+        
+    def load_audio(self, path, window=None):
+        """
+        Decode an audio file, reusing the decoded samples while the file is unchanged
+        
+        Args:
+            path (str): Path of the file to decode
+            window (tuple): Optional (start_ms, end_ms) to return only part of the file
+            
+        Returns:
+            tuple: (AudioBuffer the caller may modify, decode time in ms (0 when cached), cached flag)
+        """
+        key = DecodedAudioCache.make_key(path)
+        audio = self.decoded_cache.get(key, window)
+        if audio is not None:
+            return audio, 0.0, True
+            
+        audio, decode_ms = self.codec.decode(path)
+        self.decoded_cache.put(key, audio)
+        if window:
+            audio = audio.slice(*window)
+        return audio, decode_ms, False
+        
+    def apply_edit(self, audio, edit, working_rate=None):
+        """
+        Apply one playground edit operation (see parse_edit) to audio in place
+        
+        Args:
+            audio (AudioBuffer): The audio to modify
+            edit (dict): Speed, pitch, volume, EQ and effect settings
+            working_rate (int): Rate to process at (None uses the service's working rate)
+            
+        Returns:
+            AudioBuffer: The modified audio
+        """
+        pitch = edit.get('pitch')
+        volume = edit.get('volume')
+        eq_bass = edit.get('eq_bass')
+        eq_mid = edit.get('eq_mid')
+        eq_treble = edit.get('eq_treble')
+        effect_type = edit.get('effect_type', 'none')
+        effect_intensity = edit.get('effect_intensity', 0.5)
+        
+        # Apply speed and pitch modification independently, with one resample to the working rate
+        tempo = edit_tempo(edit)
+        
+        pitch_ratio = 1.0
+        if pitch and pitch != 0:
+            pitch = max(-10, min(10, pitch))  # Clamp between -10 and 10
+            pitch_ratio = 2 ** (pitch / 12.0)
+        
+        audio.stretch(working_rate or self.working_rate or audio.sample_rate, tempo=tempo, pitch=pitch_ratio)
+        
+        # Apply volume adjustment
+        if volume and volume != 0:
+            volume = max(-10, min(10, volume))  # Clamp between -10 and 10
+            audio.apply_gain(volume)
+        
+        # Apply EQ adjustments as a single filter cascade
+        eq_filters = []
+        if eq_bass is not None:
+            eq_filters.append(('low_shelf', 200, float(eq_bass)))
+        
+        if eq_mid is not None:
+            # Boost or cut the midrange around 1kHz
+            eq_filters.append(('peaking', 1000, float(eq_mid), 1.0))
+        
+        if eq_treble is not None:
+            eq_filters.append(('high_shelf', 4000, float(eq_treble)))
+        
+        audio.apply_sos(design_sos(eq_filters, audio.sample_rate))
+        
+        # Apply audio effect
+        if effect_type and effect_type != 'none':
+            effect_intensity = max(0.1, min(1.0, effect_intensity))
+            
+            if effect_type == 'echo':
+                # Create echo effect with dynamic delay
+                delay_ms = int(300 * effect_intensity)
+                audio.overlay(audio.copy(), position_ms=delay_ms, gain_db=-(6 * effect_intensity))
+            
+            elif effect_type in ('reverb', 'room', 'hall'):
+                # Convolution reverb, with intensity setting the wet/dry mix
+                impulse_response = self.reverb_bank.impulse_response(effect_type, audio.sample_rate)
+                audio.convolve(impulse_response, wet=effect_intensity, dry=1.0 - 0.3 * effect_intensity)
+            
+            elif effect_type == 'chorus':
+                # Apply chorus with dynamic intensity
+                audio.add_voices([
+                    {'ratio': 1 + 0.007 * effect_intensity, 'delay': 15, 'gain': -(6 * effect_intensity)},
+                    {'ratio': 1 - 0.007 * effect_intensity, 'delay': 30, 'gain': -(6 * effect_intensity)}
+                ])
+            
+            elif effect_type == 'distortion':
+                # Apply distortion with dynamic intensity
+                audio.compress_dynamic_range(threshold=-20.0, ratio=10.0 * effect_intensity)
+                audio.low_shelf_filter(100, 5.0 * effect_intensity)
+                audio.apply_gain(3 * effect_intensity)
+                
+        return audio
+        
+    def render_edits(self, source_path, edits, output, source_name=None):
+        """
+        Render a list of edit operations, in order, from a source file into a new file
+        
+        The source is decoded once (or taken from the decoded cache) and the
+        result is encoded once, however many edits the list holds.
+        
+        Args:
+            source_path (str): Path of the original audio file
+            edits (list): Edit operations (see parse_edit) to apply in order
+            output (dict): Output format, bitrate and channels (see codec.resolve_output_profile)
+            source_name (str): The source's name in the audio store, recorded for the derived file
+            
+        Returns:
+            dict: Result with the new file's details
+        """
+        # Load the audio file (decoded once per worker while the file is unchanged)
+        audio, decode_ms, decode_cached = self.load_audio(source_path)
+        
+        for edit in edits:
+            self.apply_edit(audio, edit)
+            
+        # Generate a unique filename for the modified audio
+        filename = self.audio_store.allocate(f"modified_{uuid.uuid4()}.{output['format']}")
+        filepath = self.audio_store.path_for(filename)
+        try:
+            # Export the audio at the output rate
+            if self.output_rate:
+                audio.resample(self.output_rate)
+            encode_ms = self.codec.export(audio, filepath, format=output['format'],
+                                          bitrate=output['bitrate'], channels=output['channels'])
+            size_bytes = os.path.getsize(filepath)
+        except Exception:
+            self.audio_store.discard(filename)
+            raise
+        self.audio_store.add(filename)
+        
+        result = {
+            'success': True,
+            'filename': filename,
+            'path': f'/static/audio/{filename}',
+            'duration': len(audio) / 1000,  # Duration in seconds
+            'format': output['format'],
+            'profile': output['profile'],
+            'bitrate': output['bitrate'],
+            'size_bytes': size_bytes,
+            'decode_ms': decode_ms,
+            'decode_cached': decode_cached,
+            'encode_ms': encode_ms
+        }
+        if self.render_index is not None:
+            self.render_index.record(result, kind='modified', source_filename=source_name)
+        return result
+        
+    def preview_edits(self, source_path, edits, start_ms=0):
+        """
+        Render a quick, low-quality preview of a list of edit operations
+        
+        Only a PREVIEW_WINDOW_MS window of the source starting at start_ms is
+        rendered, at PREVIEW_SAMPLE_RATE, and encoded with the low-bitrate
+        PREVIEW_PROFILE in memory; nothing is written to the audio store.
+        Effects that reach across the window edges (echo, reverb tails) are
+        cut off there, so the full render is still needed for the final file.
+        
+        Args:
+            source_path (str): Path of the original audio file
+            edits (list): Edit operations (see parse_edit) to apply in order
+            start_ms (int): Start of the window in the source
+            
+        Returns:
+            tuple: (encoded bytes, dict with the preview's format, window, tempo, duration and timings)
+        """
+        start = time.perf_counter()
+        start_ms = max(0, int(start_ms or 0))
+        audio, decode_ms, decode_cached = self.load_audio(source_path, (start_ms, start_ms + PREVIEW_WINDOW_MS))
+        if audio.frame_count == 0 and start_ms > 0:
+            # Past the end (e.g. the playhead of a longer render): preview from the start instead
+            start_ms = 0
+            audio, decode_ms, decode_cached = self.load_audio(source_path, (0, PREVIEW_WINDOW_MS))
+            
+        # Drop to the preview rate before the edits, so time stretching and filters run on fewer samples
+        preview_rate = min(PREVIEW_SAMPLE_RATE, audio.sample_rate)
+        audio.resample(preview_rate)
+        for edit in edits:
+            self.apply_edit(audio, edit, working_rate=preview_rate)
+            
+        output = resolve_output_profile(PREVIEW_PROFILE)
+        data, encode_ms = self.codec.encode(audio, format=output['format'], bitrate=output['bitrate'],
+                                            channels=output['channels'], fast=True)
+        return data, {
+            'preview': True,
+            'format': output['format'],
+            'profile': output['profile'],
+            'start': start_ms / 1000,
+            'duration': len(audio) / 1000,
+            # Seconds of the source per second of preview, to map the preview's playhead back to the source
+            'tempo': edits_tempo(edits),
+            'sample_rate': preview_rate,
+            'decode_ms': decode_ms,
+            'decode_cached': decode_cached,
+            'encode_ms': encode_ms,
+            'render_ms': (time.perf_counter() - start) * 1000
+        }
+        
+    def _synthesize_parallel(self, text, language, slow=False, backend=None):
+        """
+        Synthesize text chunk by chunk on the synthesis pool and stitch the result in order
+        
+        Args:
+            text (str): The text to synthesize
+            language (str): The language code
+            slow (bool): Whether to request slow speech
+            backend (SynthesisBackend): Backend to synthesize with (None uses the default)
+            
+        Returns:
+            AudioBuffer: The decoded, stitched audio
+        """
+        backend = backend or self.backends[self.default_backend]
+        chunks = split_text_chunks(text)
+        logging.debug(f"Synthesizing {len(chunks)} chunks with {self.synthesis_workers} workers")
+        
+        # map() preserves chunk order regardless of completion order
+        chunk_bytes = self.synthesis_pool.map(lambda chunk: self._synthesize(chunk, language, slow, backend), chunks)
+        
+        buffers = [self._decode(data, backend) for data in chunk_bytes]
+        return AudioBuffer.concatenate(buffers, crossfade_ms=SYNTHESIS_CROSSFADE_MS)
+            
+    def _render_text(self, text, language, backend, parallel_synthesis, stage_options, rng, incremental=False):
+        """Synthesize text with the backend and run it through the processing stages (see _process_audio)"""
+        # Generate basic speech with the selected backend (or reuse a cached synthesis)
+        logging.debug(f"Generating speech for text: {text[:50]}... in language: {language} with backend: {backend.name}")
+        if parallel_synthesis and len(split_text_chunks(text)) > 1:
+            # Long text - fetch sentence chunks concurrently instead of gTTS's serial requests
+            audio = self._synthesize_parallel(text, language, slow=False, backend=backend)
+        else:
+            # Synthesize and decode entirely in memory
+            audio_bytes = self._synthesize(text, language, slow=False, backend=backend)
+            audio = self._decode(audio_bytes, backend)
+            
+        return self._process_audio(audio, text, rng=rng, incremental=incremental, **stage_options)
+        
+    def _render_incremental(self, text, language, backend, parallel_synthesis, stage_options, render_params):
+        """
+        Render text sentence by sentence, reusing cached processed audio for unchanged sentences
+        
+        Each sentence is rendered on its own with an RNG seeded from the request seed and the
+        sentence text, so a sentence renders identically wherever it appears in the text.
+        Echo, reverb and voice layers that ring on past a sentence are mixed into the
+        sentences after it.
+        
+        Args:
+            text (str): The full text
+            language (str): The language code
+            backend (SynthesisBackend): Backend to synthesize with
+            parallel_synthesis (bool): Whether long sentences may be synthesized as parallel chunks
+            stage_options (dict): Options for the processing stages
+            render_params (dict): The request's render parameters (including the seed)
+            
+        Returns:
+            tuple: (AudioBuffer, {'reused': int, 'rendered': int})
+        """
+        segments = []
+        counts = {'reused': 0, 'rendered': 0}
+        tails = TailMixer()
+        for segment, tail, reused in self._iter_sentence_renders(text, language, backend, parallel_synthesis,
+                                                                 stage_options, render_params):
+            counts['reused' if reused else 'rendered'] += 1
+            segments.append(tails.mix(segment, tail))
+            
+        logging.debug(f"Incremental render: {counts['reused']} sentences reused, {counts['rendered']} rendered")
+        
+        # Join in one pass rather than growing the output sentence by sentence
+        return AudioBuffer.concatenate(segments), counts
+        
+    def _iter_sentence_renders(self, text, language, backend, parallel_synthesis, stage_options, render_params):
+        """Yield (processed audio, ring-out tail or None, reused from cache) for each sentence of the text in order"""
+        # Output settings only matter at export, so sentences are shared across formats
+        sentence_params = {k: v for k, v in render_params.items() if k != 'text' and k not in OUTPUT_PARAMS}
+        
+        for sentence in split_sentences(text):
+            sentence_key = make_render_key(dict(sentence_params, sentence=sentence))
+            cached = self.sentence_cache.get(sentence_key)
+            if cached is not None:
+                yield cached[0], cached[1], True
+                continue
+                
+            rng = random.Random(derive_sentence_seed(render_params['seed'], sentence))
+            segment, tail = self._render_text(sentence, language, backend, parallel_synthesis,
+                                              stage_options, rng, incremental=True)
+            self.sentence_cache.put(sentence_key, segment, tail)
+            yield segment, tail, False
+            
+    def _stream_render(self, text, language, backend, parallel_synthesis, stage_options, render_params,
+                       render_key, result, output):
+        """
+        Render sentence by sentence, yielding encoded audio as soon as each sentence is processed
+        
+        The complete stream is also written to the result's file. Once the last
+        sentence is out, the result gets its duration and sentence counts and
+        is added to the render cache under the incremental render key, so
+        repeating the request streamed, or unstreamed with incremental set,
+        returns the finished file. If rendering or encoding fails partway,
+        the error propagates out of the generator: the headers have already
+        been sent, so the server drops the connection without terminating
+        the chunked body, and clients see a failed transfer rather than a
+        short clip.
+        
+        Yields:
+            bytes: The next part of the encoded stream
+        """
+        filepath = self.audio_store.path_for(result['filename'])
+        encoder = self.codec.stream_encoder(output['format'], bitrate=output['bitrate'],
+                                            channels=output['channels'], path=filepath)
+        frames = 0
+        sample_rate = None
+        counts = {'reused': 0, 'rendered': 0}
+        completed = False
+        tails = TailMixer()
+        try:
+            for segment, tail, reused in self._iter_sentence_renders(text, language, backend, parallel_synthesis,
+                                                                     stage_options, render_params):
+                counts['reused' if reused else 'rendered'] += 1
+                segment = tails.mix(segment, tail)
+                if self.output_rate:
+                    # Resample a view, leaving the cached sentence untouched
+                    segment = segment.region(0).resample(self.output_rate)
+                frames += segment.frame_count
+                sample_rate = segment.sample_rate
+                
+                data = encoder.encode(segment)
+                if data:
+                    yield data
+                    
+            data = encoder.finish()
+            if data:
+                yield data
+            completed = True
+        except Exception as e:
+            # Re-raised so the server aborts the response instead of ending it like a complete stream
+            logging.error(f"Error streaming speech: {str(e)}")
+            raise
+        finally:
+            if not completed:
+                # Failed or abandoned by the client: don't leave a truncated file behind
+                encoder.close()
+                self.audio_store.discard(result['filename'])
+                    
+        if completed:
+            logging.info(f"Successfully streamed speech: {result['filename']}")
+            result['duration'] = frames / sample_rate if sample_rate else 0.0
+            result['sentences_reused'] = counts['reused']
+            result['sentences_rendered'] = counts['rendered']
+            result['size_bytes'] = encoder.bytes_written
+            self.audio_store.add(result['filename'])
+            self.render_cache.put(render_key, result)
+            self._index_render(render_key, text, result)
+            
+    def _lookup_render(self, render_key):
+        """Return a copy of the cached result for a render key, falling back to the metadata index"""
+        result = self.render_cache.get(render_key)
+        if result is not None or self.render_index is None:
+            return result
+            
+        result = self.render_index.lookup(render_key)
+        if result is None or not os.path.exists(self.audio_store.path_for(result['filename'])):
+            return None
+        self.audio_store.touch(result['filename'])
+        self.render_cache.put(render_key, result)
+        return dict(result)
+        
+    def _index_render(self, render_key, text, result):
+        """Queue a finished render for the metadata index"""
+        if self.render_index is not None:
+            self.render_index.record(result, param_hash=render_key, text=text)
+            
+    def _stream_file(self, filename):
+        """Yield an existing audio file in chunks"""
+        self.audio_store.touch(filename)
+        if self.render_index is not None:
+            self.render_index.touch(filename)
+        with open(self.audio_store.path_for(filename), 'rb') as f:
+            while True:
+                data = f.read(STREAM_CHUNK_BYTES)
+                if not data:
+                    break
+                yield data
+        
+    def _process_audio(self, audio, text, emotion, voice_type, custom_speed=None, custom_pitch=None,
+                       custom_volume=None, audio_effect='none', prosody_level='default', enable_emphasis=True,
+                       sentence_analysis=False, voice_layering=False, spectral_enhancement=False, rng=None,
+                       incremental=False):
+        """
+        Apply the emotion, voice, effect and enhancement stages to synthesized audio
+        
+        Args:
+            audio (AudioBuffer): The synthesized base audio (modified in place)
+            text (str): The text the audio was synthesized from (used for sentence analysis)
+            rng (random.Random): Source of randomness for the variability and prosody stages
+            incremental (bool): Whether audio is one sentence of an incremental render
             
+        The remaining arguments are the validated generate_speech options.
+            
+        Returns:
+            AudioBuffer: The processed audio, or with incremental set, a tuple of the processed
+                sentence and the ring-out of its effects past its end (None if nothing rings)
+        """
+        # Keyword arguments in stage_options order, so the debug lookup hits the same memoized plan
+        plan = compile_render_plan(emotion=emotion, voice_type=voice_type, custom_speed=custom_speed,
+                                   custom_pitch=custom_pitch, custom_volume=custom_volume,
+                                   audio_effect=audio_effect, prosody_level=prosody_level,
+                                   enable_emphasis=enable_emphasis, sentence_analysis=sentence_analysis,
+                                   voice_layering=voice_layering, spectral_enhancement=spectral_enhancement)
+        context = RenderContext(text, rng or random.Random(), working_rate=self.working_rate,
+                                filter_bank=self.filter_bank, noise_bank=self.noise_bank,
+                                reverb_bank=self.reverb_bank, block_frames=self.block_frames,
+                                incremental=incremental)
+        audio = plan.run(audio, context)
+        return (audio, context.tail) if incremental else audio
+        
     def generate_speech(self, text, language='en', emotion='neutral', voice_type='default', 
                       custom_speed=None, custom_pitch=None, custom_volume=None, audio_effect='none', 
                       prosody_level='default', enable_emphasis=True, micro_pauses=False, 
-                      sentence_analysis=False, voice_layering=False, spectral_enhancement=False, format='mp3'):
+                      sentence_analysis=False, voice_layering=False, spectral_enhancement=False, format='mp3',
+                      profile=None, bitrate=None, parallel_synthesis=True, backend=None, seed=None, incremental=False, debug=False,
+                      stream=False):
         """
         Generate speech from text with customized parameters and advanced speech enhancements
         
@@ -282,7 +1150,17 @@ class TextToSpeechService:
             sentence_analysis (bool): Whether to analyze sentences for dynamic emphasis
             voice_layering (bool): Whether to apply voice layering effects
             spectral_enhancement (bool): Whether to apply spectral enhancements for clarity
-            format (str): Output format ('mp3' or 'wav')
+            format (str): Output format ('mp3', 'ogg' or 'wav'), used when no profile is given
+            profile (str): Output profile name (see codec.OUTPUT_PROFILES; None picks one from format)
+            bitrate (str): Optional override of the profile's bitrate (e.g., '64k')
+            parallel_synthesis (bool): Whether to synthesize long texts as concurrent sentence chunks
+            backend (str): Synthesis backend name ('gtts' or 'offline'; None uses the service default)
+            seed (int): Optional RNG seed for the randomized stages (None derives one from the parameters)
+            incremental (bool): Whether to render sentence by sentence, reusing unchanged sentences
+            debug (bool): Whether to include the compiled render plan in the result
+            stream (bool): Whether to return the encoded audio as a generator ('audio_stream') that
+                renders sentence by sentence (implies incremental, so it shares the render key and
+                seed of an incremental render); the duration is only known once the stream is complete
             
         Returns:
             dict: Result with success status and file details
@@ -306,566 +1184,93 @@ class TextToSpeechService:
             logging.warning(f"Unsupported audio effect: {audio_effect}. Falling back to none.")
             audio_effect = 'none'
             
-        try:
-            # Generate basic speech with gTTS
-            logging.debug(f"Generating speech for text: {text[:50]}... in language: {language}")
-            tts = gTTS(text=text, lang=language, slow=False)
+        if backend is None:
+            backend = self.default_backend
+        elif backend not in self.backends:
+            logging.warning(f"Unsupported synthesis backend: {backend}. Falling back to {self.default_backend}.")
+            backend = self.default_backend
+        synthesis_backend = self.backends[backend]
+        
+        # Export format, bitrate and channels (the 'speech' profile unless the request picks another)
+        output = resolve_output_profile(profile, format, bitrate)
+        
+        if stream:
+            # Streaming renders sentence by sentence, exactly like (and keyed like) an incremental render
+            incremental = True
             
-            # Save to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as temp_file:
-                tts.save(temp_file.name)
-                temp_path = temp_file.name
+        # Every parameter that affects the rendered output
+        render_params = {
+            'text': text,
+            'language': language,
+            'emotion': emotion,
+            'voice_type': voice_type,
+            'custom_speed': custom_speed,
+            'custom_pitch': custom_pitch,
+            'custom_volume': custom_volume,
+            'audio_effect': audio_effect,
+            'prosody_level': prosody_level,
+            'enable_emphasis': enable_emphasis,
+            'micro_pauses': micro_pauses,
+            'sentence_analysis': sentence_analysis,
+            'voice_layering': voice_layering,
+            'spectral_enhancement': spectral_enhancement,
+            'format': output['format'],
+            'profile': output['profile'],
+            'bitrate': output['bitrate'],
+            'parallel_synthesis': parallel_synthesis,
+            'backend': backend,
+            'incremental': incremental
+        }
+        
+        # Seed the randomized stages from the parameters so identical requests render identically.
+        # Incremental renders leave the text out so that editing one sentence keeps the others' seeds,
+        # and output settings are left out so every profile encodes the same audio.
+        if seed is None:
+            seed_params = {k: v for k, v in render_params.items() if k not in OUTPUT_PARAMS}
+            if incremental:
+                seed_params.pop('text')
+            seed = derive_seed(seed_params)
+        render_params['seed'] = seed
+        rng = random.Random(seed)
+        
+        # Options for the processing stages
+        stage_options = {
+            'emotion': emotion,
+            'voice_type': voice_type,
+            'custom_speed': custom_speed,
+            'custom_pitch': custom_pitch,
+            'custom_volume': custom_volume,
+            'audio_effect': audio_effect,
+            'prosody_level': prosody_level,
+            'enable_emphasis': enable_emphasis,
+            'sentence_analysis': sentence_analysis,
+            'voice_layering': voice_layering,
+            'spectral_enhancement': spectral_enhancement
+        }
             
-            # Apply advanced audio processing with pydub
-            audio = AudioSegment.from_mp3(temp_path)
+        # Return the existing file for a repeat request
+        render_key = make_render_key(render_params)
+        cached_result = self._lookup_render(render_key)
+        if cached_result is not None:
+            logging.info(f"Render cache hit: {cached_result['filename']}")
+            cached_result['cached'] = True
+            if debug:
+                cached_result['render_plan'] = compile_render_plan(**stage_options).describe()
+            if stream:
+                cached_result['audio_stream'] = self._stream_file(cached_result['filename'])
+            return cached_result
             
+        filename = None
+        try:
             # Calculate final parameters by combining emotion, voice type, and custom values
-            # Speed modification (use custom value if provided)
-            speed = custom_speed if custom_speed is not None else EMOTION_PARAMETERS[emotion]['speed']
-            speed = max(0.5, min(2.0, speed))  # Clamp between 0.5 and 2.0
-            
-            # Apply speed modification
-            if speed != 1.0:
-                logging.debug(f"Applying speed modification: {speed}")
-                # Speed change is performed by modifying the frame rate
-                audio = audio._spawn(audio.raw_data, overrides={
-                    "frame_rate": int(audio.frame_rate * speed)
-                })
-            
-            # Calculate final pitch by combining emotion and voice type parameters
-            base_pitch = VOICE_TYPES[voice_type]['base_pitch']
-            emotion_pitch = EMOTION_PARAMETERS[emotion]['pitch']
-            final_pitch = custom_pitch if custom_pitch is not None else (base_pitch + emotion_pitch)
-            final_pitch = max(-10, min(10, final_pitch))  # Clamp between -10 and 10
-            
-            # Apply pitch modification
-            if final_pitch != 0:
-                logging.debug(f"Applying pitch modification: {final_pitch} semitones")
-                new_sample_rate = int(audio.frame_rate * (2 ** (final_pitch / 12.0)))
-                audio = audio._spawn(audio.raw_data, overrides={
-                    "frame_rate": new_sample_rate
-                })
-                audio = audio.set_frame_rate(44100)  # Reset to standard frame rate
-            
-            # Calculate final volume
-            volume_db = custom_volume if custom_volume is not None else EMOTION_PARAMETERS[emotion]['volume']
-            volume_db = max(-10, min(10, volume_db))  # Clamp between -10 and 10
-            
-            # Apply volume adjustment
-            if volume_db != 0:
-                logging.debug(f"Applying volume adjustment: {volume_db}dB")
-                audio = audio + volume_db
-            
-            # Apply emphasis effect based on emotion
-            emphasis = EMOTION_PARAMETERS[emotion]['emphasis']
-            if emphasis != 0:
-                logging.debug(f"Applying emphasis effect: {emphasis}")
-                # Simplified emphasis effect
-                if emphasis > 0:
-                    # For positive emphasis, add some compression (reduce dynamic range)
-                    ratio = min(8.0, 2.0 + emphasis)
-                    threshold = -20.0 - (emphasis * 2)
-                    audio = audio.compress_dynamic_range(
-                        threshold=threshold, 
-                        ratio=ratio,
-                        attack=5.0, 
-                        release=50.0 + (emphasis * 10)
-                    )
-                else:
-                    # For negative emphasis, add subtle normalization
-                    audio = audio.normalize(headroom=abs(emphasis))
-            
-            # Apply voice timbre modifications
-            timbre = VOICE_TYPES[voice_type]['timbre']
-            if timbre != 0:
-                logging.debug(f"Applying timbre modification: {timbre}")
-                # Simplified timbre adjustment
-                if timbre > 0:
-                    # Increase high frequencies for clearer voice
-                    audio = audio.high_pass_filter(800)
-                else:
-                    # Increase low frequencies for deeper voice
-                    audio = audio.low_pass_filter(3000)
-            
-            # Apply EQ profile based on emotion
-            eq_profile = EMOTION_PARAMETERS[emotion]['eq_profile']
-            logging.debug(f"Applying EQ profile: {eq_profile}")
-            
-            try:
-                # Apply different EQ profiles for each emotion type
-                if eq_profile == 'flat':
-                    # Neutral profile - no adjustments
-                    pass
-                
-                elif eq_profile == 'bright':
-                    # Bright profile for happy/excited emotions - boost highs, cut lows
-                    audio = audio.high_pass_filter(180)  # Cut very low frequencies
-                    audio = audio.high_shelf_filter(4000, 3)  # Boost highs
-                
-                elif eq_profile == 'muffled':
-                    # Muffled profile for sad emotions - boost lows, cut highs
-                    audio = audio.low_shelf_filter(200, 2)   # Boost lows
-                    audio = audio.high_shelf_filter(3000, -2)  # Cut highs
-                
-                elif eq_profile == 'sharp':
-                    # Sharp profile for angry emotions - boost mids
-                    audio = audio.high_pass_filter(150)  # Cut very low frequencies
-                    audio = audio.low_shelf_filter(400, -1)  # Cut some lows
-                    audio = audio.high_shelf_filter(3000, 4)  # Boost highs significantly
-                
-                elif eq_profile == 'warm':
-                    # Warm profile for calm emotions - subtle boost to lows and low-mids
-                    audio = audio.low_shelf_filter(250, 2)  # Boost lows
-                    audio = audio.high_shelf_filter(8000, -1)  # Slightly cut highs
-                
-                elif eq_profile == 'tinny':
-                    # Tinny profile for fearful emotions - cut lows, boost high-mids
-                    audio = audio.high_pass_filter(300)  # Cut more lows
-                    audio = audio.high_shelf_filter(4000, 3)  # Boost highs
-                
-                elif eq_profile == 'airy':
-                    # Airy profile for whisper - cut lows, boost very high frequencies
-                    audio = audio.high_pass_filter(500)  # Cut lows significantly
-                    audio = audio.high_shelf_filter(6000, 4)  # Boost very high frequencies
-                
-                elif eq_profile == 'harsh':
-                    # Harsh profile for shouting - boost everything for intensity
-                    audio = audio.high_pass_filter(200)  # Cut very low rumble
-                    audio = audio.low_shelf_filter(300, 2)  # Boost low-mids
-                    audio = audio.high_shelf_filter(2000, 3)  # Boost highs
-            except Exception as e:
-                logging.warning(f"Error applying EQ profile: {str(e)}")
-            
-            # Apply variability/jitter based on emotion intensity
-            variability = EMOTION_PARAMETERS[emotion]['variability']
-            if variability != 0:
-                logging.debug(f"Applying pitch variability: {variability}")
-                try:
-                    if variability > 0:
-                        # Apply pitch variations for more expressive emotions (happy, excited, angry)
-                        # This creates a more dynamic, animated speech pattern
-                        segment_length = min(400, int(len(audio) / 10))  # Reasonable segment size
-                        
-                        # Split audio into segments to apply varied processing
-                        segments = []
-                        for i in range(0, len(audio), segment_length):
-                            segment = audio[i:i+segment_length]
-                            
-                            # Random pitch variation based on variability
-                            if random.random() > 0.5:  # 50% chance of pitch change
-                                pitch_var = (random.random() * 2 - 1) * variability * 0.5  # -var/2 to +var/2
-                                if abs(pitch_var) > 0.1:  # Only apply if significant
-                                    try:
-                                        var_rate = segment.frame_rate * (2 ** (pitch_var / 12.0))
-                                        segment = segment._spawn(segment.raw_data, overrides={
-                                            "frame_rate": int(var_rate)
-                                        }).set_frame_rate(audio.frame_rate)
-                                    except Exception:
-                                        pass  # Skip if issue with this segment
-                            
-                            segments.append(segment)
-                        
-                        # Combine segments
-                        if segments:
-                            audio = segments[0]
-                            for segment in segments[1:]:
-                                audio += segment
-                except Exception as e:
-                    logging.warning(f"Error applying variability: {str(e)}")
-            
-            # Apply audio effects if enabled
-            if audio_effect != 'none' and AUDIO_EFFECTS[audio_effect]['enabled']:
-                logging.debug(f"Applying audio effect: {audio_effect}")
-                
-                if audio_effect == 'echo':
-                    # Enhanced echo effect with multiple delays
-                    try:
-                        echo_sound = audio - 6  # Lower volume for echo
-                        delay_ms = 300  # 300ms delay
-                        audio = audio.overlay(echo_sound, position=delay_ms)
-                        
-                        # Add a secondary, quieter echo for richer effect
-                        echo2 = audio - 12
-                        audio = audio.overlay(echo2, position=delay_ms * 2)
-                    except Exception as e:
-                        logging.warning(f"Error in echo effect: {str(e)}")
-                
-                elif audio_effect == 'reverb':
-                    # Enhanced reverb simulation with multiple echos
-                    try:
-                        reverb_sound = audio - 10
-                        delays = [50, 100, 150, 200, 250, 300, 350]
-                        for delay in delays:
-                            echo = reverb_sound - (delay // 20)
-                            audio = audio.overlay(echo, position=delay)
-                    except Exception as e:
-                        logging.warning(f"Error in reverb effect: {str(e)}")
-                
-                elif audio_effect == 'chorus':
-                    # Enhanced chorus effect with multiple layers
-                    try:
-                        chorus1 = audio._spawn(audio.raw_data, overrides={
-                            "frame_rate": int(audio.frame_rate * 1.007)  # +7 cents
-                        }).set_frame_rate(audio.frame_rate) - 6
-                        
-                        chorus2 = audio._spawn(audio.raw_data, overrides={
-                            "frame_rate": int(audio.frame_rate * 0.993)  # -7 cents
-                        }).set_frame_rate(audio.frame_rate) - 6
-                        
-                        chorus3 = audio._spawn(audio.raw_data, overrides={
-                            "frame_rate": int(audio.frame_rate * 1.012)  # +12 cents
-                        }).set_frame_rate(audio.frame_rate) - 9
-                        
-                        audio = audio.overlay(chorus1, position=15)
-                        audio = audio.overlay(chorus2, position=30)
-                        audio = audio.overlay(chorus3, position=45)
-                    except Exception as e:
-                        logging.warning(f"Error in chorus effect: {str(e)}")
-                
-                elif audio_effect == 'distortion':
-                    # Enhanced distortion effect with better safeguards
-                    try:
-                        # Compression with safe parameters
-                        audio = audio.compress_dynamic_range(threshold=-20.0, ratio=10.0, attack=0.1, release=10.0)
-                        
-                        # Bass boost for more intense distortion effect
-                        filter_freq = 100  # Hz
-                        low_shelf_gain = 5.0  # dB
-                        audio = audio.low_shelf_filter(filter_freq, low_shelf_gain)
-                        
-                        # Add high-frequency enhancement for "edge"
-                        audio = audio.high_shelf_filter(4000, 3.0)
-                        
-                        # Increase volume to compensate for distortion
-                        audio = audio + 3
-                    except Exception as e:
-                        logging.warning(f"Error in distortion effect: {str(e)}")
-                
-                elif audio_effect == 'telephone':
-                    # Create classic telephone/radio sound effect
-                    try:
-                        # Apply band-pass filter to simulate telephone frequency response (300Hz-3.4kHz)
-                        audio = audio.high_pass_filter(300)
-                        audio = audio.low_pass_filter(3400)
-                        # Add mild distortion
-                        audio = audio.compress_dynamic_range(threshold=-15, ratio=4.0)
-                        # Add subtle noise
-                        noise = AudioSegment.silent(duration=len(audio)).overlay(
-                            AudioSegment.from_mono_audiosegments(
-                                *[AudioSegment.silent(duration=50).low_pass_filter(1000) 
-                                  for _ in range(len(audio) // 50 + 1)]
-                            ) - 26
-                        )
-                        audio = audio.overlay(noise)
-                    except Exception as e:
-                        logging.warning(f"Error in telephone effect: {str(e)}")
-                
-                elif audio_effect == 'megaphone':
-                    # Create megaphone/announcement effect
-                    try:
-                        # Apply band-pass filter with resonant mids
-                        audio = audio.high_pass_filter(600)
-                        audio = audio.low_pass_filter(4000)
-                        # Heavy compression for "shouting" effect
-                        audio = audio.compress_dynamic_range(threshold=-18, ratio=8.0, attack=0.01)
-                        # Slight distortion for megaphone character
-                        audio = audio + 4  # Increase volume
-                    except Exception as e:
-                        logging.warning(f"Error in megaphone effect: {str(e)}")
-                
-                elif audio_effect == 'whisper_effect':
-                    # Create whisper effect
-                    try:
-                        # Reduce volume
-                        audio = audio - 6
-                        # High-pass filter to remove lower frequencies
-                        audio = audio.high_pass_filter(800)
-                        # Add breathiness
-                        noise = AudioSegment.silent(duration=len(audio)).overlay(
-                            AudioSegment.from_mono_audiosegments(
-                                *[AudioSegment.silent(duration=50).high_shelf_filter(2000, 6) 
-                                  for _ in range(len(audio) // 50 + 1)]
-                            ) - 20
-                        )
-                        audio = audio.overlay(noise)
-                    except Exception as e:
-                        logging.warning(f"Error in whisper effect: {str(e)}")
-                
-                elif audio_effect == 'ethereal':
-                    # Create ethereal voice effect
-                    try:
-                        # Add reverb-like effect with long tail
-                        reverb = audio - 12
-                        delays = [100, 200, 300, 400, 500, 600, 700, 800]
-                        for i, delay in enumerate(delays):
-                            echo = reverb - (2 * i)
-                            audio = audio.overlay(echo, position=delay)
-                        
-                        # Add chorus for dreamy quality
-                        chorus = audio._spawn(audio.raw_data, overrides={
-                            "frame_rate": int(audio.frame_rate * 1.005)
-                        }).set_frame_rate(audio.frame_rate) - 6
-                        audio = audio.overlay(chorus, position=25)
-                        
-                        # Add high shimmer
-                        audio = audio.high_shelf_filter(6000, 3)
-                    except Exception as e:
-                        logging.warning(f"Error in ethereal effect: {str(e)}")
-                
-                elif audio_effect == 'duet':
-                    # Create voice layering duet effect
-                    try:
-                        # Create slightly modified copies of the original
-                        voice1 = audio - 6
-                        voice2 = audio._spawn(audio.raw_data, overrides={
-                            "frame_rate": int(audio.frame_rate * 1.03)  # Up a minor third
-                        }).set_frame_rate(audio.frame_rate) - 6
-                        
-                        voice3 = audio._spawn(audio.raw_data, overrides={
-                            "frame_rate": int(audio.frame_rate * 0.84)  # Down a fifth
-                        }).set_frame_rate(audio.frame_rate) - 9
-                        
-                        # Overlay with slight delays for chorus effect
-                        audio = audio.overlay(voice1.fade_in(20), position=20)
-                        audio = audio.overlay(voice2.fade_in(30), position=15)
-                        audio = audio.overlay(voice3.fade_in(40), position=10)
-                    except Exception as e:
-                        logging.warning(f"Error in duet effect: {str(e)}")
-            
-            # Apply advanced prosody enhancements if enabled
-            if prosody_level != 'default':
-                try:
-                    logging.debug(f"Applying prosody enhancements: {prosody_level}")
-                    
-                    # Get prosody settings for the selected level
-                    if prosody_level not in PROSODY_SETTINGS:
-                        prosody_level = 'natural'  # Fallback to natural if level not found
-                    
-                    settings = PROSODY_SETTINGS[prosody_level]
-                    
-                    # Apply sentence pause and micro-pause enhancements
-                    if settings['sentence_pause'] > 0 or settings['punctuation_pause'] > 0 or settings['micro_pauses']:
-                        # Split audio into smaller segments - estimate words by duration
-                        # Assuming average word length ~300ms
-                        avg_word_ms = 300
-                        est_words = int(len(audio) / avg_word_ms)
-                        
-                        # Create realistic word boundaries by using variable segment lengths
-                        segment_count = min(est_words, 20)  # Reasonable number of segments
-                        base_segment_ms = len(audio) // segment_count
-                        
-                        # Create segments with natural variation
-                        segments = []
-                        position = 0
-                        
-                        for i in range(segment_count):
-                            # Add variation to segment length
-                            variation = 0
-                            if settings['word_gap_variation'] > 0:
-                                variation = int((random.random() * 2 - 1) * settings['word_gap_variation'] * base_segment_ms)
-                            
-                            segment_length = max(100, base_segment_ms + variation)
-                            
-                            # Ensure we don't exceed audio length
-                            end_pos = min(position + segment_length, len(audio))
-                            segments.append(audio[position:end_pos])
-                            
-                            # Add pause after segment
-                            if i < segment_count - 1:  # Not the last segment
-                                # Decide if this is a sentence boundary, punctuation, or just a word break
-                                if random.random() < 0.15 and settings['sentence_pause'] > 0:
-                                    # Sentence pause (~15% chance)
-                                    pause_duration = int(settings['sentence_pause'])
-                                    segments.append(AudioSegment.silent(duration=pause_duration))
-                                elif random.random() < 0.3 and settings['punctuation_pause'] > 0:
-                                    # Punctuation pause (~30% chance)
-                                    pause_duration = int(settings['punctuation_pause'])
-                                    segments.append(AudioSegment.silent(duration=pause_duration))
-                                elif settings['micro_pauses'] and random.random() < 0.2:
-                                    # Micro-pause (~20% chance if enabled)
-                                    segments.append(AudioSegment.silent(duration=int(random.randint(30, 80))))
-                            
-                            position = end_pos
-                        
-                        # Combine segments to create new audio with natural pauses
-                        if segments:
-                            audio = segments[0]
-                            for segment in segments[1:]:
-                                audio += segment
-                
-                    # Apply word emphasis if enabled
-                    if settings['emphasis_words'] and enable_emphasis:
-                        # We'll simulate word emphasis by applying volume variations
-                        # This is a simplified approach since we can't easily detect words in audio
-                        segment_length = min(300, int(len(audio) / 30))  # Approximate word size
-                        
-                        segments = []
-                        for i in range(0, len(audio), segment_length):
-                            segment = audio[i:i+segment_length]
-                            
-                            # Randomly emphasize some segments (~20% chance)
-                            if random.random() < 0.2 and settings['intonation_strength'] > 0:
-                                # Apply emphasis by increasing volume for important words
-                                emphasis_db = settings['intonation_strength'] * 3  # 0-3dB boost
-                                segment = segment + emphasis_db
-                            
-                            segments.append(segment)
-                        
-                        # Combine segments
-                        if segments:
-                            audio = segments[0]
-                            for segment in segments[1:]:
-                                audio += segment
-                    
-                    # Add breathiness if enabled
-                    if settings['breathiness'] > 0:
-                        try:
-                            breath_intensity = settings['breathiness']
-                            
-                            # Create breath noise
-                            breath_noise = AudioSegment.silent(duration=len(audio)).overlay(
-                                AudioSegment.from_mono_audiosegments(
-                                    *[AudioSegment.silent(duration=50).high_shelf_filter(3000, 10) 
-                                      for _ in range(len(audio) // 50 + 1)]
-                                ) - int(30 - (breath_intensity * 10))  # Adjust volume based on intensity
-                            )
-                            
-                            # Apply breath noise
-                            audio = audio.overlay(breath_noise)
-                        except Exception as e:
-                            logging.warning(f"Error applying breathiness: {str(e)}")
-                
-                except Exception as e:
-                    logging.warning(f"Error applying prosody enhancements: {str(e)}")
-            
-            # Apply sentence analysis for dynamic emphasis if enabled
-            if sentence_analysis:
-                try:
-                    logging.debug("Applying sentence analysis for dynamic emphasis")
-                    
-                    # Split text into sentences (simplified approach)
-                    sentences = [s.strip() for s in text.split('.') if s.strip()]
-                    
-                    if sentences and len(sentences) > 1:
-                        # Estimate audio duration per sentence
-                        avg_sentence_ms = len(audio) // len(sentences)
-                        
-                        if avg_sentence_ms > 500:  # Only process if sentences are long enough
-                            sentence_segments = []
-                            
-                            for i, sentence in enumerate(sentences):
-                                # Calculate approximate position in audio for this sentence
-                                start_pos = i * avg_sentence_ms
-                                end_pos = min(start_pos + avg_sentence_ms, len(audio))
-                                
-                                if end_pos > start_pos:
-                                    sentence_audio = audio[start_pos:end_pos]
-                                    
-                                    # Check if sentence contains emphasis words
-                                    contains_emphasis = any(word.lower() in sentence.lower() for word in EMPHASIS_WORDS)
-                                    
-                                    # Apply processing based on sentence characteristics
-                                    if contains_emphasis:
-                                        # Boost important sentences
-                                        sentence_audio = sentence_audio + 2  # +2dB
-                                        
-                                        # Add slight compression for clarity
-                                        sentence_audio = sentence_audio.compress_dynamic_range(
-                                            threshold=-20, ratio=2.0, attack=5.0, release=50.0
-                                        )
-                                    
-                                    # Check for questions (simplified)
-                                    if '?' in sentence:
-                                        # Modify question intonation by increasing pitch towards the end
-                                        half_point = len(sentence_audio) // 2
-                                        first_half = sentence_audio[:half_point]
-                                        second_half = sentence_audio[half_point:]
-                                        
-                                        # Increase pitch slightly at the end of questions
-                                        modified_half = second_half._spawn(second_half.raw_data, overrides={
-                                            "frame_rate": int(second_half.frame_rate * 1.03)
-                                        }).set_frame_rate(audio.frame_rate)
-                                        
-                                        sentence_audio = first_half + modified_half
-                                    
-                                    sentence_segments.append(sentence_audio)
-                            
-                            # Combine sentence segments
-                            if sentence_segments:
-                                audio = sentence_segments[0]
-                                for segment in sentence_segments[1:]:
-                                    audio += segment
-                
-                except Exception as e:
-                    logging.warning(f"Error applying sentence analysis: {str(e)}")
-            
-            # Apply voice layering for richness if enabled
-            if voice_layering:
-                try:
-                    logging.debug("Applying voice layering effects")
-                    
-                    # Create a slightly detuned duplicate of the audio for richness
-                    layer1 = audio._spawn(audio.raw_data, overrides={
-                        "frame_rate": int(audio.frame_rate * 1.002)  # +2 cents
-                    }).set_frame_rate(audio.frame_rate) - 12  # -12dB (much quieter)
-                    
-                    layer2 = audio._spawn(audio.raw_data, overrides={
-                        "frame_rate": int(audio.frame_rate * 0.998)  # -2 cents
-                    }).set_frame_rate(audio.frame_rate) - 12
-                    
-                    # Apply slight EQ differences to each layer
-                    layer1 = layer1.high_shelf_filter(5000, 2)
-                    layer2 = layer2.low_shelf_filter(300, 2)
-                    
-                    # Mix the layers with the original
-                    audio = audio.overlay(layer1, position=5)
-                    audio = audio.overlay(layer2, position=10)
-                
-                except Exception as e:
-                    logging.warning(f"Error applying voice layering: {str(e)}")
+            speed, final_pitch, volume_db = resolve_levels(emotion, voice_type, custom_speed,
+                                                           custom_pitch, custom_volume)
             
-            # Apply spectral enhancement for clarity if enabled
-            if spectral_enhancement:
-                try:
-                    logging.debug("Applying spectral enhancement for clarity")
-                    
-                    # Enhance speech intelligibility by boosting key frequency ranges
-                    
-                    # Mild high-pass to remove rumble
-                    audio = audio.high_pass_filter(100)
-                    
-                    # Boost speech "presence" range (around 3-4kHz)
-                    audio = audio.high_shelf_filter(3000, 2)
-                    
-                    # Slight boost to articulation range (5-8kHz)
-                    audio = audio.high_shelf_filter(5000, 1)
-                    
-                    # Apply subtle multi-band compression for balanced sound
-                    audio = audio.compress_dynamic_range(threshold=-25, ratio=1.5, attack=5.0, release=100.0)
-                    
-                    # Normalize to ensure consistent volume level
-                    audio = audio.normalize(headroom=0.5)
-                
-                except Exception as e:
-                    logging.warning(f"Error applying spectral enhancement: {str(e)}")
-            
-            # Generate a unique filename
-            filename = f"{language}_{voice_type}_{emotion}_{uuid.uuid4()}.{format}"
-            filepath = os.path.join(self.audio_folder, filename)
-            
-            # Export the audio in the requested format with appropriate bitrate
-            if format.lower() == 'mp3':
-                audio.export(filepath, format="mp3", bitrate="192k")
-            elif format.lower() == 'wav':
-                audio.export(filepath, format="wav")
-            else:
-                audio.export(filepath, format="mp3", bitrate="192k")  # Default to mp3
-                
-            # Clean up temporary file
-            os.unlink(temp_path)
+            # Generate a unique filename in one of the store's shard directories
+            filename = self.audio_store.allocate(f"{language}_{voice_type}_{emotion}_{uuid.uuid4()}.{output['format']}")
+            filepath = self.audio_store.path_for(filename)
             
-            logging.info(f"Successfully generated speech: {filename}")
-            return {
+            result = {
                 'success': True,
                 'filename': filename,
                 'path': f'/static/audio/{filename}',
@@ -876,17 +1281,80 @@ class TextToSpeechService:
                 'pitch': final_pitch,
                 'volume': volume_db,
                 'audio_effect': audio_effect,
-                'format': format,
-                'duration': len(audio) / 1000  # Duration in seconds
+                'backend': backend,
+                'format': output['format'],
+                'profile': output['profile'],
+                'bitrate': output['bitrate'],
+                'seed': seed,
+                'incremental': incremental
             }
             
+            if stream:
+                # Rendering happens as the caller consumes the stream
+                audio_stream = self._stream_render(text, language, synthesis_backend, parallel_synthesis,
+                                                   stage_options, render_params, render_key, dict(result), output)
+                result['cached'] = False
+                result['audio_stream'] = audio_stream
+                if debug:
+                    result['render_plan'] = compile_render_plan(**stage_options).describe()
+                return result
+            
+            if incremental:
+                # Reuse processed audio for sentences that haven't changed since a previous render
+                audio, sentence_counts = self._render_incremental(text, language, synthesis_backend,
+                                                                  parallel_synthesis, stage_options,
+                                                                  render_params)
+                result['sentences_reused'] = sentence_counts['reused']
+                result['sentences_rendered'] = sentence_counts['rendered']
+            else:
+                audio = self._render_text(text, language, synthesis_backend, parallel_synthesis,
+                                          stage_options, rng)
+            
+            # Convert to the output rate for export
+            if self.output_rate:
+                audio.resample(self.output_rate)
+            
+            # Export the audio with the output profile's format, bitrate and channels
+            result['encode_ms'] = self.codec.export(audio, filepath, format=output['format'],
+                                                    bitrate=output['bitrate'], channels=output['channels'])
+            result['size_bytes'] = os.path.getsize(filepath)
+            self.audio_store.add(filename)
+                
+            logging.info(f"Successfully generated speech: {filename}")
+            result['duration'] = len(audio) / 1000  # Duration in seconds
+            self.render_cache.put(render_key, result)
+            self._index_render(render_key, text, result)
+            
+            result['cached'] = False
+            if debug:
+                result = dict(result, render_plan=compile_render_plan(**stage_options).describe())
+            return result
+            
         except Exception as e:
             logging.error(f"Error generating speech: {str(e)}")
+            if filename is not None:
+                # Don't leave a partial export behind
+                self.audio_store.discard(filename)
             return {
                 'success': False,
                 'error': str(e)
             }
             
+    def get_cache_stats(self):
+        """Return counters for the service's caches"""
+        return {
+            'synthesis': self.synthesis_cache.get_stats(),
+            'render': self.render_cache.get_stats(),
+            'sentence': self.sentence_cache.get_stats(),
+            'decoded': self.decoded_cache.get_stats(),
+            'audio_store': self.audio_store.get_stats(),
+            'render_index': self.render_index.get_stats() if self.render_index is not None else None
+        }
+        
+    def get_synthesis_backends(self):
+        """Return the list of available synthesis backends"""
+        return list(SYNTHESIS_BACKENDS.keys())
+        
     def get_supported_languages(self):
         """Return the dictionary of supported languages"""
         return SUPPORTED_LANGUAGES
@@ -899,6 +1367,10 @@ class TextToSpeechService:
         """Return the dictionary of supported voice types"""
         return VOICE_TYPES
         
+    def get_output_profiles(self):
+        """Return the output profiles and the default one"""
+        return {'profiles': OUTPUT_PROFILES, 'default': DEFAULT_OUTPUT_PROFILE}
+        
     def get_audio_effects(self):
         """Return the dictionary of supported audio effects"""
         return {k: v for k, v in AUDIO_EFFECTS.items() if k == 'none' or v['enabled']}